@@ -0,0 +1 @@
+"""Benchmarks for MQTT connection state custom integration."""
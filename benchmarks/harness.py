@@ -0,0 +1,335 @@
+"""Benchmark harness for MQTT connection state custom integration.
+
+Runs the integration against a real Home Assistant core with an in-process
+MQTT stand-in and a synthetic device registry. Requires the homeassistant
+package, no broker is needed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from datetime import timedelta
+import inspect
+import logging
+import time
+from types import MappingProxyType, SimpleNamespace
+from typing import Any
+from unittest.mock import patch
+
+from homeassistant import bootstrap
+from homeassistant.config_entries import ConfigEntries, ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.helpers.entity_platform import EntityPlatform
+
+from custom_components.mqtt_connection_state import (
+    CONFIG_SCHEMA,
+    async_setup as async_setup_integration,
+)
+from custom_components.mqtt_connection_state.binary_sensor import (
+    MqttConnectionSensorEntity,
+)
+from custom_components.mqtt_connection_state.const import (
+    CONF_DEVICE_ID,
+    CONF_TOPIC,
+    DOMAIN,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+BASE_TOPIC = "zigbee2mqtt"
+
+
+@dataclass(slots=True)
+class FakeMessage:
+    """MQTT message as passed to subscription callbacks."""
+
+    topic: str
+    payload: str
+    qos: int = 0
+    retain: bool = False
+    subscribed_topic: str = ""
+    timestamp: float = 0.0
+
+
+def topic_matches(sub_filter: str, topic: str) -> bool:
+    """Return if an MQTT topic matches a subscription filter."""
+    filter_parts = sub_filter.split("/")
+    topic_parts = topic.split("/")
+    for index, part in enumerate(filter_parts):
+        if part == "#":
+            return True
+        if index >= len(topic_parts):
+            return False
+        if part not in ("+", topic_parts[index]):
+            return False
+    return len(filter_parts) == len(topic_parts)
+
+
+class FakeMqtt:
+    """In-process stand-in for the MQTT client of Home Assistant."""
+
+    def __init__(self) -> None:
+        """Initialize stand-in."""
+        self.subscriptions: dict[str, list[Callable[[Any], None]]] = {}
+        self.subscribe_calls = 0
+
+    async def async_subscribe(
+        self,
+        hass: HomeAssistant,
+        topic: str,
+        msg_callback: Callable[[Any], None],
+        qos: int = 0,
+        encoding: str | None = "utf-8",
+    ) -> Callable[[], None]:
+        """Subscribe to a topic filter."""
+        self.subscribe_calls += 1
+        self.subscriptions.setdefault(topic, []).append(msg_callback)
+
+        @callback
+        def _unsubscribe() -> None:
+            self.subscriptions[topic].remove(msg_callback)
+            if not self.subscriptions[topic]:
+                del self.subscriptions[topic]
+
+        return _unsubscribe
+
+    @callback
+    def publish(self, topic: str, payload: str, retain: bool = False) -> None:
+        """Deliver a message to all matching subscriptions."""
+        for sub_filter, callbacks in list(self.subscriptions.items()):
+            if not topic_matches(sub_filter, topic):
+                continue
+            message = FakeMessage(
+                topic, payload, retain=retain, subscribed_topic=sub_filter
+            )
+            for msg_callback in list(callbacks):
+                msg_callback(message)
+
+
+@dataclass
+class SyntheticFleet:
+    """Synthetic MQTT devices in the device registry."""
+
+    device_ids: list[str] = field(default_factory=list)
+    topics: dict[str, str] = field(default_factory=dict)
+    # Debug info of all MQTT entities, as kept by the MQTT integration
+    debug_info_entities: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+    def info_for_device(self, hass: HomeAssistant, device_id: str) -> dict[str, Any]:
+        """Return MQTT debug info shaped like the MQTT integration does."""
+        topic = self.topics.get(device_id)
+        if topic is None:
+            return {"entities": [], "triggers": []}
+        state_topic = topic.rsplit("/", 1)[0]
+        bridge_topic = f"{topic.split('/', 1)[0]}/bridge/state"
+        return {
+            "entities": [
+                {
+                    "entity_id": f"sensor.{device_id}_{key}",
+                    "subscriptions": [
+                        {"topic": bridge_topic, "messages": []},
+                        {"topic": topic, "messages": []},
+                        {"topic": state_topic, "messages": []},
+                    ],
+                    "discovery_data": {
+                        "topic": f"homeassistant/sensor/{device_id}/{key}/config",
+                        "payload": {
+                            "availability": [
+                                {"topic": bridge_topic},
+                                {"topic": topic},
+                            ],
+                        },
+                    },
+                    "transmitted": [],
+                }
+                for key in ("battery", "linkquality", "last_seen")
+            ],
+            "triggers": [],
+        }
+
+
+class LoopLagProbe:
+    """Measure the longest time the event loop was blocked."""
+
+    def __init__(self, interval: float = 0.001) -> None:
+        """Initialize probe."""
+        self.interval = interval
+        self.max_lag = 0.0
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.max_lag = max(self.max_lag, loop.time() - start - self.interval)
+
+    async def __aenter__(self) -> LoopLagProbe:
+        """Start probing."""
+        self._task = asyncio.create_task(self._run())
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        """Stop probing."""
+        # Let the probe observe the last blocking stretch
+        await asyncio.sleep(self.interval * 2)
+        assert self._task is not None
+        self._task.cancel()
+
+
+def make_config_entry(**kwargs: Any) -> ConfigEntry:
+    """Create a config entry, passing only arguments this core version knows."""
+    defaults: dict[str, Any] = {
+        "version": 1,
+        "minor_version": 1,
+        "options": {},
+        "source": "user",
+        "unique_id": None,
+        "discovery_keys": MappingProxyType({}),
+        "subentries_data": None,
+    }
+    params = inspect.signature(ConfigEntry).parameters
+    return ConfigEntry(
+        **{
+            key: value
+            for key, value in {**defaults, **kwargs}.items()
+            if key in params
+        }
+    )
+
+
+@contextmanager
+def patch_mqtt(
+    hass: HomeAssistant, mqtt: FakeMqtt, fleet: SyntheticFleet
+) -> Iterator[None]:
+    """Route the integration MQTT calls to the stand-in."""
+
+    async def _async_wait_for_mqtt_client(hass: HomeAssistant) -> bool:
+        return True
+
+    package = "custom_components.mqtt_connection_state"
+    with ExitStack() as stack:
+        for target, new in (
+            (f"{package}.async_subscribe", mqtt.async_subscribe),
+            (f"{package}.coordinator.async_subscribe", mqtt.async_subscribe),
+            (f"{package}.async_wait_for_mqtt_client", _async_wait_for_mqtt_client),
+            (f"{package}.helpers.debug_info.info_for_device", fleet.info_for_device),
+        ):
+            stack.enter_context(patch(target, new))
+        stack.enter_context(
+            patch.dict(
+                hass.data,
+                {"mqtt": SimpleNamespace(debug_info_entities=fleet.debug_info_entities)},
+            )
+        )
+        yield
+
+
+async def async_create_hass(config_dir: str) -> HomeAssistant:
+    """Create a Home Assistant core with registries and config entries."""
+    hass = HomeAssistant(config_dir)
+    await bootstrap.async_load_base_functionality(hass)
+    hass.config_entries = ConfigEntries(hass, {})
+    await hass.config_entries.async_initialize()
+    return hass
+
+
+@callback
+def async_create_fleet(
+    hass: HomeAssistant,
+    size: int,
+    *,
+    with_topic: float = 1.0,
+    topics: list[str] | None = None,
+) -> SyntheticFleet:
+    """Add size MQTT devices to the device registry.
+
+    The fraction with_topic of them publishes an availability topic. With
+    topics, one device is added per given availability topic instead.
+    """
+    if topics is not None:
+        size = len(topics)
+    mqtt_entry = make_config_entry(domain="mqtt", title="MQTT", data={})
+    hass.config_entries._entries[mqtt_entry.entry_id] = mqtt_entry  # noqa: SLF001
+
+    device_registry = dr.async_get(hass)
+    entity_registry = er.async_get(hass)
+    fleet = SyntheticFleet()
+    with_topic_count = int(size * with_topic)
+    for number in range(size):
+        device = device_registry.async_get_or_create(
+            config_entry_id=mqtt_entry.entry_id,
+            identifiers={("mqtt", f"bench_{number}")},
+            name=f"Device {number}",
+            manufacturer="Bench",
+            model=f"Model {number % 10}",
+        )
+        fleet.device_ids.append(device.id)
+        if topics is not None:
+            fleet.topics[device.id] = topics[number]
+        elif number < with_topic_count:
+            fleet.topics[device.id] = f"{BASE_TOPIC}/device_{number}/availability"
+
+        for entity in fleet.info_for_device(hass, device.id)["entities"]:
+            entity_entry = entity_registry.async_get_or_create(
+                "sensor",
+                "mqtt",
+                entity["entity_id"],
+                config_entry=mqtt_entry,
+                device_id=device.id,
+            )
+            fleet.debug_info_entities[entity_entry.entity_id] = {
+                "subscriptions": {
+                    sub["topic"]: {"count": 1, "messages": []}
+                    for sub in entity["subscriptions"]
+                },
+                "discovery_data": {},
+                "transmitted": {},
+            }
+    return fleet
+
+
+async def async_setup(
+    hass: HomeAssistant, options: dict[str, Any] | None = None
+) -> None:
+    """Set up the integration with YAML options, mqtt must be patched."""
+    config = CONFIG_SCHEMA({DOMAIN: options}) if options else {}
+    await async_setup_integration(hass, config)
+
+
+async def async_add_entities(
+    hass: HomeAssistant, fleet: SyntheticFleet
+) -> list[MqttConnectionSensorEntity]:
+    """Add one connection sensor per device with a topic, one entry each."""
+    platform = EntityPlatform(
+        hass=hass,
+        logger=_LOGGER,
+        domain="binary_sensor",
+        platform_name=DOMAIN,
+        platform=None,
+        scan_interval=timedelta(seconds=30),
+        entity_namespace=None,
+    )
+    entities: list[MqttConnectionSensorEntity] = []
+    for device_id, topic in fleet.topics.items():
+        entry = make_config_entry(
+            domain=DOMAIN,
+            title=device_id,
+            data={CONF_DEVICE_ID: device_id, CONF_TOPIC: topic},
+        )
+        entities.append(MqttConnectionSensorEntity(hass, entry, device_id, entry.data))
+    # Added without a config entry, so without device entry. Entities look
+    # up their device name in the device registry instead.
+    await platform.async_add_entities(entities)
+    return entities
+
+
+def timed() -> Callable[[], float]:
+    """Return a function that returns the seconds since this call."""
+    start = time.perf_counter()
+    return lambda: time.perf_counter() - start
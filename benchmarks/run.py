@@ -0,0 +1,316 @@
+"""Run the benchmark suite and write machine readable results.
+
+Usage: python -m benchmarks.run [--sizes 100 1000 10000] [--output results.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import tracemalloc
+from typing import Any
+from unittest.mock import patch
+
+from homeassistant.const import __version__ as HA_VERSION
+from homeassistant.core import HomeAssistant
+
+from custom_components.mqtt_connection_state import async_setup_entry
+from custom_components.mqtt_connection_state.const import (
+    CONF_DEVICE_ID,
+    CONF_TOPIC,
+    DOMAIN,
+    VERSION,
+)
+from custom_components.mqtt_connection_state.discovery import (
+    async_discover_devices,
+    async_get_discovery_index,
+)
+from custom_components.mqtt_connection_state.helpers import find_connection_topic
+
+from .harness import (
+    FakeMqtt,
+    LoopLagProbe,
+    SyntheticFleet,
+    async_add_entities,
+    async_create_fleet,
+    async_create_hass,
+    async_setup,
+    make_config_entry,
+    patch_mqtt,
+    timed,
+)
+
+DEFAULT_SIZES = [100, 1000, 10000]
+MESSAGE_ROUNDS = 5
+
+Scenario = Callable[[HomeAssistant, FakeMqtt, SyntheticFleet], Awaitable[dict[str, Any]]]
+
+
+async def bench_messages(
+    hass: HomeAssistant, mqtt: FakeMqtt, fleet: SyntheticFleet
+) -> dict[str, Any]:
+    """Measure messages per second through the entity message handling."""
+    await async_setup(hass)
+    subscribe_calls = mqtt.subscribe_calls
+    await async_add_entities(hass, fleet)
+    subscribe_calls = mqtt.subscribe_calls - subscribe_calls
+    topics = list(fleet.topics.values())
+
+    def _publish_round(payload: str) -> float:
+        elapsed = timed()
+        for topic in topics:
+            mqtt.publish(topic, payload)
+        return elapsed()
+
+    # Every message is a state change
+    change_times = [
+        _publish_round('{"state":"offline"}' if number % 2 else '{"state":"online"}')
+        for number in range(MESSAGE_ROUNDS)
+    ]
+    await hass.async_block_till_done()
+    # Every message repeats the current state
+    repeat_times = [_publish_round('{"state":"online"}') for _ in range(MESSAGE_ROUNDS)]
+    await hass.async_block_till_done()
+
+    return {
+        "entities": len(topics),
+        "subscribe_calls": subscribe_calls,
+        "change_msgs_per_sec": len(topics) / statistics.median(change_times),
+        "repeat_msgs_per_sec": len(topics) / statistics.median(repeat_times),
+    }
+
+
+async def bench_allocations(
+    hass: HomeAssistant, mqtt: FakeMqtt, fleet: SyntheticFleet
+) -> dict[str, Any]:
+    """Measure memory allocated per message with tracemalloc.
+
+    Peak is the largest amount allocated while handling one message, net is
+    what is still allocated after all messages were handled.
+    """
+    await async_setup(hass)
+    await async_add_entities(hass, fleet)
+    topics = list(fleet.topics.values())
+    # Warm up lookups and caches
+    for topic in topics:
+        mqtt.publish(topic, "online")
+    await hass.async_block_till_done()
+
+    def _measure(payload: str) -> dict[str, float]:
+        peaks = 0
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        for topic in topics:
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            mqtt.publish(topic, payload)
+            peaks += tracemalloc.get_traced_memory()[1] - current
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            "peak_bytes_per_msg": peaks / len(topics),
+            "net_bytes_per_msg": (after - before) / len(topics),
+        }
+
+    repeat = _measure("online")
+    change = _measure("offline")
+    await hass.async_block_till_done()
+    return {
+        "entities": len(topics),
+        "repeat": repeat,
+        "change": change,
+    }
+
+
+async def bench_retained_burst(
+    hass: HomeAssistant, mqtt: FakeMqtt, fleet: SyntheticFleet
+) -> dict[str, Any]:
+    """Measure a retained replay of all topics, as after a reconnect."""
+    await async_setup(hass)
+    await async_add_entities(hass, fleet)
+    topics = list(fleet.topics.values())
+    stats = hass.data[DOMAIN]["stats"]
+
+    async with LoopLagProbe() as probe:
+        elapsed = timed()
+        for topic in topics:
+            mqtt.publish(topic, '{"state":"online"}', retain=True)
+        publish = elapsed()
+        # Wait for the batched writes
+        while stats.counters.get("batched_writes", 0) < len(topics):
+            await asyncio.sleep(0.05)
+        total = elapsed()
+
+    return {
+        "entities": len(topics),
+        "publish_sec": publish,
+        "until_written_sec": total,
+        "max_loop_block_sec": probe.max_lag,
+        "state_writes": stats.timing("state_write").count,
+    }
+
+
+async def bench_discovery(
+    hass: HomeAssistant, mqtt: FakeMqtt, fleet: SyntheticFleet
+) -> dict[str, Any]:
+    """Measure wall time and loop blocking of a full discovery run."""
+    await async_setup(hass)
+
+    async with LoopLagProbe() as probe:
+        elapsed = timed()
+        discovered = await async_discover_devices(hass)
+        first_run = elapsed()
+    first_block = probe.max_lag
+
+    async with LoopLagProbe() as probe:
+        elapsed = timed()
+        await async_discover_devices(hass)
+        second_run = elapsed()
+
+    return {
+        "discovered": len(discovered),
+        "first_run_sec": first_run,
+        "first_run_max_loop_block_sec": first_block,
+        "second_run_sec": second_run,
+        "second_run_max_loop_block_sec": probe.max_lag,
+        "candidates": len(async_get_discovery_index(hass).candidates),
+    }
+
+
+async def bench_find_topic(
+    hass: HomeAssistant, mqtt: FakeMqtt, fleet: SyntheticFleet
+) -> dict[str, Any]:
+    """Measure find_connection_topic latency per device, via the index and cached."""
+    await async_setup(hass)
+    device_ids = list(fleet.topics)
+
+    def _per_call(use_cache: bool) -> float:
+        elapsed = timed()
+        for device_id in device_ids:
+            find_connection_topic(hass, device_id, log=False, use_cache=use_cache)
+        return elapsed() / len(device_ids)
+
+    # First pass builds the index and fills the cache, second pass hits the cache
+    indexed = _per_call(True)
+    cached = _per_call(True)
+    per_device = _per_call(False)
+    return {
+        "per_device_usec_per_call": per_device * 1e6,
+        "indexed_usec_per_call": indexed * 1e6,
+        "cached_usec_per_call": cached * 1e6,
+        "cache": hass.data[DOMAIN]["topic_cache"].stats,
+        "index": hass.data[DOMAIN]["topic_index"].stats,
+    }
+
+
+async def bench_setup_entry(
+    hass: HomeAssistant, mqtt: FakeMqtt, fleet: SyntheticFleet
+) -> dict[str, Any]:
+    """Measure async_setup_entry for one entry per device.
+
+    Platform forwarding is excluded, entity setup is in the messages scenario.
+    """
+    await async_setup(hass)
+    entries = []
+    for device_id, topic in fleet.topics.items():
+        entry = make_config_entry(
+            domain=DOMAIN,
+            title=f"Device {device_id}",
+            data={CONF_DEVICE_ID: device_id, CONF_TOPIC: topic},
+        )
+        hass.config_entries._entries[entry.entry_id] = entry  # noqa: SLF001
+        entries.append(entry)
+
+    async def _async_forward_entry_setups(*args: Any) -> None:
+        return None
+
+    with patch.object(
+        hass.config_entries,
+        "async_forward_entry_setups",
+        _async_forward_entry_setups,
+    ):
+        async with LoopLagProbe() as probe:
+            elapsed = timed()
+            for entry in entries:
+                await async_setup_entry(hass, entry)
+            total = elapsed()
+
+    return {
+        "entries": len(entries),
+        "total_sec": total,
+        "usec_per_entry": total / len(entries) * 1e6,
+        "max_loop_block_sec": probe.max_lag,
+    }
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "messages": bench_messages,
+    "retained_burst": bench_retained_burst,
+    "allocations": bench_allocations,
+    "discovery": bench_discovery,
+    "find_topic": bench_find_topic,
+    "setup_entry": bench_setup_entry,
+}
+
+
+async def async_run_scenario(name: str, size: int) -> dict[str, Any]:
+    """Run one scenario for a fleet size in a fresh core."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_create_hass(config_dir)
+        mqtt = FakeMqtt()
+        fleet = async_create_fleet(hass, size)
+        try:
+            with patch_mqtt(hass, mqtt, fleet):
+                result = await SCENARIOS[name](hass, mqtt, fleet)
+        finally:
+            await hass.async_stop(force=True)
+    return {"scenario": name, "devices": size, **result}
+
+
+async def async_main(args: argparse.Namespace) -> dict[str, Any]:
+    """Run all selected scenarios."""
+    results = [
+        await async_run_scenario(name, size)
+        for name in args.scenarios
+        for size in args.sizes
+    ]
+    return {
+        "meta": {
+            "integration_version": VERSION,
+            "homeassistant_version": HA_VERSION,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "date": datetime.now(UTC).isoformat(),
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    """Parse arguments and run the suite."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(async_main(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="UTF-8") as file:
+            file.write(output)
+    else:
+        sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
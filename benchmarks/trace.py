@@ -0,0 +1,419 @@
+"""Record MQTT availability traffic and replay it through the integration.
+
+Usage:
+    python -m benchmarks.trace record --host broker --output trace.jsonl.gz
+    python -m benchmarks.trace replay trace.jsonl.gz [--speed 1|10|max]
+
+A trace holds a header line followed by one JSON array per message:
+[seconds since the start of the recording, topic, payload, retain]. Files
+ending in .gz are compressed.
+
+Recording needs paho-mqtt, which comes with the MQTT integration of Home
+Assistant. Replaying runs against the in-process MQTT stand-in of the
+benchmark harness, no broker is needed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import UTC, datetime
+import gzip
+import json
+import platform
+import sys
+import tempfile
+import threading
+import time
+from typing import IO, Any
+
+from homeassistant.const import MATCH_ALL, __version__ as HA_VERSION
+from homeassistant.core import Event, HomeAssistant, callback
+
+from custom_components.mqtt_connection_state.const import (
+    CONF_TOPIC_PATTERNS,
+    CONF_WRITE_BATCH_WINDOW,
+    DEFAULT_TOPIC_PATTERNS,
+    DOMAIN,
+    VERSION,
+)
+from custom_components.mqtt_connection_state.helpers import TopicMatcher
+
+from .harness import (
+    FakeMqtt,
+    async_add_entities,
+    async_create_fleet,
+    async_create_hass,
+    async_setup,
+    patch_mqtt,
+    timed,
+)
+
+TRACE_FORMAT = "mqtt_connection_state_trace"
+TRACE_VERSION = 1
+BRIDGE_STATE_SUFFIX = "/bridge/state"
+# Messages published at maximum speed before yielding to the event loop
+MAX_SPEED_BATCH = 100
+
+
+@contextmanager
+def open_trace(path: str, mode: str) -> Iterator[IO[str]]:
+    """Open a trace file for text reading or writing, gzip by extension."""
+    if path.endswith(".gz"):
+        with gzip.open(path, mode + "t", encoding="UTF-8") as file:
+            yield file
+    else:
+        with open(path, mode, encoding="UTF-8") as file:
+            yield file
+
+
+@dataclass(slots=True)
+class TraceMessage:
+    """One recorded MQTT message."""
+
+    offset: float
+    topic: str
+    payload: str
+    retain: bool
+
+
+def read_trace(path: str) -> tuple[dict[str, Any], list[TraceMessage]]:
+    """Return the header and the messages of a trace file."""
+    with open_trace(path, "r") as file:
+        header = json.loads(file.readline())
+        if header.get("format") != TRACE_FORMAT:
+            raise ValueError(f"Not a trace file: {path}")
+        messages = [
+            TraceMessage(offset, topic, payload, bool(retain))
+            for offset, topic, payload, retain in (
+                json.loads(line) for line in file if line.strip()
+            )
+        ]
+    messages.sort(key=lambda message: message.offset)
+    return header, messages
+
+
+def is_recorded(matcher: TopicMatcher, topic: str) -> bool:
+    """Return if a topic is availability or bridge state traffic."""
+    return topic.endswith(BRIDGE_STATE_SUFFIX) or matcher.rank(topic) is not None
+
+
+def record(args: argparse.Namespace) -> None:
+    """Record matching messages from a broker until the duration passed."""
+    try:
+        import paho.mqtt.client as paho  # noqa: PLC0415
+    except ImportError:
+        sys.exit("Recording needs paho-mqtt: pip install paho-mqtt")
+
+    matcher = TopicMatcher(args.topic_patterns)
+    lock = threading.Lock()
+    counts = {"messages": 0, "topics": 0}
+    topics: set[str] = set()
+
+    with open_trace(args.output, "w") as file:
+        file.write(
+            json.dumps(
+                {
+                    "format": TRACE_FORMAT,
+                    "version": TRACE_VERSION,
+                    "started": datetime.now(UTC).isoformat(),
+                    "topic_patterns": matcher.patterns,
+                    "all_topics": args.all_topics,
+                }
+            )
+            + "\n"
+        )
+        start = time.monotonic()
+
+        def _on_message(client: Any, userdata: Any, message: Any) -> None:
+            if not args.all_topics and not is_recorded(matcher, message.topic):
+                return
+            line = json.dumps(
+                [
+                    round(time.monotonic() - start, 3),
+                    message.topic,
+                    message.payload.decode("UTF-8", errors="replace"),
+                    int(message.retain),
+                ],
+                separators=(",", ":"),
+            )
+            with lock:
+                file.write(line + "\n")
+                counts["messages"] += 1
+                if message.topic not in topics:
+                    topics.add(message.topic)
+                    counts["topics"] += 1
+
+        def _on_connect(client: Any, *_: Any) -> None:
+            # The broker replays retained messages, as after a HA restart
+            client.subscribe("#")
+
+        if hasattr(paho, "CallbackAPIVersion"):
+            client = paho.Client(paho.CallbackAPIVersion.VERSION2)
+        else:
+            client = paho.Client()
+        if args.username:
+            client.username_pw_set(args.username, args.password)
+        client.on_connect = _on_connect
+        client.on_message = _on_message
+        client.connect(args.host, args.port)
+        client.loop_start()
+        try:
+            if args.duration:
+                time.sleep(args.duration)
+            else:
+                threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            client.disconnect()
+            client.loop_stop()
+
+    sys.stderr.write(
+        f"Recorded {counts['messages']} messages on {counts['topics']} topics\n"
+    )
+
+
+class ReplayRecorder:
+    """Collect loop lag, state writes, bus events and messages per second."""
+
+    def __init__(self, hass: HomeAssistant, interval: float = 0.005) -> None:
+        """Initialize recorder."""
+        self.hass = hass
+        self.interval = interval
+        self.messages = 0
+        self.seconds: list[dict[str, Any]] = []
+        self.event_types: dict[str, int] = {}
+        self._events = 0
+        self._max_lag = 0.0
+        self._last = {"messages": 0, "state_writes": 0, "bus_events": 0}
+        self._task: asyncio.Task | None = None
+        self._unsub_events: Any = None
+        self._write_timing = hass.data[DOMAIN]["stats"].timing("state_write")
+
+    @callback
+    def _async_count_event(self, event: Event) -> None:
+        self._events += 1
+        self.event_types[event.event_type] = (
+            self.event_types.get(event.event_type, 0) + 1
+        )
+
+    def _close_second(self) -> None:
+        totals = {
+            "messages": self.messages,
+            "state_writes": self._write_timing.count,
+            "bus_events": self._events,
+        }
+        self.seconds.append(
+            {
+                "second": len(self.seconds),
+                **{key: totals[key] - self._last[key] for key in totals},
+                "max_loop_lag_ms": round(self._max_lag * 1e3, 3),
+            }
+        )
+        self._last = totals
+        self._max_lag = 0.0
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        second_end = loop.time() + 1
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            now = loop.time()
+            self._max_lag = max(self._max_lag, now - start - self.interval)
+            while now >= second_end:
+                self._close_second()
+                second_end += 1
+
+    async def __aenter__(self) -> ReplayRecorder:
+        """Start recording."""
+        # Writes of the initial states are not part of the replay
+        self._last["state_writes"] = self._write_timing.count
+        self._unsub_events = self.hass.bus.async_listen(
+            MATCH_ALL, self._async_count_event
+        )
+        self._task = asyncio.create_task(self._run())
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        """Stop recording, the last partial second is kept."""
+        assert self._task is not None
+        self._task.cancel()
+        self._unsub_events()
+        self._close_second()
+
+
+async def async_replay(
+    header: dict[str, Any],
+    messages: list[TraceMessage],
+    speed: float | None,
+    options: dict[str, Any],
+) -> dict[str, Any]:
+    """Replay messages through the integration, speed None is maximum speed."""
+    matcher = TopicMatcher(
+        options.get(CONF_TOPIC_PATTERNS)
+        or header.get("topic_patterns")
+        or DEFAULT_TOPIC_PATTERNS
+    )
+    # One device per availability topic in the trace
+    topics = sorted(
+        {
+            message.topic
+            for message in messages
+            if not message.topic.endswith(BRIDGE_STATE_SUFFIX)
+            and matcher.rank(message.topic) is not None
+        }
+    )
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_create_hass(config_dir)
+        mqtt = FakeMqtt()
+        fleet = async_create_fleet(hass, 0, topics=topics)
+        try:
+            with patch_mqtt(hass, mqtt, fleet):
+                await async_setup(hass, options)
+                await async_add_entities(hass, fleet)
+                await hass.async_block_till_done()
+                result = await _async_replay_messages(hass, mqtt, messages, speed)
+        finally:
+            await hass.async_stop(force=True)
+
+    return {"devices": len(topics), **result}
+
+
+async def _async_replay_messages(
+    hass: HomeAssistant,
+    mqtt: FakeMqtt,
+    messages: list[TraceMessage],
+    speed: float | None,
+) -> dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    stats = hass.data[DOMAIN]["stats"]
+
+    async with ReplayRecorder(hass) as recorder:
+        elapsed = timed()
+        start = loop.time()
+        for number, message in enumerate(messages):
+            if speed is not None:
+                if (delay := start + message.offset / speed - loop.time()) > 0:
+                    await asyncio.sleep(delay)
+            elif number % MAX_SPEED_BATCH == 0:
+                await asyncio.sleep(0)
+            mqtt.publish(message.topic, message.payload, retain=message.retain)
+            recorder.messages += 1
+        replay = elapsed()
+
+        # Let batched writes and coalesced events land
+        window = hass.data[DOMAIN]["config"][CONF_WRITE_BATCH_WINDOW].total_seconds()
+        await asyncio.sleep(window + 0.1)
+        await hass.async_block_till_done()
+        total = elapsed()
+
+    seconds = recorder.seconds
+    return {
+        "messages": len(messages),
+        "replay_sec": replay,
+        "until_settled_sec": total,
+        "msgs_per_sec": len(messages) / replay if replay else None,
+        "max_loop_lag_ms": max(
+            (second["max_loop_lag_ms"] for second in seconds), default=0.0
+        ),
+        "peak_state_writes_per_sec": max(
+            (second["state_writes"] for second in seconds), default=0
+        ),
+        "peak_bus_events_per_sec": max(
+            (second["bus_events"] for second in seconds), default=0
+        ),
+        "state_writes_skipped": stats.counters.get("state_write_skipped", 0),
+        "batched_writes": stats.counters.get("batched_writes", 0),
+        "event_types": recorder.event_types,
+        "seconds": seconds,
+    }
+
+
+def replay(args: argparse.Namespace) -> None:
+    """Replay a trace file and write the report."""
+    header, messages = read_trace(args.trace)
+    speed = None if args.speed == "max" else float(args.speed)
+    options = json.loads(args.options) if args.options else {}
+
+    result = asyncio.run(async_replay(header, messages, speed, options))
+    report = {
+        "meta": {
+            "integration_version": VERSION,
+            "homeassistant_version": HA_VERSION,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "date": datetime.now(UTC).isoformat(),
+            "trace": args.trace,
+            "trace_started": header.get("started"),
+            "speed": args.speed,
+            "options": options,
+        },
+        **result,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="UTF-8") as file:
+            file.write(output)
+    else:
+        sys.stdout.write(output + "\n")
+
+
+def _speed(value: str) -> str:
+    if value != "max" and float(value) <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or max")
+    return value
+
+
+def main() -> None:
+    """Parse arguments and record or replay."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="Record traffic from a broker")
+    record_parser.add_argument("--host", default="localhost")
+    record_parser.add_argument("--port", type=int, default=1883)
+    record_parser.add_argument("--username")
+    record_parser.add_argument("--password")
+    record_parser.add_argument(
+        "--duration", type=float, help="Seconds to record, until Ctrl+C when omitted"
+    )
+    record_parser.add_argument(
+        "--topic-patterns",
+        nargs="+",
+        default=DEFAULT_TOPIC_PATTERNS,
+        help="Connection topic patterns to record, bridge state is always recorded",
+    )
+    record_parser.add_argument(
+        "--all-topics",
+        action="store_true",
+        help="Record all topics, needed to replay heartbeat mode",
+    )
+    record_parser.add_argument("--output", required=True)
+    record_parser.set_defaults(func=record)
+
+    replay_parser = commands.add_parser("replay", help="Replay a trace file")
+    replay_parser.add_argument("trace")
+    replay_parser.add_argument(
+        "--speed", type=_speed, default="1", help="1, 10, any factor, or max"
+    )
+    replay_parser.add_argument(
+        "--options", help='Integration options as JSON, e.g. {"heartbeat_timeout": 60}'
+    )
+    replay_parser.add_argument("--output", help="Write JSON report to this file")
+    replay_parser.set_defaults(func=replay)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,12 @@
 
 from __future__ import annotations
 
+import asyncio
+from contextlib import suppress
+from datetime import timedelta
 import json
 import logging
+from time import perf_counter
 from typing import Any
 
 import voluptuous as vol
@@ -13,8 +17,8 @@ from homeassistant.components.mqtt import (
     async_wait_for_mqtt_client,
     models,
 )
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
+from homeassistant.config_entries import SOURCE_INTEGRATION_DISCOVERY, ConfigEntry
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP, Platform
 from homeassistant.core import (
     Event,
     EventStateChangedData,
@@ -24,29 +28,122 @@ from homeassistant.core import (
     SupportsResponse,
     callback,
 )
-from homeassistant.data_entry_flow import FlowResultType
+from homeassistant.data_entry_flow import FlowResultType, UnknownFlow
 from homeassistant.exceptions import HomeAssistantError
-from homeassistant.helpers import device_registry as dr, issue_registry as ir
-from homeassistant.helpers.event import (
-    async_track_device_registry_updated_event,
-    async_track_time_interval,
+from homeassistant.helpers import (
+    config_validation as cv,
+    device_registry as dr,
+    issue_registry as ir,
 )
+from homeassistant.helpers.discovery import async_load_platform
+from homeassistant.helpers.event import async_track_device_registry_updated_event
 from homeassistant.helpers.service import async_register_admin_service
 from homeassistant.helpers.typing import ConfigType
 
+from .binary_sensor import (
+    async_flush_hub_device_data,
+    async_update_hub_entities,
+)
 from .const import (
+    CONF_AVAILABILITY_STATS,
+    CONF_BRIDGES,
+    CONF_BULK_ADD_CONCURRENCY,
+    CONF_BULK_ADD_PROGRESS_INTERVAL,
+    CONF_COALESCE_WINDOW,
+    CONF_DEVICE_EVENTS,
     CONF_DEVICE_ID,
-    CONF_DISCOVERY_INTERVAL,
+    CONF_DEVICES,
+    CONF_FLAP_THRESHOLD,
+    CONF_FLAP_WINDOW,
+    CONF_FLEET_SENSORS,
+    CONF_FLEET_UPDATE_INTERVAL,
+    CONF_HEARTBEAT_TIMEOUT,
+    CONF_HISTORY_SIZE,
+    CONF_MIN_STATE_DURATION,
+    CONF_OFFLINE_GRACE,
     CONF_TOPIC,
+    CONF_TOPIC_PATTERNS,
+    CONF_WRITE_BATCH_WINDOW,
+    DEFAULT_COALESCE_WINDOW,
+    DEFAULT_FLAP_WINDOW,
+    DEFAULT_FLEET_UPDATE_INTERVAL,
+    DEFAULT_HISTORY_SIZE,
+    DEFAULT_TOPIC_PATTERNS,
+    DEFAULT_WRITE_BATCH_WINDOW,
     DOMAIN,
     SERV_ADD_NEW_DEVICES,
 )
-from .discovery import async_discover_devices, async_trigger_discovery
+from .discovery import (
+    async_add_hub_devices,
+    async_get_discovery_index,
+    async_get_hub_entry,
+    async_get_hub_orphans,
+    async_setup_discovery,
+)
+from .helpers import async_setup_topic_cache, validate_topic_pattern
+from .history import async_setup_history
 from .services import async_setup_services
+from .stats import async_get_stats
+from .timers import async_get_timer_heap
 
 _LOGGER = logging.getLogger(__name__)
 
-SCHEMA_NEW_CONFIG_ENTRY = vol.Schema({vol.Required("list"): str})
+SCHEMA_NEW_CONFIG_ENTRY = vol.Schema({vol.Required("list"): vol.Any(str, list)})
+
+CONFIG_SCHEMA = vol.Schema(
+    {
+        DOMAIN: vol.Schema(
+            {
+                vol.Optional(
+                    CONF_COALESCE_WINDOW, default=DEFAULT_COALESCE_WINDOW
+                ): cv.time_period,
+                vol.Optional(CONF_DEVICE_EVENTS, default=True): cv.boolean,
+                vol.Optional(
+                    CONF_OFFLINE_GRACE, default=timedelta(0)
+                ): cv.time_period,
+                vol.Optional(
+                    CONF_MIN_STATE_DURATION, default=timedelta(0)
+                ): cv.time_period,
+                vol.Optional(CONF_FLAP_THRESHOLD, default=0): cv.positive_int,
+                vol.Optional(
+                    CONF_FLAP_WINDOW, default=DEFAULT_FLAP_WINDOW
+                ): cv.time_period,
+                vol.Optional(
+                    CONF_WRITE_BATCH_WINDOW, default=DEFAULT_WRITE_BATCH_WINDOW
+                ): cv.time_period,
+                vol.Optional(
+                    CONF_HISTORY_SIZE, default=DEFAULT_HISTORY_SIZE
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Optional(CONF_AVAILABILITY_STATS, default=False): cv.boolean,
+                vol.Optional(CONF_FLEET_SENSORS, default=True): cv.boolean,
+                vol.Optional(
+                    CONF_HEARTBEAT_TIMEOUT, default=timedelta(0)
+                ): cv.time_period,
+                vol.Optional(
+                    CONF_TOPIC_PATTERNS, default=DEFAULT_TOPIC_PATTERNS
+                ): vol.All(
+                    cv.ensure_list,
+                    [vol.All(cv.string, validate_topic_pattern)],
+                    vol.Length(min=1),
+                ),
+                vol.Optional(
+                    CONF_FLEET_UPDATE_INTERVAL, default=DEFAULT_FLEET_UPDATE_INTERVAL
+                ): cv.time_period,
+                vol.Optional(CONF_BRIDGES, default={}): {
+                    cv.string: vol.Schema(
+                        {
+                            vol.Optional(CONF_COALESCE_WINDOW): cv.time_period,
+                            vol.Optional(CONF_FLEET_UPDATE_INTERVAL): cv.time_period,
+                            vol.Optional(CONF_HEARTBEAT_TIMEOUT): cv.time_period,
+                            vol.Optional(CONF_WRITE_BATCH_WINDOW): cv.time_period,
+                        }
+                    )
+                },
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
 
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
@@ -57,33 +154,51 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     if hass.data[DOMAIN].get("_initialized"):  # already setup
         return True
     hass.data[DOMAIN]["_initialized"] = True
-
-    if "new_devices" not in hass.data[DOMAIN]:
-        hass.data[DOMAIN]["new_devices"] = []
-    if "seen_device_ids" not in hass.data[DOMAIN]:
-        hass.data[DOMAIN]["seen_device_ids"] = set()
+    if (conf := config.get(DOMAIN)) is None:
+        conf = CONFIG_SCHEMA({DOMAIN: {}})[DOMAIN]
+    hass.data[DOMAIN]["config"] = conf
 
     _LOGGER.info("Setup discovery")
     if not await async_wait_for_mqtt_client(hass):
         _LOGGER.error("MQTT integration not available")
         return False
 
-    async def _async_discovery(now=None) -> None:
-        async_trigger_discovery(hass, await async_discover_devices(hass))
+    await async_setup_topic_cache(hass)
+    await async_setup_history(hass)
+
+    @callback
+    def _async_on_stop(event: Event) -> None:
+        async_get_timer_heap(hass).async_shutdown()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_on_stop)
+    discovery_debouncer = async_setup_discovery(hass)
+
+    bridge_timing = async_get_stats(hass).timing("bridge_state")
 
     @callback
     def _on_bridge_state(message: models.ReceiveMessage) -> None:
+        start = perf_counter()
+        _async_handle_bridge_state(message)
+        bridge_timing.record(perf_counter() - start)
+
+    @callback
+    def _async_handle_bridge_state(message: models.ReceiveMessage) -> None:
         try:
             payload = json.loads(message.payload)
         except ValueError:
             return
 
-        if payload["state"] == "online":
-            _LOGGER.debug(
-                "Bridge online on %s, running discovery",
-                message.topic,
-            )
-            hass.async_create_task(_async_discovery())
+        if not isinstance(payload, dict) or payload.get("state") != "online":
+            return
+
+        _LOGGER.debug(
+            "Bridge online on %s, running discovery",
+            message.topic,
+        )
+        base = message.topic.split("/", 1)[0]
+        if coordinator := hass.data[DOMAIN].get("coordinators", {}).get(base):
+            coordinator.async_bridge_online()
+        discovery_debouncer.async_schedule_call()
 
     await async_subscribe(
         hass,
@@ -91,67 +206,51 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
         _on_bridge_state,
     )
 
-    async_track_time_interval(
-        hass, _async_discovery, CONF_DISCOVERY_INTERVAL, cancel_on_shutdown=True
-    )
-
     # Register custom services in services.py
     async_setup_services(hass)
 
+    if conf[CONF_FLEET_SENSORS]:
+        hass.async_create_task(
+            async_load_platform(hass, Platform.SENSOR, DOMAIN, {}, config)
+        )
+
     async def async_handle_add_config_entry(call: ServiceCall) -> ServiceResponse:
         """Service handler for adding a config entry."""
 
         _LOGGER.debug("Run add devices action")
-        try:
-            payload = json.loads(call.data.get("list"))
-
-        except ValueError as Err:
-            raise HomeAssistantError(
-                translation_domain=DOMAIN,
-                translation_key="Invalid JSON string",
-                translation_placeholders={},
-            ) from Err
-
-        # when flow is completed, call.hass.config_entries.flow._progress is changed, first collect the id's then execute
-
-        ids: set[str] = {item["id"] for item in payload if "id" in item}
-
-        domain_entries = call.hass.config_entries.async_entries(DOMAIN)
-        configured_device_ids: set[str] = {
-            entry.data["device_id"]
-            for entry in domain_entries
-            if "device_id" in entry.data
+        payload = call.data["list"]
+        if isinstance(payload, str):
+            # JSON string as returned by list_new_devices in older versions
+            try:
+                payload = json.loads(payload)
+
+            except ValueError as Err:
+                raise HomeAssistantError(
+                    translation_domain=DOMAIN,
+                    translation_key="Invalid JSON string",
+                    translation_placeholders={},
+                ) from Err
+
+        # Accept device IDs as well as device items with an id
+        ids: set[str] = {
+            item if isinstance(item, str) else item["id"]
+            for item in payload
+            if isinstance(item, str) or (isinstance(item, dict) and "id" in item)
         }
-        configured_ids = ids & configured_device_ids
 
-        to_configure: list[dict] = []
-        for flow in list(call.hass.config_entries.flow._progress.values()): # noqa: SLF001
-            if flow.handler is not DOMAIN:
-                continue
-
-            device_id = flow.init_data.get("device_id")
-            if device_id in (ids - configured_device_ids):
-                to_configure.append(
-                    {
-                        "flow_id": flow.flow_id,
-                        "user_input": flow.init_data,
-                    }
-                )
-
-        created: set[str] = set()
-        failed: set[str] = set()
+        configured_device_ids = async_get_discovery_index(hass).configured
+        configured_ids = ids & configured_device_ids
+        to_configure = ids - configured_device_ids
 
-        for flow in to_configure:
-            result = await call.hass.config_entries.flow._async_configure(  # noqa: SLF001
-                flow["flow_id"],
-                flow["user_input"],
+        if not call.return_response:
+            # Don't block the service call, progress is reported with events
+            hass.async_create_background_task(
+                _async_add_devices(hass, to_configure),
+                f"{DOMAIN} add new devices",
             )
-            device_id = flow["user_input"].get("device_id")
+            return None
 
-            if result["type"] == FlowResultType.CREATE_ENTRY:
-                created.add(device_id)
-            else:
-                failed.add(device_id)
+        created, failed = await _async_add_devices(hass, to_configure)
 
         return {
             "response": {
@@ -177,9 +276,113 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     return True
 
 
+async def _async_add_devices(
+    hass: HomeAssistant, device_ids: set[str]
+) -> tuple[set[str], set[str]]:
+    """Create config entries for devices with bounded concurrency.
+
+    Pending discovery flows are completed, devices without one get a new flow.
+    With a hub, the devices are added to the hub instead.
+    """
+    # Pending discovery flows by device ID, their unique ID
+    pending_flows: dict[str, str] = {
+        flow["context"]["unique_id"]: flow["flow_id"]
+        for flow in hass.config_entries.flow.async_progress_by_handler(
+            DOMAIN, match_context={"source": SOURCE_INTEGRATION_DISCOVERY}
+        )
+        if flow["context"].get("unique_id") in device_ids
+    }
+    device_registry = dr.async_get(hass)
+    semaphore = asyncio.Semaphore(CONF_BULK_ADD_CONCURRENCY)
+
+    created: set[str] = set()
+    failed: set[str] = set()
+
+    @callback
+    def _async_fire_progress() -> None:
+        hass.bus.async_fire(
+            DOMAIN + "_add_progress",
+            {
+                "devices_to_configure": len(device_ids),
+                "devices_configure_success": len(created),
+                "devices_configure_fail": len(failed),
+            },
+        )
+
+    if (hub := async_get_hub_entry(hass)) is not None:
+        created = await async_add_hub_devices(hass, hub, device_ids)
+        failed = device_ids - created
+        for device_id in created & pending_flows.keys():
+            hass.config_entries.flow.async_abort(pending_flows[device_id])
+        _LOGGER.debug(
+            "Added %d of %d devices to the hub", len(created), len(device_ids)
+        )
+        _async_fire_progress()
+        return created, failed
+
+    async def _async_add_device(device_id: str) -> None:
+        # Flow started by this call, aborted when the device is not added
+        new_flow_id: str | None = None
+        async with semaphore:
+            try:
+                if (flow_id := pending_flows.get(device_id)) is None:
+                    device_entry = device_registry.async_get(device_id)
+                    result = await hass.config_entries.flow.async_init(
+                        DOMAIN,
+                        context={"source": SOURCE_INTEGRATION_DISCOVERY},
+                        data={
+                            "name": device_entry.name if device_entry else None,
+                            "manufacturer": (
+                                device_entry.manufacturer if device_entry else None
+                            ),
+                            "model": device_entry.model if device_entry else None,
+                            CONF_DEVICE_ID: device_id,
+                        },
+                    )
+                    flow_id = result.get("flow_id")
+                    if result["type"] is not FlowResultType.FORM:
+                        flow_id = None
+                    new_flow_id = flow_id
+
+                if flow_id is None:
+                    failed.add(device_id)
+                else:
+                    result = await hass.config_entries.flow.async_configure(
+                        flow_id, {}
+                    )
+                    if result["type"] is FlowResultType.CREATE_ENTRY:
+                        created.add(device_id)
+                    else:
+                        failed.add(device_id)
+            except HomeAssistantError as err:
+                _LOGGER.warning("Failed to add device %s: %s", device_id, err)
+                failed.add(device_id)
+
+            if new_flow_id is not None and device_id in failed:
+                # Finished flows are gone already
+                with suppress(UnknownFlow):
+                    hass.config_entries.flow.async_abort(new_flow_id)
+
+        done = len(created) + len(failed)
+        if done % CONF_BULK_ADD_PROGRESS_INTERVAL == 0 or done == len(device_ids):
+            _async_fire_progress()
+
+    _LOGGER.debug(
+        "Add %d devices, %d with a pending discovery flow",
+        len(device_ids),
+        len(pending_flows),
+    )
+    await asyncio.gather(*(_async_add_device(device_id) for device_id in device_ids))
+
+    return created, failed
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up a config entry."""
 
+    if CONF_DEVICES in entry.data:
+        return await _async_setup_hub_entry(hass, entry)
+
     _LOGGER.info(
         "Setup entry: %s, listening to topic: %s",
         entry.title,
@@ -188,6 +391,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     device_id = entry.data.get(CONF_DEVICE_ID)
     device_registry = dr.async_get(hass)
     device_entry = device_registry.async_get(device_id)
+    async_get_discovery_index(hass).configured.add(device_id)
 
     def _update_entry_title() -> None:
         new_device_entry = device_registry.async_get(device_id)
@@ -252,11 +456,103 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return True
 
 
+async def _async_setup_hub_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Set up a hub config entry monitoring many devices."""
+
+    _LOGGER.info(
+        "Setup hub entry: %s, monitoring %d devices",
+        entry.title,
+        len(entry.data[CONF_DEVICES]),
+    )
+    index = async_get_discovery_index(hass)
+    hub_devices: set[str] = set(entry.data[CONF_DEVICES])
+    index.configured.update(hub_devices)
+    device_registry = dr.async_get(hass)
+    issue_id = f"hub_orphans_{entry.entry_id}"
+
+    @callback
+    def _async_check_orphans() -> None:
+        """Raise one issue for all devices without primary config entry."""
+        if not (orphans := async_get_hub_orphans(hass, entry)):
+            ir.async_delete_issue(hass, DOMAIN, issue_id)
+            return
+        _LOGGER.warning("Raise issue orphaned hub devices: %d", len(orphans))
+        ir.async_create_issue(
+            hass,
+            DOMAIN,
+            issue_id=issue_id,
+            is_fixable=True,
+            severity=ir.IssueSeverity.ERROR,
+            translation_key="orphaned_hub_devices",
+            translation_placeholders={
+                "devices": ", ".join(
+                    device_entry.name or device_id
+                    if (device_entry := device_registry.async_get(device_id))
+                    else device_id
+                    for device_id in orphans
+                )
+            },
+        )
+
+    async def _async_hub_updated(hass: HomeAssistant, entry: ConfigEntry) -> None:
+        """Apply device list changes without reloading."""
+        devices = entry.data[CONF_DEVICES]
+        if devices.keys() == hub_devices:
+            # Only resolved topics or payloads changed
+            return
+        index.configured.difference_update(hub_devices.difference(devices))
+        index.configured.update(devices)
+        hub_devices.clear()
+        hub_devices.update(devices)
+        async_update_hub_entities(hass, entry)
+        _async_check_orphans()
+
+    @callback
+    def _async_device_registry_updated(
+        event: Event[dr.EventDeviceRegistryUpdatedData],
+    ) -> None:
+        device_id = event.data["device_id"]
+        if device_id not in hub_devices:
+            return
+        if (
+            event.data["action"] == "update"
+            and "primary_config_entry" in event.data["changes"]
+        ):
+            _async_check_orphans()
+            return
+        if event.data["action"] != "remove":
+            return
+        _LOGGER.info("Remove deleted device from hub: %s", device_id)
+        devices = dict(entry.data[CONF_DEVICES])
+        devices.pop(device_id, None)
+        hass.config_entries.async_update_entry(
+            entry, data={**entry.data, CONF_DEVICES: devices}
+        )
+
+    entry.async_on_unload(entry.add_update_listener(_async_hub_updated))
+    entry.async_on_unload(
+        hass.bus.async_listen(
+            dr.EVENT_DEVICE_REGISTRY_UPDATED, _async_device_registry_updated
+        )
+    )
+    # Devices may have been removed or orphaned while stopped
+    _async_check_orphans()
+
+    await hass.config_entries.async_forward_entry_setups(
+        entry, [Platform.BINARY_SENSOR]
+    )
+
+    return True
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
 
     _LOGGER.info("Unload entry")
+    # Keep the topics resolved since the last hub update
+    async_flush_hub_device_data(hass, entry)
     await hass.config_entries.async_unload_platforms(entry, [Platform.BINARY_SENSOR])
+    hass.data[DOMAIN].get("hub_entities", {}).pop(entry.entry_id, None)
 
     unsub_runtime = getattr(entry, "runtime_data", None)
     if unsub_runtime:
@@ -265,6 +561,17 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return True
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Handle removal of a config entry."""
+
+    if DOMAIN in hass.data:
+        device_ids = entry.data.get(CONF_DEVICES) or [entry.data.get(CONF_DEVICE_ID)]
+        index = async_get_discovery_index(hass)
+        index.configured.difference_update(device_ids)
+        index.async_forget_devices(device_ids)
+    ir.async_delete_issue(hass, DOMAIN, f"hub_orphans_{entry.entry_id}")
+
+
 async def async_reload_entry(
     hass: HomeAssistant,
     entry: ConfigEntry,
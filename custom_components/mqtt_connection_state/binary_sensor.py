@@ -3,9 +3,13 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import UTC, datetime, timedelta
+from collections import deque
+from collections.abc import Mapping
+from datetime import timedelta
 import json
 import logging
+import random
+from time import perf_counter
 from typing import Any
 
 from homeassistant.components.binary_sensor import (
@@ -13,20 +17,62 @@ from homeassistant.components.binary_sensor import (
     BinarySensorDeviceClass,
     BinarySensorEntity,
 )
-from homeassistant.components.mqtt import async_subscribe, models
+from homeassistant.components.mqtt import models
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import EntityCategory
-from homeassistant.core import Event, HomeAssistant, callback
-from homeassistant.helpers import device_registry as dr
+from homeassistant.const import STATE_OFF, STATE_ON, EntityCategory
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr, entity_registry as er
 from homeassistant.helpers.entity import DeviceInfo, async_generate_entity_id
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 from homeassistant.helpers.event import async_track_device_registry_updated_event
-
-from .const import CONF_DEVICE_ID, CONF_TOPIC, DOMAIN
-from .helpers import find_connection_topic
+from homeassistant.helpers.restore_state import (
+    ExtraStoredData,
+    RestoredExtraData,
+    RestoreEntity,
+)
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    CONF_AVAILABILITY_STATS,
+    CONF_DEVICE_EVENTS,
+    CONF_DEVICE_ID,
+    CONF_DEVICES,
+    CONF_FLAP_THRESHOLD,
+    CONF_FLAP_WINDOW,
+    CONF_HUB_UPDATE_DELAY,
+    CONF_MIN_STATE_DURATION,
+    CONF_OFFLINE_GRACE,
+    CONF_PAYLOAD_AVAILABLE,
+    CONF_PAYLOAD_NOT_AVAILABLE,
+    CONF_TOPIC,
+    DEFAULT_PAYLOAD_AVAILABLE,
+    DEFAULT_PAYLOAD_NOT_AVAILABLE,
+    DOMAIN,
+)
+from .coordinator import BridgeCoordinator, async_get_coordinator
+from .helpers import find_availability_payloads, find_connection_topic
+from .history import ConnectionHistory
+from .stats import async_get_stats
+from .timers import async_get_timer_heap
+from .uptime import BUCKET_SECONDS, AvailabilityStats
 
 _LOGGER = logging.getLogger(__name__)
 
+EVENT_CHANGED = DOMAIN + "_changed"
+
+# Known availability payloads, mapped to the connection state without decoding
+AVAILABILITY_PAYLOADS: dict[str, bool] = {
+    DEFAULT_PAYLOAD_AVAILABLE: True,
+    DEFAULT_PAYLOAD_NOT_AVAILABLE: False,
+    f'{{"state":"{DEFAULT_PAYLOAD_AVAILABLE}"}}': True,
+    f'{{"state":"{DEFAULT_PAYLOAD_NOT_AVAILABLE}"}}': False,
+    f'{{"state": "{DEFAULT_PAYLOAD_AVAILABLE}"}}': True,
+    f'{{"state": "{DEFAULT_PAYLOAD_NOT_AVAILABLE}"}}': False,
+    # Tasmota LWT
+    "Online": True,
+    "Offline": False,
+}
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -35,10 +81,125 @@ async def async_setup_entry(
 ) -> None:
     """Initialize from the config entry."""
     # _LOGGER.info("Initialize binary_sensor: %s", entry.title)
-    async_add_entities([MqttConnectionSensorEntity(hass, entry)])
+    if CONF_DEVICES not in entry.data:
+        async_add_entities(
+            [
+                MqttConnectionSensorEntity(
+                    hass, entry, entry.data[CONF_DEVICE_ID], entry.data
+                )
+            ]
+        )
+        return
+
+    # Hub entry, all devices are set up at once
+    hass.data[DOMAIN].setdefault("hub_entities", {})[entry.entry_id] = {
+        "add_entities": async_add_entities,
+        "entities": {},
+        "pending_data": {},
+        "unsub_flush": None,
+    }
+    async_update_hub_entities(hass, entry)
+
+
+@callback
+def async_update_hub_entities(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Add and remove hub entities to match the hub device list."""
+    hub = hass.data[DOMAIN].get("hub_entities", {}).get(entry.entry_id)
+    if hub is None:
+        return
+
+    devices: dict[str, dict[str, Any]] = entry.data[CONF_DEVICES]
+    entities: dict[str, MqttConnectionSensorEntity] = hub["entities"]
+    entity_registry = er.async_get(hass)
+
+    for device_id in entities.keys() - devices.keys():
+        entity = entities.pop(device_id)
+        _LOGGER.debug("Remove hub device: %s", entity.entity_id)
+        if entity_registry.async_get(entity.entity_id):
+            entity_registry.async_remove(entity.entity_id)
+        else:
+            hass.async_create_task(entity.async_remove())
+
+    new_entities = [
+        MqttConnectionSensorEntity(hass, entry, device_id, devices[device_id])
+        for device_id in devices.keys() - entities.keys()
+    ]
+    if not new_entities:
+        return
+
+    _LOGGER.debug("Add %d hub devices", len(new_entities))
+    entities.update((entity.device_id, entity) for entity in new_entities)
+    hub["add_entities"](new_entities)
+
+
+@callback
+def async_queue_hub_device_data(
+    hass: HomeAssistant, entry: ConfigEntry, device_id: str, device_data: dict
+) -> None:
+    """Queue resolved device data, written to the hub entry in one update.
+
+    Topics of many devices are resolved again after their bridge came online,
+    one entry update per device would copy the device list each time.
+    """
+    hub = hass.data[DOMAIN].get("hub_entities", {}).get(entry.entry_id)
+    if hub is None:
+        return
+
+    hub["pending_data"][device_id] = device_data
+    if hub["unsub_flush"] is None:
+        hub["unsub_flush"] = async_get_timer_heap(hass).async_call_at(
+            hass.loop.time() + CONF_HUB_UPDATE_DELAY,
+            lambda: async_flush_hub_device_data(hass, entry),
+        )
 
 
-class MqttConnectionSensorEntity(BinarySensorEntity):
+@callback
+def async_flush_hub_device_data(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Write the queued device data to the hub entry."""
+    hub = hass.data[DOMAIN].get("hub_entities", {}).get(entry.entry_id)
+    if hub is None:
+        return
+    if hub["unsub_flush"] is not None:
+        hub["unsub_flush"]()
+        hub["unsub_flush"] = None
+    pending: dict[str, dict] = hub["pending_data"]
+    hub["pending_data"] = {}
+
+    devices: dict[str, dict[str, Any]] = entry.data[CONF_DEVICES]
+    # Devices removed from the hub meanwhile are not added again
+    updates = {
+        device_id: device_data
+        for device_id, device_data in pending.items()
+        if device_id in devices
+    }
+    if not updates:
+        return
+    _LOGGER.debug("Update resolved data of %d hub devices", len(updates))
+    hass.config_entries.async_update_entry(
+        entry, data={**entry.data, CONF_DEVICES: {**devices, **updates}}
+    )
+
+
+async def async_reload_hub_entities(
+    hass: HomeAssistant, entry: ConfigEntry, device_ids: set[str]
+) -> None:
+    """Set up the entities of some hub devices again, keeping their entity ID."""
+    hub = hass.data[DOMAIN].get("hub_entities", {}).get(entry.entry_id)
+    if hub is None:
+        return
+
+    entities: dict[str, MqttConnectionSensorEntity] = hub["entities"]
+    await asyncio.gather(
+        *(
+            entities.pop(device_id).async_remove()
+            for device_id in device_ids
+            if device_id in entities
+        )
+    )
+    async_update_hub_entities(hass, entry)
+
+
+class MqttConnectionSensorEntity(BinarySensorEntity, RestoreEntity):
     """Binary Sensor Entity."""
 
     _attr_should_poll = False
@@ -47,68 +208,253 @@ class MqttConnectionSensorEntity(BinarySensorEntity):
     _attr_has_entity_name = True
     _attr_translation_key = "connection_state"
 
-    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        device_id: str,
+        device_data: Mapping[str, Any],
+    ) -> None:
         """Initialize Sensor."""
-        _LOGGER.debug("Setup Binary Sensor: %s", entry.title)
-
         self.hass = hass
         self.entry = entry
-        self.entity_id = async_generate_entity_id(
-            BINARY_SENSOR_DOMAIN + ".{}_connection_state", entry.title, hass=hass
-        )
-
-        device_id = entry.data[CONF_DEVICE_ID]
         self._device_id = device_id
+        self._hub = CONF_DEVICES in entry.data
 
         device_registry = dr.async_get(hass)
         device_entry = device_registry.async_get(device_id)
 
+        self._device_name: str | None = device_entry.name if device_entry else None
+
+        if self._hub:
+            name = device_entry.name if device_entry else device_id
+            self._attr_unique_id = f"{entry.entry_id}_{device_id}_connection_state"
+        else:
+            name = entry.title
+            self._attr_unique_id = f"{entry.entry_id}_connection_state"
+
+        _LOGGER.debug("Setup Binary Sensor: %s", name)
+        self.entity_id = async_generate_entity_id(
+            BINARY_SENSOR_DOMAIN + ".{}_connection_state", name, hass=hass
+        )
+
         self._attr_device_info = DeviceInfo(
             identifiers=device_entry.identifiers if device_entry else None,
         )
 
-        self._attr_unique_id = f"{entry.entry_id}_connection_state"
         self._attr_is_on = False
         self._attr_available = True
-        self._connection_topic: str | None = entry.data.get(CONF_TOPIC)
+        self._connection_topic: str | None = device_data.get(CONF_TOPIC)
+        self._async_update_payloads(device_data)
+
+        config = hass.data[DOMAIN]["config"]
+        self._device_events: bool = config[CONF_DEVICE_EVENTS]
+        self._offline_grace: float = config[CONF_OFFLINE_GRACE].total_seconds()
+        self._min_state_duration: float = config[
+            CONF_MIN_STATE_DURATION
+        ].total_seconds()
+        self._flap_threshold: int = config[CONF_FLAP_THRESHOLD]
+        self._flap_window: float = config[CONF_FLAP_WINDOW].total_seconds()
+
+        self._timers = async_get_timer_heap(hass)
+        self._history: ConnectionHistory = hass.data[DOMAIN]["history"]
+        self._availability = (
+            AvailabilityStats() if config[CONF_AVAILABILITY_STATS] else None
+        )
+        self._unsub_stats_refresh: CALLBACK_TYPE | None = None
+        self._raw_is_on = self._attr_is_on
+        self._raw_since = 0.0
+        self._last_change: float | None = None
+        self._unsub_pending: CALLBACK_TYPE | None = None
+        self._flap_times: deque[float] = deque(maxlen=self._flap_threshold or 1)
+        self._flapping = False
+        self._unsub_flap: CALLBACK_TYPE | None = None
+        # The coordinator tracks the last message on any topic of the device
+        self._heartbeat_expired = False
+        self._unsub_heartbeat: CALLBACK_TYPE | None = None
+        self._unsub_heartbeat_tracking: CALLBACK_TYPE | None = None
+        self._written_state: tuple[bool | None, bool, bool] | None = None
+        # Restored state not yet confirmed by a MQTT message
+        self._stale = False
+        # State in the bridge counts, None until known
+        self._fleet_state: str | None = None
+
+        stats = async_get_stats(hass)
+        self._stats = stats
+        self._message_timing = stats.timing("message")
+        self._json_timing = stats.timing("json_decode")
+        self._write_timing = stats.timing("state_write")
+        self._coordinator: BridgeCoordinator | None = None
 
         self._unsubscribe = None
         self._unsub_device = None
         self._unsub_bridge = None
         self._message_received = None
-        self._last_mqtt_message: datetime | None = None
+        # Loop time of the last message
+        self._last_mqtt_message: float | None = None
+        # Event data per state, built when added
+        self._changed_events: dict[bool, dict[str, Any]] = {}
+
+    @callback
+    def _async_update_payloads(self, data: Mapping[str, Any]) -> None:
+        """Build the payload lookup tables from the device payloads."""
+        payload_available = data.get(CONF_PAYLOAD_AVAILABLE, DEFAULT_PAYLOAD_AVAILABLE)
+        payload_not_available = data.get(
+            CONF_PAYLOAD_NOT_AVAILABLE, DEFAULT_PAYLOAD_NOT_AVAILABLE
+        )
+        # States inside a JSON payload
+        self._state_values: dict[str, bool] = {
+            payload_available: True,
+            payload_not_available: False,
+        }
+        # Raw payloads, including the custom payloads as plain text and JSON
+        self._payload_states: dict[str, bool] = {
+            **AVAILABILITY_PAYLOADS,
+            payload_available: True,
+            payload_not_available: False,
+            json.dumps({"state": payload_available}): True,
+            json.dumps({"state": payload_not_available}): False,
+        }
 
-    async def async_added_to_hass(self) -> None:
-        """Run when this Entity has been added to HA."""
-        device_registry = dr.async_get(self.hass)
+    @property
+    def device_id(self) -> str:
+        """Return the ID of the monitored device."""
+        return self._device_id
 
-        async def _async_delayed_resolve() -> None:
-            await asyncio.sleep(1)
+    @property
+    def device_name(self) -> str | None:
+        """Return the name of the monitored device."""
+        return self._device_name
 
-            new_topic = find_connection_topic(self.hass, self._device_id, log=False)
+    @property
+    def fleet_state(self) -> str | None:
+        """Return the state counted in the bridge counts."""
+        return self._fleet_state
 
-            if new_topic and new_topic != self._connection_topic:
-                _LOGGER.info(
-                    "Connection topic updated via registry: %s -> %s",
-                    self._connection_topic,
-                    new_topic,
-                )
+    @callback
+    def _async_set_fleet_state(self, state: str) -> None:
+        if self._coordinator is not None:
+            self._coordinator.async_update_count(self, self._fleet_state, state)
+        self._fleet_state = state
 
-                if self._unsubscribe:
-                    self._unsubscribe()
-                    self._unsubscribe = None
+    @property
+    def last_mqtt_message(self) -> float | None:
+        """Return the loop time of the last MQTT message received."""
+        return self._last_mqtt_message
+
+    async def async_resolve_topic(self) -> None:
+        """Re-resolve the connection topic and follow it when changed."""
+        new_topic = find_connection_topic(
+            self.hass, self._device_id, log=False, use_cache=False
+        )
 
-                self._connection_topic = new_topic
-                self.hass.config_entries.async_update_entry(
-                    self.entry,
-                    data={**self.entry.data, CONF_TOPIC: new_topic},
-                )
+        if new_topic and new_topic != self._connection_topic:
+            _LOGGER.info(
+                "Connection topic updated via registry: %s -> %s",
+                self._connection_topic,
+                new_topic,
+            )
 
-                self._unsubscribe = await async_subscribe(
-                    self.hass,
-                    new_topic,
-                    self._message_received,
-                )
+            self._async_unregister_topic()
+
+            self._connection_topic = new_topic
+            device_data = {
+                CONF_TOPIC: new_topic,
+                **find_availability_payloads(self.hass, self._device_id, new_topic),
+            }
+            self._async_update_payloads(device_data)
+            self._async_store_device_data(device_data)
+
+            await self._async_register_topic()
+
+    @callback
+    def _async_store_device_data(self, device_data: dict[str, Any]) -> None:
+        """Store the resolved topic and payloads in the config entry."""
+        if self._hub:
+            async_queue_hub_device_data(
+                self.hass, self.entry, self._device_id, device_data
+            )
+            return
+        data = {
+            key: value
+            for key, value in self.entry.data.items()
+            if key not in (CONF_PAYLOAD_AVAILABLE, CONF_PAYLOAD_NOT_AVAILABLE)
+        }
+        data.update(device_data)
+        self.hass.config_entries.async_update_entry(self.entry, data=data)
+
+    async def _async_register_topic(self) -> None:
+        """Register the connection topic with the bridge coordinator."""
+        coordinator = async_get_coordinator(self.hass, self._connection_topic)
+        self._coordinator = coordinator
+        # Added first, a retained message may be replayed while registering
+        self._unsub_bridge = coordinator.async_add_entity(self)
+        self._unsubscribe = await coordinator.async_register(
+            self._connection_topic, self._message_received
+        )
+
+        if coordinator.heartbeat_timeout:
+            # Messages on the device topics next to the connection topic
+            prefix = self._connection_topic.rpartition("/")[0]
+            self._unsub_heartbeat = await coordinator.async_register_heartbeat(
+                prefix or self._connection_topic, self._async_handle_heartbeat
+            )
+            self._unsub_heartbeat_tracking = coordinator.async_track_heartbeat(self)
+
+        _LOGGER.debug(
+            "Registered for topic %s",
+            self._connection_topic,
+        )
+
+    @callback
+    def _async_unregister_topic(self) -> None:
+        """Unregister the connection topic from the bridge coordinator."""
+        if self._unsubscribe:
+            self._unsubscribe()
+            self._unsubscribe = None
+
+        if self._unsub_bridge:
+            self._unsub_bridge()
+            self._unsub_bridge = None
+
+        if self._unsub_heartbeat:
+            self._unsub_heartbeat()
+            self._unsub_heartbeat = None
+
+        if self._unsub_heartbeat_tracking:
+            self._unsub_heartbeat_tracking()
+            self._unsub_heartbeat_tracking = None
+
+    @callback
+    def _async_handle_heartbeat(self, message: models.ReceiveMessage) -> None:
+        """Mark the device as seen, report it online again after it expired."""
+        if (
+            message.topic == self._connection_topic
+            or self._unsub_heartbeat_tracking is None
+        ):
+            # Handled as availability message, or not tracked yet
+            return
+        self._coordinator.async_heartbeat_seen(self)
+        if self._heartbeat_expired:
+            self._heartbeat_expired = False
+            _LOGGER.debug("Heartbeat of %s is back", self.entity_id)
+            self._handle_message_updates(True)
+
+    @callback
+    def async_heartbeat_expired(self) -> None:
+        """Report the device offline, it was silent for the timeout."""
+        _LOGGER.debug("No heartbeat of %s, report offline", self.entity_id)
+        self._heartbeat_expired = True
+        self._handle_message_updates(False)
+
+    async def async_added_to_hass(self) -> None:
+        """Run when this Entity has been added to HA."""
+        await self._async_restore_state()
+        device_registry = dr.async_get(self.hass)
+
+        async def _async_delayed_resolve() -> None:
+            await asyncio.sleep(1)
+            await self.async_resolve_topic()
 
         @callback
         def _on_device_registry_updated(event: Event) -> None:
@@ -119,6 +465,10 @@ class MqttConnectionSensorEntity(BinarySensorEntity):
                 return
 
             new_device_entry = device_registry.async_get(self._device_id)
+            if new_device_entry and new_device_entry.name != self._device_name:
+                self._device_name = new_device_entry.name
+                self._async_build_events()
+
             if (
                 new_device_entry.primary_config_entry if new_device_entry else None
             ) is None:
@@ -126,141 +476,339 @@ class MqttConnectionSensorEntity(BinarySensorEntity):
 
             _LOGGER.debug(
                 "Registry updated, check topic of %s",
-                self.device_entry.name,
+                self._device_name,
             )
             self.hass.async_create_task(_async_delayed_resolve())
 
-        async def _on_bridge_state(message: models.ReceiveMessage) -> None:
-            try:
-                payload = json.loads(message.payload)
-            except ValueError:
-                return
-
-            if payload["state"] == "online":
-                # if a message has been received in the last minute before bride online state don't recheck.
-                now = datetime.now(UTC)
-                if (
-                    self._last_mqtt_message
-                    and now - self._last_mqtt_message < timedelta(minutes=1)
-                ):
-                    return
-                # if a massage has been receive in the first minute after bride online state don't recheck.
-                await asyncio.sleep(59)
-                now2 = datetime.now(UTC)
-                if (
-                    self._last_mqtt_message
-                    and now2 - self._last_mqtt_message < timedelta(minutes=1)
-                ):
-                    return
-
-                _LOGGER.debug(
-                    "Bridge online on %s, check topic of %s",
-                    message.topic,
-                    self.device_entry.name,
-                )
-                self.hass.async_create_task(_async_delayed_resolve())
-
         @callback
         def message_received(message: models.ReceiveMessage) -> None:
             """Receive a MQTT message."""
-            self._last_mqtt_message = datetime.now(UTC)
+            start = perf_counter()
+            self._async_handle_message(message)
+            self._message_timing.record(perf_counter() - start)
+
+        self._message_received = message_received
+
+        self._async_build_events()
+        await self._async_register_topic()
+        # The platform writes the initial state after adding the entity
+        self._written_state = (
+            self._attr_is_on,
+            self._attr_available,
+            self._flapping,
+        )
+        self._unsub_device = async_track_device_registry_updated_event(
+            self.hass,
+            [self._device_id],
+            _on_device_registry_updated,
+        )
+        if self._availability is not None:
+            # Spread the refreshes of all devices over the bucket
+            self._async_arm_stats_refresh(random.random() * BUCKET_SECONDS)
+
+    async def _async_restore_state(self) -> None:
+        """Restore the last state, stale until a MQTT message confirms it."""
+        if (last_state := await self.async_get_last_state()) is None:
+            return
+        if last_state.state not in (STATE_ON, STATE_OFF):
+            return
+
+        self._attr_is_on = self._raw_is_on = last_state.state == STATE_ON
+        self._stale = True
+        self._fleet_state = "online" if self._attr_is_on else "offline"
+        if (extra_data := await self.async_get_last_extra_data()) is None:
+            return
+        data = extra_data.as_dict()
+        self._last_change = self._loop_time(data.get("last_change"))
+        self._last_mqtt_message = self._loop_time(data.get("last_mqtt_message"))
+        _LOGGER.debug("Restored %s: %s", self.entity_id, last_state.state)
+
+    def _loop_time(self, value: str | None) -> float | None:
+        """Convert a stored timestamp to loop time."""
+        if value is None or (moment := dt_util.parse_datetime(value)) is None:
+            return None
+        return self.hass.loop.time() - (dt_util.utcnow() - moment).total_seconds()
+
+    def _timestamp(self, loop_time: float | None) -> str | None:
+        """Convert a loop time to a stored timestamp."""
+        if loop_time is None:
+            return None
+        seconds = self.hass.loop.time() - loop_time
+        return (dt_util.utcnow() - timedelta(seconds=seconds)).isoformat()
+
+    @property
+    def extra_restore_state_data(self) -> ExtraStoredData:
+        """Return the times to restore after a restart."""
+        return RestoredExtraData(
+            {
+                "last_change": self._timestamp(self._last_change),
+                "last_mqtt_message": self._timestamp(self._last_mqtt_message),
+            }
+        )
 
+    @callback
+    def _async_build_events(self) -> None:
+        """Build the changed event data for both states.
+
+        Each change fires a copy, listeners may keep or mutate their event data.
+        """
+        self._changed_events = {
+            is_on: {
+                "state": "online" if is_on else "offline",
+                "device_id": self._device_id,
+                "device_name": self._device_name,
+                "entity_id": self.entity_id,
+            }
+            for is_on in (True, False)
+        }
+
+    @callback
+    def _async_handle_message(self, message: models.ReceiveMessage) -> None:
+        """Handle a message on the connection topic."""
+        self._last_mqtt_message = self.hass.loop.time()
+        if self._unsub_heartbeat_tracking is not None:
+            self._coordinator.async_heartbeat_seen(self)
+            self._heartbeat_expired = False
+
+        if _LOGGER.isEnabledFor(logging.DEBUG):
             _LOGGER.debug(
                 "Message received on %s: %s",
                 message.topic,
                 message.payload,
             )
 
-            if not message.payload:
-                self._handle_message_updates(None)
-                return
+        payload = message.payload
+        if not payload:
+            self._handle_message_updates(None)
+            return
 
+        # Fast path for known payloads, decode JSON only as fallback
+        is_on = self._payload_states.get(payload)
+        if is_on is None:
+            start = perf_counter()
             try:
-                payload = json.loads(message.payload)
+                data = json.loads(payload)
             except ValueError:
+                data = None
+            self._json_timing.record(perf_counter() - start)
+
+            if not isinstance(data, dict):
                 _LOGGER.warning(
-                    "Invalid JSON payload on %s: %s",
+                    "Unknown payload on %s: %s",
                     message.topic,
-                    message.payload,
+                    payload,
                 )
                 return
 
-            self._handle_message_updates(payload)
+            if not data:
+                self._handle_message_updates(None)
+                return
 
-        self._message_received = message_received
+            state = data.get("state")
+            is_on = isinstance(state, str) and self._state_values.get(state, False)
 
-        _LOGGER.debug(
-            "Subscribed to topic %s",
-            self._connection_topic,
-        )
+        self._handle_message_updates(is_on)
 
-        self._unsubscribe = await async_subscribe(
-            self.hass,
-            self._connection_topic,
-            message_received,
-        )
-        self._unsub_device = async_track_device_registry_updated_event(
-            self.hass,
-            [self._device_id],
-            _on_device_registry_updated,
+    @callback
+    def _async_write_state(self) -> None:
+        """Write the state, or queue it while the bridge batches writes."""
+        if self._coordinator is not None and self._coordinator.async_queue_write(
+            self
+        ):
+            return
+        self.async_write_state_if_changed()
+
+    @callback
+    def async_write_state_if_changed(self) -> None:
+        """Write the state when it differs from the last written state.
+
+        Confirming a restored state is no change, the restored attribute is
+        dropped with the next write.
+        """
+        written_state = (
+            self._attr_is_on,
+            self._attr_available,
+            self._flapping,
         )
+        if written_state == self._written_state:
+            self._stats.increment("state_write_skipped")
+            return
+        self._written_state = written_state
 
-        base = self._connection_topic.split("/", 1)[0]
-        self._unsub_bridge = await async_subscribe(
-            self.hass,
-            f"{base}/bridge/state",
-            _on_bridge_state,
+        start = perf_counter()
+        self.async_write_ha_state()
+        self._write_timing.record(perf_counter() - start)
+
+    @callback
+    def _async_arm_stats_refresh(self, delay: float) -> None:
+        self._unsub_stats_refresh = self._timers.async_call_at(
+            self.hass.loop.time() + delay, self._async_refresh_stats
         )
 
+    @callback
+    def _async_refresh_stats(self) -> None:
+        """Write the availability statistics of a device without changes.
+
+        The statistics move with time, a device that keeps its state would
+        show the values of its last change otherwise.
+        """
+        self._async_arm_stats_refresh(BUCKET_SECONDS)
+        start = perf_counter()
+        self.async_write_ha_state()
+        self._write_timing.record(perf_counter() - start)
+
     async def async_will_remove_from_hass(self) -> None:
         """When removing unsubscribe all."""
 
-        if self._unsubscribe:
-            self._unsubscribe()
-            self._unsubscribe = None
+        self._async_unregister_topic()
+        self._async_cancel_pending()
+
+        if self._unsub_flap:
+            self._unsub_flap()
+            self._unsub_flap = None
+
+        if self._unsub_stats_refresh:
+            self._unsub_stats_refresh()
+            self._unsub_stats_refresh = None
 
         if self._unsub_device:
             self._unsub_device()
             self._unsub_device = None
 
-        if self._unsub_bridge:
-            self._unsub_bridge()
-            self._unsub_bridge = None
+    def _handle_message_updates(self, is_on: bool | None) -> None:
+        self._stale = False
+        self._async_update_state(is_on)
 
-    def _handle_message_updates(self, data: dict[str, Any] | None) -> None:
-        old_state = self._attr_is_on
-        old_available = self._attr_available
-
-        if not data:
+    @callback
+    def _async_update_state(self, is_on: bool | None) -> None:
+        """Update the state from a received state, None is unavailable."""
+        if is_on is None:
+            self._async_cancel_pending()
+            old_available = self._attr_available
             self._attr_available = False
             if old_available:
-                self.async_write_ha_state()
+                self._history.async_record(self._device_id, "unavailable")
+                self._async_set_fleet_state("unavailable")
+                if self._availability is not None:
+                    self._availability.update(self.hass.loop.time(), None)
+                self._async_write_state()
             return
 
-        self._attr_is_on = data.get("state") == "online"
+        if is_on != self._raw_is_on:
+            now = self.hass.loop.time()
+            self._raw_is_on = is_on
+            self._raw_since = now
+            if self._flap_threshold:
+                self._async_track_flapping(now)
+
+        if not self._attr_available:
+            # Becoming available again is reported right away
+            self._async_cancel_pending()
+            self._async_apply_state(is_on)
+            return
+
+        self._async_evaluate_state()
+
+    @callback
+    def _async_evaluate_state(self) -> None:
+        """Report the received state when it held long enough."""
+        self._async_cancel_pending()
+        is_on = self._raw_is_on
+        if is_on == self._attr_is_on:
+            return
+
+        now = self.hass.loop.time()
+        deadline = self._raw_since
+        if not is_on:
+            deadline += self._offline_grace
+        if self._last_change is not None:
+            deadline = max(deadline, self._last_change + self._min_state_duration)
+
+        if deadline <= now:
+            self._async_apply_state(is_on)
+            return
+
+        self._unsub_pending = self._timers.async_call_at(
+            deadline, self._async_evaluate_state
+        )
+
+    @callback
+    def _async_cancel_pending(self) -> None:
+        if self._unsub_pending is not None:
+            self._unsub_pending()
+            self._unsub_pending = None
+
+    @callback
+    def _async_apply_state(self, is_on: bool) -> None:
+        """Report a connection state change."""
+        old_state = self._attr_is_on
+        old_available = self._attr_available
+        self._attr_is_on = is_on
         self._attr_available = True
 
         if old_state != self._attr_is_on or not old_available:
-            if self._attr_is_on:
-                event_data = {
-                    "state": "online",
-                    "device_id": self._device_id,
-                    "device_name": self.device_entry.name,
-                    "entity_id": self.entity_id,
-                }
-            else:
-                event_data = {
-                    "state": "offline",
-                    "device_id": self._device_id,
-                    "device_name": self.device_entry.name,
-                    "entity_id": self.entity_id,
-                }
-            self.hass.bus.async_fire(DOMAIN + "_changed", event_data)
-            self.async_write_ha_state()
+            self._last_change = self.hass.loop.time()
+            event_data = self._changed_events[is_on]
+            self._history.async_record(self._device_id, event_data["state"])
+            self._async_set_fleet_state(event_data["state"])
+            if self._availability is not None:
+                self._availability.update(self._last_change, is_on)
+            if self._coordinator is not None:
+                self._coordinator.async_report_change(
+                    self._device_id, event_data["state"]
+                )
+            if self._device_events:
+                self.hass.bus.async_fire(EVENT_CHANGED, dict(event_data))
+            self._async_write_state()
+
+    @callback
+    def _async_track_flapping(self, now: float) -> None:
+        """Flag the device as flapping on many changes within the flap window."""
+        self._flap_times.append(now)
+        self._async_update_flapping()
+
+    @callback
+    def _async_update_flapping(self) -> None:
+        now = self.hass.loop.time()
+        if self._unsub_flap is not None:
+            self._unsub_flap()
+            self._unsub_flap = None
+
+        flapping = (
+            len(self._flap_times) == self._flap_threshold
+            and now - self._flap_times[0] <= self._flap_window
+        )
+        if flapping:
+            # Check again when the oldest change leaves the window
+            self._unsub_flap = self._timers.async_call_at(
+                self._flap_times[0] + self._flap_window, self._async_update_flapping
+            )
+        if flapping == self._flapping:
+            return
+
+        self._flapping = flapping
+        _LOGGER.debug("Flapping of %s: %s", self.entity_id, flapping)
+        self.hass.bus.async_fire(
+            DOMAIN + "_flapping",
+            {
+                "flapping": flapping,
+                "device_id": self._device_id,
+                "device_name": self._device_name,
+                "entity_id": self.entity_id,
+            },
+        )
+        self._async_write_state()
 
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
         """Return the state attributes of the sensor."""
-        return {
+        attributes: dict[str, Any] = {
             "topic": self._connection_topic,
         }
+        if self._flap_threshold:
+            attributes["flapping"] = self._flapping
+        if self._stale:
+            attributes["restored"] = True
+        if self._availability is not None:
+            attributes.update(self._availability.as_dict(self.hass.loop.time()))
+        return attributes
@@ -4,13 +4,32 @@ from __future__ import annotations
 
 import voluptuous as vol
 
-from homeassistant.config_entries import SOURCE_USER, ConfigFlow, ConfigFlowResult
-from homeassistant.core import HomeAssistant
+from homeassistant.config_entries import (
+    SOURCE_USER,
+    ConfigEntry,
+    ConfigFlow,
+    ConfigFlowResult,
+    OptionsFlow,
+)
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers import device_registry as dr, selector
 from homeassistant.helpers.entity_component import DiscoveryInfoType
 
-from .const import CONF_DEVICE_ID, CONF_ERROR_BASE, CONF_TOPIC, DOMAIN
-from .helpers import find_connection_topic
+from .const import (
+    CONF_DEVICE_ID,
+    CONF_DEVICES,
+    CONF_ERROR_BASE,
+    CONF_HUB,
+    CONF_TOPIC,
+    DOMAIN,
+    HUB_TITLE,
+)
+from .discovery import (
+    async_add_hub_devices,
+    async_get_hub_entry,
+    async_resolve_devices,
+)
+from .helpers import find_availability_payloads, find_connection_topic
 
 
 class ConfigFlowConfig(ConfigFlow, domain=DOMAIN):
@@ -60,11 +79,22 @@ class ConfigFlowConfig(ConfigFlow, domain=DOMAIN):
                 self.hass, self._discovery_info
             )
             if check:
+                if (hub := async_get_hub_entry(self.hass)) is not None:
+                    if await async_add_hub_devices(
+                        self.hass, hub, [self._discovery_info[CONF_DEVICE_ID]]
+                    ):
+                        return self.async_abort(reason="added_to_hub")
+                    return self.async_abort(reason="already_configured")
                 return self.async_create_entry(
                     title=device_name,
                     data={
                         **self._discovery_info,
                         CONF_TOPIC: connection_topic,
+                        **find_availability_payloads(
+                            self.hass,
+                            self._discovery_info[CONF_DEVICE_ID],
+                            connection_topic,
+                        ),
                     },
                 )
 
@@ -93,6 +123,59 @@ class ConfigFlowConfig(ConfigFlow, domain=DOMAIN):
         user_input: dict | None = None,
     ) -> ConfigFlowResult:
         """Handle a flow initialized by the user."""
+        return self.async_show_menu(
+            step_id=SOURCE_USER,
+            menu_options=["device", CONF_HUB],
+        )
+
+    async def async_step_hub(
+        self,
+        user_input: dict | None = None,
+    ) -> ConfigFlowResult:
+        """Handle a hub monitoring many devices."""
+        await self.async_set_unique_id(CONF_HUB)
+        self._abort_if_unique_id_configured()
+
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            devices = await async_resolve_devices(self.hass, user_input[CONF_DEVICES])
+            if devices:
+                return self.async_create_entry(
+                    title=HUB_TITLE, data={CONF_DEVICES: devices}
+                )
+            errors[CONF_ERROR_BASE] = "no_connection_topic"
+
+        return self.async_show_form(
+            step_id=CONF_HUB,
+            data_schema=get_hub_schema(user_input),
+            errors=errors,
+        )
+
+    async def async_step_import(self, import_data: dict) -> ConfigFlowResult:
+        """Create a hub for migrated devices."""
+        await self.async_set_unique_id(CONF_HUB)
+        self._abort_if_unique_id_configured()
+
+        return self.async_create_entry(title=HUB_TITLE, data=import_data)
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: ConfigEntry) -> OptionsFlow:
+        """Return the hub options flow."""
+        return HubOptionsFlow()
+
+    @classmethod
+    @callback
+    def async_supports_options_flow(cls, config_entry: ConfigEntry) -> bool:
+        """Return options flow support, only hubs have a device list to edit."""
+        return CONF_DEVICES in config_entry.data
+
+    async def async_step_device(
+        self,
+        user_input: dict | None = None,
+    ) -> ConfigFlowResult:
+        """Handle a single device."""
         errors: dict[str, str] = {}
 
         if user_input is not None:
@@ -110,16 +193,59 @@ class ConfigFlowConfig(ConfigFlow, domain=DOMAIN):
                     data={
                         **user_input,
                         CONF_TOPIC: connection_topic,
+                        **find_availability_payloads(
+                            self.hass, user_input[CONF_DEVICE_ID], connection_topic
+                        ),
                     },
                 )
 
         return self.async_show_form(
-            step_id=SOURCE_USER,
+            step_id="device",
             data_schema=get_schema(user_input),
             errors=errors,
         )
 
 
+class HubOptionsFlow(OptionsFlow):
+    """Edit the device list of a hub."""
+
+    async def async_step_init(
+        self,
+        user_input: dict | None = None,
+    ) -> ConfigFlowResult:
+        """Manage the hub devices."""
+        devices: dict[str, dict] = self.config_entry.data[CONF_DEVICES]
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            selected: list[str] = user_input[CONF_DEVICES]
+            # Keep resolved data of retained devices, resolve only new ones
+            new_devices = {
+                device_id: devices[device_id]
+                for device_id in selected
+                if device_id in devices
+            }
+            new_devices.update(
+                await async_resolve_devices(
+                    self.hass,
+                    [device_id for device_id in selected if device_id not in devices],
+                )
+            )
+            if new_devices:
+                self.hass.config_entries.async_update_entry(
+                    self.config_entry,
+                    data={**self.config_entry.data, CONF_DEVICES: new_devices},
+                )
+                return self.async_create_entry(data={})
+            errors[CONF_ERROR_BASE] = "no_connection_topic"
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=get_hub_schema({CONF_DEVICES: list(devices)}),
+            errors=errors,
+        )
+
+
 def get_schema(user_input: dict | None = None) -> vol.Schema:
     """Return the user step schema."""
     if user_input is None:
@@ -139,6 +265,26 @@ def get_schema(user_input: dict | None = None) -> vol.Schema:
     )
 
 
+def get_hub_schema(user_input: dict | None = None) -> vol.Schema:
+    """Return the hub schema."""
+    if user_input is None:
+        user_input = {}
+
+    return vol.Schema(
+        {
+            vol.Required(
+                CONF_DEVICES,
+                default=user_input.get(CONF_DEVICES, []),
+            ): selector.DeviceSelector(
+                config=selector.DeviceSelectorConfig(
+                    filter=[selector.DeviceFilterSelectorConfig(integration="mqtt")],
+                    multiple=True,
+                )
+            )
+        }
+    )
+
+
 async def validate_input(
     hass: HomeAssistant, user_input: dict
 ) -> tuple[bool, dict[str, str], str | None]:
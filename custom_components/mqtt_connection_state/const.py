@@ -17,10 +17,63 @@ VERSION = manifest_data.get("version")
 
 DOMAIN_NAME = "MQTT connection state"
 
+CONF_AVAILABILITY_STATS = "availability_stats"
+CONF_BRIDGE_ONLINE_WINDOW = timedelta(minutes=1)
+CONF_BRIDGES = "bridges"
+CONF_BULK_ADD_CONCURRENCY = 10
+CONF_BULK_ADD_PROGRESS_INTERVAL = 50
+CONF_COALESCE_WINDOW = "coalesce_window"
+CONF_DEVICE_EVENTS = "device_events"
 CONF_DEVICE_ID = "device_id"
-CONF_DISCOVERY_INTERVAL = timedelta(minutes=10)
+CONF_DEVICES = "devices"
+CONF_DISCOVERY_COOLDOWN = timedelta(seconds=5)
+CONF_DISCOVERY_INTERVAL = timedelta(hours=1)
+# Seconds discovery may block the event loop before yielding
+CONF_DISCOVERY_SLICE_BUDGET = 0.005
 CONF_ERROR_BASE = "base"
+CONF_FLAP_THRESHOLD = "flap_threshold"
+CONF_FLAP_WINDOW = "flap_window"
+CONF_FLEET_OFFLINE_LIST_MAX = 50
+CONF_FLEET_SENSORS = "fleet_sensors"
+CONF_FLEET_UPDATE_INTERVAL = "fleet_update_interval"
+CONF_HEARTBEAT_TIMEOUT = "heartbeat_timeout"
+CONF_HISTORY_SAVE_DELAY = 60
+CONF_HISTORY_SIZE = "history_size"
+CONF_HUB = "hub"
+CONF_HUB_UPDATE_DELAY = 1
+CONF_MIN_STATE_DURATION = "min_state_duration"
+CONF_OFFLINE_GRACE = "offline_grace"
+CONF_PAYLOAD_AVAILABLE = "payload_available"
+CONF_PAYLOAD_NOT_AVAILABLE = "payload_not_available"
+CONF_STORAGE_SAVE_DELAY = 10
 CONF_TOPIC = "topic"
+CONF_TOPIC_INDEX_MAX_AGE = timedelta(minutes=5)
+CONF_TOPIC_PATTERNS = "topic_patterns"
+CONF_WRITE_BATCH_WINDOW = "write_batch_window"
 
+HUB_TITLE = "Hub"
+# Topic levels of commands, also published by Home Assistant, no sign of life
+HEARTBEAT_COMMAND_LEVELS = frozenset({"command", "get", "set"})
+
+DEFAULT_COALESCE_WINDOW = timedelta(seconds=5)
+DEFAULT_FLAP_WINDOW = timedelta(minutes=10)
+DEFAULT_FLEET_UPDATE_INTERVAL = timedelta(seconds=10)
+DEFAULT_HISTORY_SIZE = 50
+DEFAULT_PAYLOAD_AVAILABLE = "online"
+DEFAULT_PAYLOAD_NOT_AVAILABLE = "offline"
+# Connection topic patterns, best first
+DEFAULT_TOPIC_PATTERNS = ["#/availability", "#/status", "tele/+/LWT"]
+DEFAULT_WRITE_BATCH_WINDOW = timedelta(milliseconds=500)
+
+STORAGE_VERSION = 1
+STORAGE_KEY_DISCOVERY = f"{DOMAIN}.discovery"
+STORAGE_KEY_HISTORY = f"{DOMAIN}.history"
+STORAGE_KEY_TOPIC_CACHE = f"{DOMAIN}.topic_cache"
+
+SIGNAL_NEW_BRIDGE = f"{DOMAIN}_new_bridge"
+
+SERV_GET_HISTORY = "get_history"
 SERV_LIST_NEW_DEVICES = "list_new_devices"
 SERV_ADD_NEW_DEVICES = "add_new_devices"
+SERV_RELOAD_BRIDGE = "reload_bridge"
+SERV_MIGRATE_TO_HUB = "migrate_to_hub"
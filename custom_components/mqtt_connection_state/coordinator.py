@@ -0,0 +1,516 @@
+"""Per-bridge coordinator for MQTT connection state custom integration."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import Callable
+from datetime import datetime
+import logging
+from time import perf_counter
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.mqtt import async_subscribe, models
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    CONF_BRIDGE_ONLINE_WINDOW,
+    CONF_BRIDGES,
+    CONF_COALESCE_WINDOW,
+    CONF_DISCOVERY_SLICE_BUDGET,
+    CONF_HEARTBEAT_TIMEOUT,
+    CONF_WRITE_BATCH_WINDOW,
+    DOMAIN,
+    HEARTBEAT_COMMAND_LEVELS,
+    SIGNAL_NEW_BRIDGE,
+)
+from .stats import async_get_stats
+from .timers import async_get_timer_heap
+
+if TYPE_CHECKING:
+    from .binary_sensor import MqttConnectionSensorEntity
+
+_LOGGER = logging.getLogger(__name__)
+
+MessageCallbackType = Callable[[models.ReceiveMessage], None]
+
+FLEET_STATES = ("online", "offline", "unavailable")
+
+
+def topic_filter(topic: str) -> str:
+    """Return the shared subscription filter for a connection topic.
+
+    Topics shaped like "<base>/<device>/<suffix>" share one wildcard
+    subscription "<base>/+/<suffix>". Any other shape is subscribed as is.
+    """
+    parts = topic.split("/")
+    if len(parts) == 3 and "+" not in parts and "#" not in parts:
+        return f"{parts[0]}/+/{parts[2]}"
+    return topic
+
+
+@callback
+def async_get_coordinator(hass: HomeAssistant, topic: str) -> BridgeCoordinator:
+    """Return the coordinator for the bridge of a connection topic."""
+    base = topic.split("/", 1)[0]
+    coordinators: dict[str, BridgeCoordinator] = hass.data[DOMAIN].setdefault(
+        "coordinators", {}
+    )
+    if (coordinator := coordinators.get(base)) is None:
+        coordinator = coordinators[base] = BridgeCoordinator(hass, base)
+        async_dispatcher_send(hass, SIGNAL_NEW_BRIDGE, coordinator)
+    return coordinator
+
+
+class BridgeCoordinator:
+    """Route MQTT messages of one bridge base topic to its entities.
+
+    One subscription is held per topic filter, messages are dispatched with a
+    dict lookup on the exact topic. Bridge state changes are handled once for
+    all entities of the bridge. State writes during retained message replays
+    and after the bridge came online are batched.
+
+    Each bridge holds its own subscriptions, counts and timers, the windows
+    can be set per bridge with the bridges option.
+    """
+
+    def __init__(self, hass: HomeAssistant, base: str) -> None:
+        """Initialize coordinator."""
+        self.hass = hass
+        self.base = base
+        # Bridge settings override the integration settings
+        self.config: dict[str, Any] = {
+            **hass.data[DOMAIN]["config"],
+            **hass.data[DOMAIN]["config"].get(CONF_BRIDGES, {}).get(base, {}),
+        }
+
+        self._handlers: dict[str, list[MessageCallbackType]] = {}
+        self._subscriptions: dict[str, CALLBACK_TYPE] = {}
+        self._filter_refs: dict[str, int] = {}
+        # Last message per topic with a retained message, by topic filter. The
+        # MQTT client delivers a retained message once per subscription, later
+        # callbacks on the same filter get it replayed from here.
+        self._retained: dict[str, dict[str, models.ReceiveMessage]] = {}
+
+        self._entities: set[MqttConnectionSensorEntity] = set()
+        self._bridge_online_at: datetime | None = None
+        self._bridge_online_time: float | None = None
+        self._unsub_bridge_check: CALLBACK_TYPE | None = None
+
+        self._coalesce_window = self.config[CONF_COALESCE_WINDOW]
+        self._changed_devices: dict[str, str] = {}
+        self._unsub_coalesce: CALLBACK_TYPE | None = None
+
+        self._write_batch_window: float = self.config[
+            CONF_WRITE_BATCH_WINDOW
+        ].total_seconds()
+        self._timers = async_get_timer_heap(hass)
+        self._replaying = False
+        self._batch_until = 0.0
+        self._pending_writes: dict[MqttConnectionSensorEntity, None] = {}
+        self._unsub_flush: CALLBACK_TYPE | None = None
+        stats = async_get_stats(hass)
+        self._flush_timing = stats.timing("state_write_batch")
+        self._stats = stats
+
+        # Heartbeat callbacks by device topic prefix, one subscription per bridge
+        self._heartbeats: dict[str, list[MessageCallbackType]] = {}
+        self._unsub_heartbeats: CALLBACK_TYPE | None = None
+        self._heartbeat_subscribing = False
+        # Last seen time of heartbeat entities, oldest first. One timer for
+        # the oldest deadline, only expired entities are touched.
+        self._heartbeat_timeout: float = self.config[
+            CONF_HEARTBEAT_TIMEOUT
+        ].total_seconds()
+        self._heartbeat_seen: OrderedDict[MqttConnectionSensorEntity, float] = (
+            OrderedDict()
+        )
+        self._unsub_heartbeat_timer: CALLBACK_TYPE | None = None
+
+        # Routed messages, devices per fleet state, devices without a state
+        # yet are not counted
+        self.messages = 0
+        self.counts: dict[str, int] = dict.fromkeys(FLEET_STATES, 0)
+        self.offline_devices: dict[str, str | None] = {}
+        self._count_listeners: list[CALLBACK_TYPE] = []
+
+    @property
+    def heartbeat_timeout(self) -> float:
+        """Return the heartbeat timeout of this bridge, 0 when disabled."""
+        return self._heartbeat_timeout
+
+    @property
+    def entities(self) -> set[MqttConnectionSensorEntity]:
+        """Return the entities of this bridge."""
+        return self._entities
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return coordinator state for diagnostics."""
+        return {
+            "entities": len(self._entities),
+            "messages": self.messages,
+            "topics": len(self._handlers),
+            "subscriptions": sorted(self._subscriptions),
+            "retained_topics": sum(map(len, self._retained.values())),
+            "bridge_online_at": self._bridge_online_at,
+            "bridge_check_pending": self._unsub_bridge_check is not None,
+            "pending_writes": len(self._pending_writes),
+            "heartbeat_prefixes": len(self._heartbeats),
+            "heartbeat_devices": len(self._heartbeat_seen),
+            "counts": dict(self.counts),
+        }
+
+    async def async_register(
+        self, topic: str, msg_callback: MessageCallbackType
+    ) -> CALLBACK_TYPE:
+        """Register a callback for messages on topic, return unregister."""
+        self._handlers.setdefault(topic, []).append(msg_callback)
+
+        sub_filter = topic_filter(topic)
+        self._filter_refs[sub_filter] = self._filter_refs.get(sub_filter, 0) + 1
+        if self._filter_refs[sub_filter] == 1:
+            _LOGGER.debug("Subscribed to topic filter %s", sub_filter)
+            unsub = await async_subscribe(
+                self.hass,
+                sub_filter,
+                self._async_route_message,
+            )
+            if sub_filter in self._filter_refs:
+                self._subscriptions[sub_filter] = unsub
+            else:
+                # Unregistered while subscribing
+                unsub()
+        elif (message := self._retained.get(sub_filter, {}).get(topic)) is not None:
+            # Replay the retained message the MQTT client won't deliver again
+            self._replaying = True
+            msg_callback(message)
+            self._replaying = False
+
+        @callback
+        def _async_unregister() -> None:
+            self._async_unregister(topic, msg_callback)
+
+        return _async_unregister
+
+    @callback
+    def _async_unregister(self, topic: str, msg_callback: MessageCallbackType) -> None:
+        handlers = self._handlers.get(topic)
+        if not handlers or msg_callback not in handlers:
+            return
+        handlers.remove(msg_callback)
+        if not handlers:
+            del self._handlers[topic]
+
+        sub_filter = topic_filter(topic)
+        self._filter_refs[sub_filter] -= 1
+        if self._filter_refs[sub_filter] > 0:
+            return
+        del self._filter_refs[sub_filter]
+        # A new subscription gets the retained messages from the broker again
+        self._retained.pop(sub_filter, None)
+        if unsub := self._subscriptions.pop(sub_filter, None):
+            _LOGGER.debug("Unsubscribed from topic filter %s", sub_filter)
+            unsub()
+
+    @callback
+    def _async_route_message(self, message: models.ReceiveMessage) -> None:
+        """Dispatch a message to the callbacks registered for its topic."""
+        retained = self._retained.get(message.subscribed_topic)
+        if message.retain or (retained is not None and message.topic in retained):
+            if retained is None:
+                retained = self._retained[message.subscribed_topic] = {}
+            if message.payload:
+                retained[message.topic] = message
+            else:
+                # An empty retained message clears the retained message
+                retained.pop(message.topic, None)
+
+        handlers = self._handlers.get(message.topic)
+        if handlers is None:
+            return
+        self.messages += 1
+        self._replaying = message.retain
+        for handler in handlers:
+            handler(message)
+        self._replaying = False
+
+    async def async_register_heartbeat(
+        self, prefix: str, msg_callback: MessageCallbackType
+    ) -> CALLBACK_TYPE:
+        """Register a callback for messages on prefix and below, return unregister.
+
+        All heartbeats of the bridge share one "<base>/#" subscription.
+        """
+        self._heartbeats.setdefault(prefix, []).append(msg_callback)
+
+        if self._unsub_heartbeats is None and not self._heartbeat_subscribing:
+            self._heartbeat_subscribing = True
+            sub_filter = f"{self.base}/#"
+            _LOGGER.debug("Subscribed to heartbeat topic filter %s", sub_filter)
+            unsub = await async_subscribe(
+                self.hass, sub_filter, self._async_route_heartbeat
+            )
+            self._heartbeat_subscribing = False
+            if self._heartbeats:
+                self._unsub_heartbeats = unsub
+            else:
+                # Unregistered while subscribing
+                unsub()
+
+        @callback
+        def _async_unregister() -> None:
+            callbacks = self._heartbeats.get(prefix)
+            if not callbacks or msg_callback not in callbacks:
+                return
+            callbacks.remove(msg_callback)
+            if not callbacks:
+                del self._heartbeats[prefix]
+            if not self._heartbeats and self._unsub_heartbeats is not None:
+                self._unsub_heartbeats()
+                self._unsub_heartbeats = None
+
+        return _async_unregister
+
+    @callback
+    def _async_route_heartbeat(self, message: models.ReceiveMessage) -> None:
+        """Dispatch a message to the heartbeats of the longest matching prefix.
+
+        Commands to the device are echoed by the broker also when the device
+        is gone, they are skipped.
+        """
+        topic = message.topic
+        if not HEARTBEAT_COMMAND_LEVELS.isdisjoint(topic.rsplit("/", 2)[1:]):
+            return
+        heartbeats = self._heartbeats
+        while topic:
+            if (callbacks := heartbeats.get(topic)) is not None:
+                for msg_callback in callbacks:
+                    msg_callback(message)
+                return
+            topic = topic.rpartition("/")[0]
+
+    @callback
+    def async_track_heartbeat(
+        self, entity: MqttConnectionSensorEntity
+    ) -> CALLBACK_TYPE:
+        """Report the entity expired when not seen for the timeout, return stop."""
+        self.async_heartbeat_seen(entity)
+
+        @callback
+        def _async_untrack() -> None:
+            self._heartbeat_seen.pop(entity, None)
+
+        return _async_untrack
+
+    @callback
+    def async_heartbeat_seen(self, entity: MqttConnectionSensorEntity) -> None:
+        """Move the deadline of an entity, also after it expired."""
+        now = self.hass.loop.time()
+        seen = self._heartbeat_seen
+        seen[entity] = now
+        seen.move_to_end(entity)
+        if self._unsub_heartbeat_timer is None:
+            # Later deadlines never come before the armed one
+            self._unsub_heartbeat_timer = self._timers.async_call_at(
+                now + self._heartbeat_timeout, self._async_check_heartbeats
+            )
+
+    @callback
+    def _async_check_heartbeats(self) -> None:
+        """Expire the entities not seen for the timeout, oldest first."""
+        self._unsub_heartbeat_timer = None
+        seen = self._heartbeat_seen
+        expire_before = self.hass.loop.time() - self._heartbeat_timeout
+        while seen:
+            entity, last_seen = next(iter(seen.items()))
+            if last_seen > expire_before:
+                self._unsub_heartbeat_timer = self._timers.async_call_at(
+                    last_seen + self._heartbeat_timeout, self._async_check_heartbeats
+                )
+                return
+            del seen[entity]
+            entity.async_heartbeat_expired()
+
+    @callback
+    def async_add_entity(self, entity: MqttConnectionSensorEntity) -> CALLBACK_TYPE:
+        """Add an entity to the bridge checks and counts, return remove."""
+        self._entities.add(entity)
+        self.async_update_count(entity, None, entity.fleet_state)
+
+        @callback
+        def _async_remove_entity() -> None:
+            self._entities.discard(entity)
+            self._pending_writes.pop(entity, None)
+            self.async_update_count(entity, entity.fleet_state, None)
+
+        return _async_remove_entity
+
+    @callback
+    def async_update_count(
+        self,
+        entity: MqttConnectionSensorEntity,
+        old_state: str | None,
+        new_state: str | None,
+    ) -> None:
+        """Move a device from one fleet state count to another."""
+        if old_state == new_state:
+            return
+        if old_state is not None:
+            self.counts[old_state] -= 1
+        if new_state is not None:
+            self.counts[new_state] += 1
+        if new_state == "offline":
+            self.offline_devices[entity.device_id] = entity.device_name
+        elif old_state == "offline":
+            self.offline_devices.pop(entity.device_id, None)
+
+        for listener in self._count_listeners:
+            listener()
+
+    @callback
+    def async_add_count_listener(self, listener: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Call listener when the counts change, return remove."""
+        self._count_listeners.append(listener)
+
+        @callback
+        def _async_remove_listener() -> None:
+            self._count_listeners.remove(listener)
+
+        return _async_remove_listener
+
+    @callback
+    def async_queue_write(self, entity: MqttConnectionSensorEntity) -> bool:
+        """Queue a state write while batching, return if it was queued.
+
+        Batching is active while retained messages are replayed, after the
+        client (re)subscribed, and in the window after the bridge came online.
+        """
+        if not self._write_batch_window:
+            return False
+        now = self.hass.loop.time()
+        if not self._replaying and now >= self._batch_until:
+            return False
+
+        self._pending_writes[entity] = None
+        if self._unsub_flush is None:
+            self._unsub_flush = self._timers.async_call_at(
+                now + self._write_batch_window, self._async_flush_writes
+            )
+        return True
+
+    @callback
+    def _async_flush_writes(self) -> None:
+        """Write the states of all queued entities in one pass."""
+        self._unsub_flush = None
+        pending = self._pending_writes
+        self._pending_writes = {}
+
+        start = perf_counter()
+        for entity in pending:
+            if entity.hass is None or entity not in self._entities:
+                continue
+            entity.async_write_state_if_changed()
+        self._flush_timing.record(perf_counter() - start)
+        self._stats.increment("batched_writes", len(pending))
+
+        _LOGGER.debug(
+            "Bridge %s wrote %d batched states", self.base, len(pending)
+        )
+
+    @callback
+    def async_report_change(self, device_id: str, state: str) -> None:
+        """Collect a device state change for the aggregated bridge event."""
+        if not self._coalesce_window:
+            return
+        self._changed_devices[device_id] = state
+        if self._unsub_coalesce is None:
+            self._unsub_coalesce = async_call_later(
+                self.hass, self._coalesce_window, self._async_fire_changes
+            )
+
+    @callback
+    def _async_fire_changes(self, _now: datetime) -> None:
+        """Fire one event per state with all devices changed in the window."""
+        self._unsub_coalesce = None
+        by_state: dict[str, list[str]] = {}
+        for device_id, state in self._changed_devices.items():
+            by_state.setdefault(state, []).append(device_id)
+        self._changed_devices = {}
+
+        for state, device_ids in by_state.items():
+            self.hass.bus.async_fire(
+                DOMAIN + "_bridge_changed",
+                {
+                    "bridge": self.base,
+                    "state": state,
+                    "count": len(device_ids),
+                    "device_ids": device_ids,
+                },
+            )
+
+    @callback
+    def async_bridge_online(self) -> None:
+        """Schedule one topic check for all entities after the bridge came online."""
+        # Devices report in a burst after the bridge came online
+        self._batch_until = (
+            self.hass.loop.time() + CONF_BRIDGE_ONLINE_WINDOW.total_seconds()
+        )
+        if self._unsub_bridge_check is not None:
+            return
+
+        _LOGGER.debug(
+            "Bridge %s online, check topics of %d entities in %s",
+            self.base,
+            len(self._entities),
+            CONF_BRIDGE_ONLINE_WINDOW,
+        )
+        self._bridge_online_at = dt_util.utcnow()
+        self._bridge_online_time = self.hass.loop.time()
+        self._unsub_bridge_check = async_call_later(
+            self.hass, CONF_BRIDGE_ONLINE_WINDOW, self._async_bridge_check
+        )
+
+    @callback
+    def _async_bridge_check(self, _now: datetime) -> None:
+        """Re-resolve topics of entities without messages around bridge online."""
+        self._unsub_bridge_check = None
+        if self._bridge_online_time is None:
+            return
+
+        # Messages in the window before and after the bridge came online
+        # prove the topic is still valid.
+        since = self._bridge_online_time - CONF_BRIDGE_ONLINE_WINDOW.total_seconds()
+        silent = [
+            entity
+            for entity in self._entities
+            if entity.last_mqtt_message is None or entity.last_mqtt_message < since
+        ]
+        if not silent:
+            return
+
+        _LOGGER.debug(
+            "Bridge %s online, check topic of %d silent entities",
+            self.base,
+            len(silent),
+        )
+        self.hass.async_create_task(self._async_resolve_topics(silent))
+
+    async def _async_resolve_topics(
+        self, entities: list[MqttConnectionSensorEntity]
+    ) -> None:
+        """Re-resolve the connection topic of entities in one batch.
+
+        Yields to the event loop between slices, so a large bridge doesn't
+        delay the messages of other bridges.
+        """
+        slice_start = perf_counter()
+        for entity in entities:
+            if perf_counter() - slice_start >= CONF_DISCOVERY_SLICE_BUDGET:
+                await asyncio.sleep(0)
+                slice_start = perf_counter()
+            if entity.hass is None or entity not in self._entities:
+                continue
+            await entity.async_resolve_topic()
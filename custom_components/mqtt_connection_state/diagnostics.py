@@ -0,0 +1,79 @@
+"""Diagnostics for MQTT connection state custom integration."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import DeviceEntry
+
+from .const import DOMAIN
+from .discovery import async_get_discovery_index
+from .helpers import async_get_topic_index
+from .stats import async_get_stats
+
+
+def _async_integration_diagnostics(hass: HomeAssistant) -> dict[str, Any]:
+    """Return diagnostics shared by all entries."""
+    index = async_get_discovery_index(hass)
+    coordinators = hass.data[DOMAIN].get("coordinators", {})
+
+    return {
+        "stats": async_get_stats(hass).as_dict(),
+        "topic_cache": hass.data[DOMAIN]["topic_cache"].stats,
+        "topic_index": async_get_topic_index(hass).stats,
+        "history": hass.data[DOMAIN]["history"].stats,
+        "discovery": {
+            "configured": len(index.configured),
+            "seen": len(index.seen),
+            "new_devices": len(index.new_devices),
+            "candidates": len(index.candidates),
+            "mqtt_devices": len(index.mqtt_devices),
+            "pending": len(index.pending),
+        },
+        "bridges": {
+            base: coordinator.as_dict() for base, coordinator in coordinators.items()
+        },
+    }
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    return {
+        "entry": {"title": entry.title, "data": dict(entry.data)},
+        **_async_integration_diagnostics(hass),
+    }
+
+
+async def async_get_device_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry, device: DeviceEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a device."""
+    entities = [
+        entity
+        for coordinator in hass.data[DOMAIN].get("coordinators", {}).values()
+        for entity in coordinator.entities
+        if entity.device_id == device.id
+    ]
+
+    return {
+        "device": {"id": device.id, "name": device.name},
+        "entities": [
+            {
+                "entity_id": entity.entity_id,
+                "is_on": entity.is_on,
+                "available": entity.available,
+                "last_mqtt_message_age": (
+                    None
+                    if entity.last_mqtt_message is None
+                    else round(hass.loop.time() - entity.last_mqtt_message, 1)
+                ),
+                **entity.extra_state_attributes,
+            }
+            for entity in entities
+        ],
+        **_async_integration_diagnostics(hass),
+    }
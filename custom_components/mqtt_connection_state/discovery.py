@@ -2,75 +2,458 @@
 
 from __future__ import annotations
 
+import asyncio
+from collections.abc import Iterable
+from datetime import datetime
 import logging
+from time import perf_counter
+from typing import Any
 
-from homeassistant.config_entries import SOURCE_INTEGRATION_DISCOVERY
-from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers import device_registry as dr, discovery_flow
+from homeassistant.config_entries import SOURCE_INTEGRATION_DISCOVERY, ConfigEntry
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import (
+    device_registry as dr,
+    discovery_flow,
+    entity_registry as er,
+)
+from homeassistant.helpers.debounce import Debouncer
 from homeassistant.helpers.device_registry import DeviceEntry
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.start import async_at_started
+from homeassistant.helpers.storage import Store
 
-from .const import CONF_DEVICE_ID, DOMAIN
-from .helpers import find_connection_topic
+from .const import (
+    CONF_DEVICE_ID,
+    CONF_DEVICES,
+    CONF_DISCOVERY_COOLDOWN,
+    CONF_DISCOVERY_INTERVAL,
+    CONF_DISCOVERY_SLICE_BUDGET,
+    CONF_STORAGE_SAVE_DELAY,
+    CONF_TOPIC,
+    DOMAIN,
+    STORAGE_KEY_DISCOVERY,
+    STORAGE_VERSION,
+)
+from .helpers import find_availability_payloads, find_connection_topic
+from .stats import async_get_stats
 
 _LOGGER = logging.getLogger(__name__)
 
 
-async def async_discover_devices(hass: HomeAssistant) -> list[DeviceEntry]:
-    """Discover MQTT devices not yet configured for this integration."""
-    _LOGGER.debug("Run discover devices")
+class DiscoveryIndex:
+    """Live index of device IDs known to discovery.
+
+    configured: devices with a config entry of this integration.
+    seen: devices a discovery flow was started for.
+    new_devices: details of the seen devices for list_new_devices.
+    candidates: MQTT devices without a connection topic yet.
+    pending: devices changed since the last evaluation.
+    mqtt_devices: devices with a MQTT identifier.
+
+    Seen and new devices are persisted, so a restart doesn't evaluate them
+    again. They are loaded on first use.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize index."""
+        self.hass = hass
+        self.configured: set[str] = {
+            entry.data[CONF_DEVICE_ID]
+            for entry in hass.config_entries.async_entries(DOMAIN)
+            if entry.data.get(CONF_DEVICE_ID)
+        }
+        self.seen: set[str] = set()
+        self.new_devices: dict[str, dict[str, Any]] = {}
+        self.candidates: set[str] = set()
+        self.pending: set[str] = set()
+        self.mqtt_devices: set[str] = set()
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, STORAGE_KEY_DISCOVERY
+        )
+        self._load_task: asyncio.Task[None] | None = None
+        self._loaded = False
+        self._save_pending = False
+
+        # Devices of the MQTT config entries are indexed by the registry
+        device_registry = dr.async_get(hass)
+        for mqtt_entry in hass.config_entries.async_entries("mqtt"):
+            for device_entry in dr.async_entries_for_config_entry(
+                device_registry, mqtt_entry.entry_id
+            ):
+                self.async_update_device(device_entry)
+
+    async def async_load(self) -> None:
+        """Load the seen devices, only the first call reads storage."""
+        if self._load_task is None:
+            self._load_task = self.hass.async_create_task(
+                self._async_load(), f"{DOMAIN} load discovery state"
+            )
+        await self._load_task
+
+    async def _async_load(self) -> None:
+        data = await self._store.async_load() or {}
+        stored_ids: list[str] = data.get("seen", [])
+
+        # Drop devices removed or configured in the meantime
+        device_registry = dr.async_get(self.hass)
+        self.seen.update(
+            device_id
+            for device_id in stored_ids
+            if device_id not in self.configured
+            and device_registry.async_get(device_id) is not None
+        )
+        for item in data.get("new_devices", []):
+            if item["id"] in self.seen:
+                self.new_devices.setdefault(item["id"], item)
+
+        self._loaded = True
+        if len(self.seen) != len(stored_ids):
+            self._async_schedule_save()
+        _LOGGER.debug("Loaded %d seen devices", len(self.seen))
+
+    @callback
+    def async_add_new_device(self, device_entry: DeviceEntry, topic: str) -> None:
+        """Record a newly discovered device."""
+        self.candidates.discard(device_entry.id)
+        self.seen.add(device_entry.id)
+        self.new_devices[device_entry.id] = {
+            "id": device_entry.id,
+            "name": device_entry.name,
+            "manufacturer": device_entry.manufacturer,
+            "model": device_entry.model,
+            "bridge": topic.split("/", 1)[0],
+        }
+        self._async_schedule_save()
+
+    @callback
+    def async_forget_devices(self, device_ids: Iterable[str]) -> None:
+        """Allow devices to be discovered again, after their entry is removed."""
+        for device_id in device_ids:
+            self.seen.discard(device_id)
+            self.new_devices.pop(device_id, None)
+        self._async_schedule_save()
+
+    @callback
+    def async_update_device(self, device_entry: DeviceEntry) -> None:
+        """Update the MQTT identifier index for a device."""
+        if is_mqtt_device(device_entry):
+            self.mqtt_devices.add(device_entry.id)
+        else:
+            self.mqtt_devices.discard(device_entry.id)
+
+    @callback
+    def async_is_known(self, device_id: str) -> bool:
+        """Return if a device needs no further evaluation."""
+        return device_id in self.configured or device_id in self.seen
+
+    @callback
+    def async_remove_device(self, device_id: str) -> None:
+        """Forget a device removed from the device registry."""
+        self.candidates.discard(device_id)
+        self.pending.discard(device_id)
+        self.mqtt_devices.discard(device_id)
+        if device_id in self.seen:
+            self.seen.discard(device_id)
+            self.new_devices.pop(device_id, None)
+            self._async_schedule_save()
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        # Saving before the load would overwrite the stored devices
+        if not self._loaded or self._save_pending:
+            return
+        self._save_pending = True
+        self._store.async_delay_save(self._data_to_save, CONF_STORAGE_SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        # Changes after this snapshot schedule the next save
+        self._save_pending = False
+        return {
+            "seen": list(self.seen),
+            "new_devices": list(self.new_devices.values()),
+        }
+
+
+def is_mqtt_device(device_entry: DeviceEntry) -> bool:
+    """Return if a device comes from the MQTT integration."""
+    return any(identifier[0] == "mqtt" for identifier in device_entry.identifiers)
 
-    discovered_devices: list[DeviceEntry] = []
 
-    seen_device_ids = hass.data[DOMAIN]["seen_device_ids"]
-    new_devices = hass.data[DOMAIN]["new_devices"]
+@callback
+def async_get_discovery_index(hass: HomeAssistant) -> DiscoveryIndex:
+    """Return the discovery index, create it on first use."""
+    if (index := hass.data[DOMAIN].get("discovery_index")) is None:
+        index = hass.data[DOMAIN]["discovery_index"] = DiscoveryIndex(hass)
+    return index
+
+
+@callback
+def async_get_hub_entry(hass: HomeAssistant) -> ConfigEntry | None:
+    """Return the hub entry, None if no hub is configured."""
+    return next(
+        (
+            entry
+            for entry in hass.config_entries.async_entries(DOMAIN)
+            if CONF_DEVICES in entry.data
+        ),
+        None,
+    )
+
+
+async def async_resolve_devices(
+    hass: HomeAssistant, device_ids: Iterable[str]
+) -> dict[str, dict]:
+    """Resolve topic and payloads of devices in time slices.
+
+    Devices without topic or already configured elsewhere are skipped.
+    """
+    configured = async_get_discovery_index(hass).configured
+    slice_timing = async_get_stats(hass).timing("hub_resolve_slice")
+    devices: dict[str, dict] = {}
+    slice_start = perf_counter()
+    for device_id in device_ids:
+        if (block := perf_counter() - slice_start) >= CONF_DISCOVERY_SLICE_BUDGET:
+            slice_timing.record(block)
+            await asyncio.sleep(0)
+            slice_start = perf_counter()
+        if device_id in configured:
+            continue
+        if not (connection_topic := find_connection_topic(hass, device_id)):
+            continue
+        devices[device_id] = {
+            CONF_TOPIC: connection_topic,
+            **find_availability_payloads(hass, device_id, connection_topic),
+        }
+    slice_timing.record(perf_counter() - slice_start)
+    return devices
+
 
-    # Get already configured device IDs for this integration
-    domain_entries = hass.config_entries.async_entries(DOMAIN) or []
-    known_devices = {
-        entry.data.get(CONF_DEVICE_ID)
-        for entry in domain_entries
-        if entry.data.get(CONF_DEVICE_ID)
+async def async_add_hub_devices(
+    hass: HomeAssistant, hub: ConfigEntry, device_ids: Iterable[str]
+) -> set[str]:
+    """Add devices with a connection topic to the hub, return the added ones.
+
+    The hub sets up added devices without a reload.
+    """
+    devices = await async_resolve_devices(hass, device_ids)
+    # Devices configured while resolving are not added twice
+    configured = async_get_discovery_index(hass).configured
+    devices = {
+        device_id: device_data
+        for device_id, device_data in devices.items()
+        if device_id not in configured
     }
+    if devices:
+        configured.update(devices)
+        hass.config_entries.async_update_entry(
+            hub, data={**hub.data, CONF_DEVICES: {**hub.data[CONF_DEVICES], **devices}}
+        )
+    return set(devices)
+
 
+@callback
+def async_get_hub_orphans(hass: HomeAssistant, hub: ConfigEntry) -> list[str]:
+    """Return the hub devices removed or without primary config entry."""
     device_registry = dr.async_get(hass)
+    return [
+        device_id
+        for device_id in hub.data[CONF_DEVICES]
+        if (device_entry := device_registry.async_get(device_id)) is None
+        or device_entry.primary_config_entry is None
+    ]
 
-    for device_entry in device_registry.devices.values():
-        # Skip disabled devices
-        if device_entry.disabled:
-            continue
 
-        # Skip devices already configured for this integration
-        if device_entry.id in known_devices:
-            continue
+@callback
+def _async_check_device(
+    hass: HomeAssistant, index: DiscoveryIndex, device_entry: DeviceEntry
+) -> bool:
+    """Check a single device, return True if it is newly discovered."""
+    # Skip disabled devices
+    if device_entry.disabled:
+        index.candidates.discard(device_entry.id)
+        return False
 
-        if device_entry.id in seen_device_ids:
-            continue
+    # Skip devices already configured for this integration or already seen
+    if index.async_is_known(device_entry.id):
+        index.candidates.discard(device_entry.id)
+        return False
 
-        # Skip devices without identifiers
-        if not device_entry.identifiers:
-            continue
+    # Only consider devices coming from MQTT integration
+    if not is_mqtt_device(device_entry):
+        return False
 
-        # Only consider devices coming from MQTT integration
-        if not any(identifier[0] == "mqtt" for identifier in device_entry.identifiers):
-            continue
+    # Keep devices without topic as candidate, their topic may show up later
+    connection_topic = find_connection_topic(hass, device_entry.id, log=False)
+    if not connection_topic:
+        index.candidates.add(device_entry.id)
+        return False
+
+    index.async_add_new_device(device_entry, connection_topic)
+    return True
 
-        # skip devices without topic
-        connection_topic = find_connection_topic(hass, device_entry.id, log=False)
-        if not connection_topic:
+
+async def _async_check_devices(
+    hass: HomeAssistant, index: DiscoveryIndex, device_ids: Iterable[str]
+) -> list[DeviceEntry]:
+    """Check devices in time slices, yield to the event loop between slices."""
+    await index.async_load()
+    device_registry = dr.async_get(hass)
+    slice_timing = async_get_stats(hass).timing("discovery_slice")
+    slices = 0
+    max_block = 0.0
+
+    discovered_devices: list[DeviceEntry] = []
+    slice_start = perf_counter()
+    for device_id in device_ids:
+        if (block := perf_counter() - slice_start) >= CONF_DISCOVERY_SLICE_BUDGET:
+            slice_timing.record(block)
+            slices += 1
+            max_block = max(max_block, block)
+            await asyncio.sleep(0)
+            slice_start = perf_counter()
+
+        # The registry may have changed while yielding
+        device_entry = device_registry.async_get(device_id)
+        if device_entry is None:
+            index.async_remove_device(device_id)
             continue
+        if _async_check_device(hass, index, device_entry):
+            discovered_devices.append(device_entry)
+
+    block = perf_counter() - slice_start
+    slice_timing.record(block)
+    _LOGGER.debug(
+        "Checked devices in %d slices, longest loop block %.1f ms",
+        slices + 1,
+        max(max_block, block) * 1e3,
+    )
+    return discovered_devices
+
+
+async def async_discover_devices(hass: HomeAssistant) -> list[DeviceEntry]:
+    """Discover MQTT devices not yet configured for this integration.
+
+    This is the full consistency sweep over the MQTT devices in the registry.
+    """
+    _LOGGER.debug("Run discover devices")
 
-        seen_device_ids.add(device_entry.id)
-        new_devices.append({"id": device_entry.id, "name": device_entry.name})
-        discovered_devices.append(device_entry)
+    start = perf_counter()
+    index = async_get_discovery_index(hass)
+    index.pending.clear()
+    discovered_devices = await _async_check_devices(
+        hass, index, list(index.mqtt_devices)
+    )
+    async_get_stats(hass).timing("discovery_sweep").record(perf_counter() - start)
 
     _LOGGER.debug(
-        "Discovered %d new MQTT devices",
+        "Discovered %d new MQTT devices, topic cache: %s",
         len(discovered_devices),
+        hass.data[DOMAIN]["topic_cache"].stats,
     )
 
     return discovered_devices
 
 
+async def async_discover_pending_devices(hass: HomeAssistant) -> list[DeviceEntry]:
+    """Discover devices changed since the last run and retry candidates."""
+    start = perf_counter()
+    index = async_get_discovery_index(hass)
+
+    device_ids = index.pending | index.candidates
+    index.pending.clear()
+
+    discovered_devices = await _async_check_devices(hass, index, device_ids)
+    async_get_stats(hass).timing("discovery_pending").record(perf_counter() - start)
+
+    _LOGGER.debug(
+        "Checked %d changed MQTT devices, discovered %d",
+        len(device_ids),
+        len(discovered_devices),
+    )
+
+    return discovered_devices
+
+
+@callback
+def async_setup_discovery(hass: HomeAssistant) -> Debouncer:
+    """Set up event driven discovery, return the debouncer for pending devices."""
+    index = async_get_discovery_index(hass)
+    device_registry = dr.async_get(hass)
+    entity_registry = er.async_get(hass)
+
+    async def _async_discover_pending() -> None:
+        async_trigger_discovery(hass, await async_discover_pending_devices(hass))
+
+    async def _async_sweep(now: datetime | None = None) -> None:
+        async_trigger_discovery(hass, await async_discover_devices(hass))
+
+    # Devices and their MQTT entities are added in bursts, evaluate them together
+    pending_debouncer = Debouncer(
+        hass,
+        _LOGGER,
+        cooldown=CONF_DISCOVERY_COOLDOWN.total_seconds(),
+        immediate=False,
+        function=_async_discover_pending,
+    )
+
+    @callback
+    def _async_add_pending(device_id: str) -> None:
+        if index.async_is_known(device_id):
+            return
+        index.pending.add(device_id)
+        pending_debouncer.async_schedule_call()
+
+    @callback
+    def _on_device_registry_updated(
+        event: Event[dr.EventDeviceRegistryUpdatedData],
+    ) -> None:
+        if event.data["action"] == "remove":
+            index.async_remove_device(event.data["device_id"])
+            return
+        if device_entry := device_registry.async_get(event.data["device_id"]):
+            index.async_update_device(device_entry)
+        _async_add_pending(event.data["device_id"])
+
+    @callback
+    def _on_entity_registry_updated(
+        event: Event[er.EventEntityRegistryUpdatedData],
+    ) -> None:
+        # MQTT discovery results in new MQTT entities for a device
+        if event.data["action"] != "create":
+            return
+        entity_entry = entity_registry.async_get(event.data["entity_id"])
+        if (
+            entity_entry is None
+            or entity_entry.platform != "mqtt"
+            or entity_entry.device_id is None
+        ):
+            return
+        _async_add_pending(entity_entry.device_id)
+
+    hass.bus.async_listen(dr.EVENT_DEVICE_REGISTRY_UPDATED, _on_device_registry_updated)
+    hass.bus.async_listen(er.EVENT_ENTITY_REGISTRY_UPDATED, _on_entity_registry_updated)
+
+    @callback
+    def _on_stop(event: Event) -> None:
+        pending_debouncer.async_shutdown()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _on_stop)
+
+    # Initial sweep once all integrations are loaded, then a low frequency
+    # consistency sweep as fallback for missed events.
+    async def _async_initial_sweep(_hass: HomeAssistant) -> None:
+        await _async_sweep()
+
+    async_at_started(hass, _async_initial_sweep)
+    async_track_time_interval(
+        hass, _async_sweep, CONF_DISCOVERY_INTERVAL, cancel_on_shutdown=True
+    )
+
+    return pending_debouncer
+
+
 @callback
 def async_trigger_discovery(
     hass: HomeAssistant,
@@ -2,29 +2,520 @@
 
 from __future__ import annotations
 
+import asyncio
 from collections import Counter
 import logging
+import re
+from time import perf_counter
+from typing import Any
 
-from homeassistant.components.mqtt import debug_info
-from homeassistant.core import HomeAssistant
+from homeassistant.components.mqtt import DOMAIN as MQTT_DOMAIN, debug_info
+from homeassistant.core import Event, HomeAssistant, callback
 from homeassistant.exceptions import HomeAssistantError
-from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.helpers.storage import Store
 
-from .const import CONF_TOPIC
+from .const import (
+    CONF_DISCOVERY_SLICE_BUDGET,
+    CONF_PAYLOAD_AVAILABLE,
+    CONF_PAYLOAD_NOT_AVAILABLE,
+    CONF_STORAGE_SAVE_DELAY,
+    CONF_TOPIC,
+    CONF_TOPIC_INDEX_MAX_AGE,
+    CONF_TOPIC_PATTERNS,
+    DEFAULT_PAYLOAD_AVAILABLE,
+    DEFAULT_PAYLOAD_NOT_AVAILABLE,
+    DEFAULT_TOPIC_PATTERNS,
+    DOMAIN,
+    STORAGE_KEY_TOPIC_CACHE,
+    STORAGE_VERSION,
+)
+from .stats import async_get_stats
 
 _LOGGER = logging.getLogger(__name__)
 
 
+def _pattern_regex(pattern: str) -> str:
+    """Translate a topic pattern to a regex.
+
+    "+" matches exactly one topic level, "#" matches one or more levels.
+    """
+    levels = []
+    for level in pattern.split("/"):
+        if level == "+":
+            levels.append("[^/]+")
+        elif level == "#":
+            levels.append("[^/]+(?:/[^/]+)*")
+        else:
+            levels.append(re.escape(level))
+    return "/".join(levels)
+
+
+class TopicMatcher:
+    """Ranked connection topic patterns compiled into one regex.
+
+    The alternatives are tried in rank order, so the first pattern that
+    matches a topic gives its rank.
+    """
+
+    def __init__(self, patterns: list[str]) -> None:
+        """Compile the patterns, the first one ranks highest."""
+        self.patterns = list(patterns)
+        self._regex = re.compile(
+            "|".join(
+                f"(?P<p{rank}>{_pattern_regex(pattern)})"
+                for rank, pattern in enumerate(self.patterns)
+            )
+        )
+
+    def rank(self, topic: str) -> int | None:
+        """Return the rank of the best pattern matching topic, None if none."""
+        if (match := self._regex.fullmatch(topic)) is None:
+            return None
+        return int(match.lastgroup[1:])  # type: ignore[index]
+
+
+def validate_topic_pattern(pattern: str) -> str:
+    """Validate a single topic pattern."""
+    if not pattern or any(
+        level != wildcard and wildcard in level
+        for level in pattern.split("/")
+        for wildcard in ("+", "#")
+    ):
+        raise ValueError(f"Invalid topic pattern: {pattern}")
+    return pattern
+
+
+@callback
+def async_get_topic_matcher(hass: HomeAssistant) -> TopicMatcher:
+    """Return the topic matcher for the configured patterns."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (matcher := domain_data.get("topic_matcher")) is None:
+        config = domain_data.get("config") or {}
+        matcher = domain_data["topic_matcher"] = TopicMatcher(
+            config.get(CONF_TOPIC_PATTERNS, DEFAULT_TOPIC_PATTERNS)
+        )
+    return matcher
+
+
+class TopicSelector:
+    """Collect the topics of the best rank, then pick one deterministically."""
+
+    __slots__ = ("_matcher", "best_rank", "found_topics")
+
+    def __init__(self, matcher: TopicMatcher) -> None:
+        """Initialize selector."""
+        self._matcher = matcher
+        self.best_rank: int | None = None
+        self.found_topics: list[str] = []
+
+    def add(self, topic: str) -> None:
+        """Add a subscribed topic."""
+        if (rank := self._matcher.rank(topic)) is None:
+            return
+        if self.best_rank is None or rank < self.best_rank:
+            self.best_rank = rank
+            self.found_topics = [topic]
+        elif rank == self.best_rank:
+            self.found_topics.append(topic)
+
+    @property
+    def counts(self) -> Counter[str]:
+        """Return how often each topic of the best rank was found."""
+        return Counter(self.found_topics)
+
+    @property
+    def topic(self) -> str | None:
+        """Return the most used topic of the best rank, then alphabetical."""
+        if not self.found_topics:
+            return None
+        counts = self.counts
+        return min(counts, key=lambda topic: (-counts[topic], topic))
+
+
+class TopicIndex:
+    """Connection topics and availability payloads of all MQTT devices.
+
+    The index is built from the debug info the MQTT integration keeps for all
+    its entities, instead of asking the debug info per device. Registry
+    changes only mark the devices involved, they are indexed again on their
+    next lookup. A full build runs in the background in time slices, on
+    first use and when the index got older than its max age, subscriptions
+    can change without registry changes. Until the first build completes,
+    devices are indexed on lookup.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize index."""
+        self.hass = hass
+        self._device_topics: dict[str, str] = {}
+        self._topic_devices: dict[str, str] = {}
+        # Topic counts of devices with more than one topic of the best rank
+        self._ambiguous: dict[str, Counter[str]] = {}
+        # Custom availability payloads of devices, by availability topic
+        self._device_payloads: dict[str, dict[str, dict[str, str]]] = {}
+        self._entity_devices: dict[str, str] = {}
+        self._dirty: set[str] = set()
+        self._complete = False
+        self._built_at: float | None = None
+        self._build_task: asyncio.Task[None] | None = None
+        self.builds = 0
+
+    @callback
+    def async_invalidate_device(self, device_id: str) -> None:
+        """Index a device again on its next lookup."""
+        self._dirty.add(device_id)
+
+    @callback
+    def async_invalidate_entity(self, entity_id: str) -> str | None:
+        """Index the device of an entity again, return the device."""
+        if (device_id := self._entity_devices.get(entity_id)) is not None:
+            self._dirty.add(device_id)
+        return device_id
+
+    @callback
+    def async_get_topic(self, device_id: str) -> str | None:
+        """Return the connection topic of a device."""
+        self._async_ensure_fresh()
+        if not self._complete or device_id in self._dirty:
+            self._async_index_device(device_id)
+        return self._device_topics.get(device_id)
+
+    @callback
+    def async_get_payloads(self, device_id: str, topic: str) -> dict[str, str]:
+        """Return the custom availability payloads of a device topic."""
+        self._async_ensure_fresh()
+        if not self._complete or device_id in self._dirty:
+            self._async_index_device(device_id)
+        return dict(self._device_payloads.get(device_id, {}).get(topic, {}))
+
+    @callback
+    def async_get_device(self, topic: str) -> str | None:
+        """Return the device of a connection topic, once the index is built."""
+        self._async_ensure_fresh()
+        return self._topic_devices.get(topic)
+
+    @callback
+    def async_get_topic_counts(self, device_id: str) -> Counter[str] | None:
+        """Return the topic counts of a device with an ambiguous topic."""
+        return self._ambiguous.get(device_id)
+
+    @property
+    def available(self) -> bool:
+        """Return if the MQTT integration exposes its debug info."""
+        return self._debug_info_entities() is not None
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Return index statistics."""
+        return {
+            "devices": len(self._device_topics),
+            "ambiguous": len(self._ambiguous),
+            "dirty": len(self._dirty),
+            "complete": self._complete,
+            "builds": self.builds,
+        }
+
+    def _debug_info_entities(self) -> dict[str, dict[str, Any]] | None:
+        mqtt_data = self.hass.data.get(MQTT_DOMAIN)
+        entities = getattr(mqtt_data, "debug_info_entities", None)
+        return entities if isinstance(entities, dict) else None
+
+    @callback
+    def _async_ensure_fresh(self) -> None:
+        """Start a background build when the index is missing or too old."""
+        if self._build_task is not None or (
+            self._built_at is not None
+            and self.hass.loop.time() - self._built_at
+            < CONF_TOPIC_INDEX_MAX_AGE.total_seconds()
+        ):
+            return
+        self._build_task = self.hass.async_create_background_task(
+            self._async_build(), f"{DOMAIN} build topic index"
+        )
+
+    @callback
+    def _async_index_device(self, device_id: str) -> None:
+        """Index the topic of one device from the debug info of its entities."""
+        self._dirty.discard(device_id)
+        entities = self._debug_info_entities() or {}
+        selector = TopicSelector(async_get_topic_matcher(self.hass))
+        payloads: dict[str, dict[str, str]] = {}
+        for entity_entry in er.async_entries_for_device(
+            er.async_get(self.hass), device_id
+        ):
+            self._entity_devices[entity_entry.entity_id] = device_id
+            if (entity_info := entities.get(entity_entry.entity_id)) is not None:
+                for topic in entity_info.get("subscriptions", {}):
+                    selector.add(topic)
+                _add_availability_payloads(payloads, _discovery_payload(entity_info))
+
+        if payloads:
+            self._device_payloads[device_id] = payloads
+        else:
+            self._device_payloads.pop(device_id, None)
+        if (old_topic := self._device_topics.pop(device_id, None)) is not None:
+            if self._topic_devices.get(old_topic) == device_id:
+                del self._topic_devices[old_topic]
+        self._ambiguous.pop(device_id, None)
+        if (topic := selector.topic) is None:
+            return
+        self._device_topics[device_id] = topic
+        self._topic_devices[topic] = device_id
+        if len(counts := selector.counts) > 1:
+            self._ambiguous[device_id] = counts
+
+    async def _async_build(self) -> None:
+        """Build the index in one pass, yielding to the event loop in slices.
+
+        Lookups use the previous index meanwhile. Devices changed during the
+        build stay marked and are indexed again on lookup.
+        """
+        start = perf_counter()
+        built_dirty = set(self._dirty)
+        entity_registry = er.async_get(self.hass)
+        matcher = async_get_topic_matcher(self.hass)
+        selectors: dict[str, TopicSelector] = {}
+        device_payloads: dict[str, dict[str, dict[str, str]]] = {}
+        entity_devices: dict[str, str] = {}
+        slices = 1
+
+        try:
+            slice_start = perf_counter()
+            for entity_id, entity_info in list(
+                (self._debug_info_entities() or {}).items()
+            ):
+                if perf_counter() - slice_start >= CONF_DISCOVERY_SLICE_BUDGET:
+                    await asyncio.sleep(0)
+                    slices += 1
+                    slice_start = perf_counter()
+                entity_entry = entity_registry.async_get(entity_id)
+                if entity_entry is None or entity_entry.device_id is None:
+                    continue
+                device_id = entity_entry.device_id
+                entity_devices[entity_id] = device_id
+                if (selector := selectors.get(device_id)) is None:
+                    selector = selectors[device_id] = TopicSelector(matcher)
+                for topic in entity_info.get("subscriptions", {}):
+                    selector.add(topic)
+                if payload := _discovery_payload(entity_info):
+                    _add_availability_payloads(
+                        device_payloads.setdefault(device_id, {}), payload
+                    )
+        finally:
+            self._build_task = None
+
+        device_topics: dict[str, str] = {}
+        ambiguous: dict[str, Counter[str]] = {}
+        for device_id, selector in selectors.items():
+            if (topic := selector.topic) is None:
+                continue
+            device_topics[device_id] = topic
+            if len(counts := selector.counts) > 1:
+                ambiguous[device_id] = counts
+
+        self._device_topics = device_topics
+        self._topic_devices = {
+            topic: device_id for device_id, topic in device_topics.items()
+        }
+        self._ambiguous = ambiguous
+        self._device_payloads = {
+            device_id: payloads
+            for device_id, payloads in device_payloads.items()
+            if payloads
+        }
+        self._entity_devices = entity_devices
+        self._dirty -= built_dirty
+        self._complete = True
+        self._built_at = self.hass.loop.time()
+
+        self.builds += 1
+        async_get_stats(self.hass).timing("topic_index_build").record(
+            perf_counter() - start
+        )
+        _LOGGER.debug(
+            "Indexed connection topics of %d devices in %d slices, %d ambiguous",
+            len(device_topics),
+            slices,
+            len(ambiguous),
+        )
+
+
+@callback
+def async_get_topic_index(hass: HomeAssistant) -> TopicIndex:
+    """Return the topic index, create it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (index := domain_data.get("topic_index")) is None:
+        index = domain_data["topic_index"] = TopicIndex(hass)
+    return index
+
+
+class TopicCache:
+    """Persistent cache of resolved connection topics keyed by device ID.
+
+    Only found topics are cached, entries are dropped when the device or its
+    MQTT entities change.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize cache."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, STORAGE_KEY_TOPIC_CACHE
+        )
+        self._patterns = async_get_topic_matcher(hass).patterns
+        self._topics: dict[str, str] = {}
+        self._save_pending = False
+        self.hits = 0
+        self.misses = 0
+
+    async def async_load(self) -> None:
+        """Load cached topics, resolved with the same topic patterns."""
+        if (data := await self._store.async_load()) is None:
+            return
+        if data.get("patterns") == self._patterns and isinstance(
+            topics := data.get("topics"), dict
+        ):
+            self._topics = topics
+        else:
+            _LOGGER.debug("Topic patterns changed, drop cached topics")
+            self._async_schedule_save()
+
+    @callback
+    def async_get(self, device_id: str) -> str | None:
+        """Return the cached topic of a device."""
+        topic = self._topics.get(device_id)
+        if topic is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return topic
+
+    @callback
+    def async_set(self, device_id: str, topic: str | None) -> None:
+        """Cache the resolved topic of a device."""
+        if topic is None:
+            self.async_invalidate(device_id)
+            return
+        if self._topics.get(device_id) == topic:
+            return
+        self._topics[device_id] = topic
+        self._async_schedule_save()
+
+    @callback
+    def async_invalidate(self, device_id: str) -> None:
+        """Drop the cached topic of a device."""
+        if self._topics.pop(device_id, None) is not None:
+            self._async_schedule_save()
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return cache statistics."""
+        return {"size": len(self._topics), "hits": self.hits, "misses": self.misses}
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        if self._save_pending:
+            return
+        self._save_pending = True
+        self._store.async_delay_save(self._data_to_save, CONF_STORAGE_SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        # Changes after this snapshot schedule the next save
+        self._save_pending = False
+        return {"patterns": self._patterns, "topics": self._topics}
+
+
+async def async_setup_topic_cache(hass: HomeAssistant) -> TopicCache:
+    """Load the topic cache and keep it in sync with the registries."""
+    cache = TopicCache(hass)
+    await cache.async_load()
+    hass.data[DOMAIN]["topic_cache"] = cache
+
+    index = async_get_topic_index(hass)
+    entity_registry = er.async_get(hass)
+
+    @callback
+    def _on_device_registry_updated(
+        event: Event[dr.EventDeviceRegistryUpdatedData],
+    ) -> None:
+        cache.async_invalidate(event.data["device_id"])
+        index.async_invalidate_device(event.data["device_id"])
+
+    @callback
+    def _on_entity_registry_updated(
+        event: Event[er.EventEntityRegistryUpdatedData],
+    ) -> None:
+        # MQTT entities are (re)created or removed by MQTT discovery. The
+        # index knows the device of indexed entities, also after removal.
+        if (
+            device_id := index.async_invalidate_entity(event.data["entity_id"])
+        ) is not None:
+            cache.async_invalidate(device_id)
+        if event.data["action"] == "update" and (
+            old_device_id := event.data["changes"].get("device_id")
+        ):
+            index.async_invalidate_device(old_device_id)
+            cache.async_invalidate(old_device_id)
+
+        entity_entry = entity_registry.async_get(event.data["entity_id"])
+        if (
+            entity_entry is None
+            or entity_entry.platform != "mqtt"
+            or entity_entry.device_id is None
+        ):
+            return
+        index.async_invalidate_device(entity_entry.device_id)
+        cache.async_invalidate(entity_entry.device_id)
+
+    hass.bus.async_listen(dr.EVENT_DEVICE_REGISTRY_UPDATED, _on_device_registry_updated)
+    hass.bus.async_listen(er.EVENT_ENTITY_REGISTRY_UPDATED, _on_entity_registry_updated)
+
+    return cache
+
+
 def find_connection_topic(
     hass: HomeAssistant,
     device_id: str,
     *,
     log: bool = True,
+    use_cache: bool = True,
 ) -> str | None:
     """Find the first connection topic for a device via mqtt debug info.
 
     Set log=False to disable debug/error logging fom this function.
+    Set use_cache=False to resolve again from the device debug info and
+    refresh the cached topic.
     """
+    cache: TopicCache | None = hass.data.get(DOMAIN, {}).get("topic_cache")
+    if cache is None:
+        return _resolve_connection_topic(hass, device_id, log=log)
+
+    if use_cache and (topic := cache.async_get(device_id)) is not None:
+        return topic
+
+    start = perf_counter()
+    index = async_get_topic_index(hass)
+    if use_cache and index.available:
+        topic = index.async_get_topic(device_id)
+        if log:
+            _log_connection_topic(
+                hass, device_id, topic, index.async_get_topic_counts(device_id)
+            )
+    else:
+        topic = _resolve_connection_topic(hass, device_id, log=log)
+    async_get_stats(hass).timing("topic_resolution").record(perf_counter() - start)
+    cache.async_set(device_id, topic)
+    return topic
+
+
+def _resolve_connection_topic(
+    hass: HomeAssistant,
+    device_id: str,
+    *,
+    log: bool,
+) -> str | None:
+    """Resolve the connection topic of a device from mqtt debug info."""
     device_registry = dr.async_get(hass)
     device = device_registry.async_get(device_id)
     device_name = device.name if device else device_id
@@ -44,50 +535,114 @@ def find_connection_topic(
     if not isinstance(entities, list):
         return None
 
-    found_topics: list[str] = []
-
+    # One pass over all subscriptions, keeping the topics of the best rank
+    selector = TopicSelector(async_get_topic_matcher(hass))
     for entity in entities:
         subscriptions = entity.get("subscriptions")
         if not isinstance(subscriptions, list):
             continue
-
         for sub in subscriptions:
             topic = sub.get(CONF_TOPIC)
-            if isinstance(topic, str) and topic.endswith("/availability"):
-                found_topics.append(topic)
-
-        if not found_topics:
-            for sub in subscriptions:
-                topic = sub.get(CONF_TOPIC)
-                if isinstance(topic, str) and topic.endswith("/status"):
-                    found_topics.append(topic)
-
-    if found_topics:
-        counts = Counter(found_topics)
-
-        if len(counts) > 1:
-            if log:
-                _LOGGER.error(
-                    "Multiple different connection topics found for device %s. "
-                    "Using the last one, but this is ambiguous. Details: %s",
-                    device_name,
-                    dict(counts),
-                )
-        else:
-            only_topic = next(iter(counts))
-            if log:
-                _LOGGER.debug(
-                    "Single connection topic found for device %s: %s (found %d times)",
-                    device_name,
-                    only_topic,
-                    counts[only_topic],
-                )
-
-        return found_topics[-1]
+            if isinstance(topic, str):
+                selector.add(topic)
 
+    topic = selector.topic
     if log:
+        _log_connection_topic(hass, device_id, topic, selector.counts)
+    return topic
+
+
+def _log_connection_topic(
+    hass: HomeAssistant,
+    device_id: str,
+    topic: str | None,
+    counts: Counter[str] | None,
+) -> None:
+    """Log the resolved connection topic, an ambiguous topic as error."""
+    device = dr.async_get(hass).async_get(device_id)
+    device_name = device.name if device else device_id
+
+    if topic is None:
         _LOGGER.debug(
             "No connection topics found for device %s",
             device_name,
         )
-    return None
+    elif counts is not None and len(counts) > 1:
+        _LOGGER.error(
+            "Multiple different connection topics found for device %s. "
+            "Using %s, but this is ambiguous. Details: %s",
+            device_name,
+            topic,
+            dict(counts),
+        )
+    else:
+        _LOGGER.debug(
+            "Single connection topic found for device %s: %s",
+            device_name,
+            topic,
+        )
+
+
+def find_availability_payloads(
+    hass: HomeAssistant,
+    device_id: str,
+    topic: str,
+) -> dict[str, str]:
+    """Find custom availability payloads for a topic via mqtt discovery data.
+
+    Only payloads that differ from the defaults "online" and "offline" are
+    returned, keyed by CONF_PAYLOAD_AVAILABLE and CONF_PAYLOAD_NOT_AVAILABLE.
+    """
+    index = async_get_topic_index(hass)
+    if index.available:
+        return index.async_get_payloads(device_id, topic)
+
+    try:
+        discovery_info = debug_info.info_for_device(hass, device_id)
+    except HomeAssistantError:
+        return {}
+
+    payloads: dict[str, dict[str, str]] = {}
+    for entity in discovery_info.get("entities") or []:
+        _add_availability_payloads(
+            payloads, (entity.get("discovery_data") or {}).get("payload")
+        )
+    return payloads.get(topic, {})
+
+
+def _discovery_payload(entity_info: dict[str, Any]) -> Any:
+    """Return the discovery payload of an entity in the MQTT debug info."""
+    return (entity_info.get("discovery_data") or {}).get("discovery_payload")
+
+
+def _add_availability_payloads(
+    payloads: dict[str, dict[str, str]], discovery_payload: Any
+) -> None:
+    """Add the custom availability payloads of a discovery payload by topic.
+
+    The first entity announcing custom payloads for a topic wins.
+    """
+    if not isinstance(discovery_payload, dict):
+        return
+
+    availability = discovery_payload.get("availability")
+    if not isinstance(availability, list):
+        availability = [discovery_payload]
+        availability_topic_key = "availability_topic"
+    else:
+        availability_topic_key = CONF_TOPIC
+
+    for item in availability:
+        if not isinstance(item, dict):
+            continue
+        topic = item.get(availability_topic_key)
+        if not isinstance(topic, str) or topic in payloads:
+            continue
+        custom = {
+            key: value
+            for key in (CONF_PAYLOAD_AVAILABLE, CONF_PAYLOAD_NOT_AVAILABLE)
+            if isinstance(value := item.get(key), str)
+            and value not in (DEFAULT_PAYLOAD_AVAILABLE, DEFAULT_PAYLOAD_NOT_AVAILABLE)
+        }
+        if custom:
+            payloads[topic] = custom
@@ -0,0 +1,161 @@
+"""Connection history for MQTT connection state custom integration."""
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterator
+from datetime import datetime
+import time
+from typing import Any
+
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    CONF_HISTORY_SAVE_DELAY,
+    CONF_HISTORY_SIZE,
+    DOMAIN,
+    STORAGE_KEY_HISTORY,
+    STORAGE_VERSION,
+)
+
+STATE_CODES: dict[str, int] = {"offline": 0, "online": 1, "unavailable": 2}
+CODE_STATES: tuple[str, ...] = tuple(STATE_CODES)
+
+
+class DeviceHistory:
+    """Ring buffer of the last state transitions of one device.
+
+    Timestamps and states are kept in arrays, 9 bytes per transition.
+    """
+
+    __slots__ = ("_next", "count", "states", "times")
+
+    def __init__(self, size: int) -> None:
+        """Initialize ring buffer."""
+        self.times = array("d", bytes(8 * size))
+        self.states = array("b", bytes(size))
+        self.count = 0
+        self._next = 0
+
+    def append(self, timestamp: float, code: int) -> None:
+        """Add a transition, overwriting the oldest when full."""
+        self.times[self._next] = timestamp
+        self.states[self._next] = code
+        self._next = (self._next + 1) % len(self.times)
+        if self.count < len(self.times):
+            self.count += 1
+
+    def __iter__(self) -> Iterator[tuple[float, int]]:
+        """Iterate over (timestamp, state code) from oldest to newest."""
+        size = len(self.times)
+        start = (self._next - self.count) % size
+        for offset in range(self.count):
+            index = (start + offset) % size
+            yield self.times[index], self.states[index]
+
+
+class ConnectionHistory:
+    """Recent connection transitions of all devices, persisted in a Store.
+
+    A save is scheduled once per save delay. Scheduling it again on every
+    transition would postpone it as long as any device keeps changing.
+    """
+
+    def __init__(self, hass: HomeAssistant, size: int) -> None:
+        """Initialize history."""
+        self._store: Store[dict[str, list[list[float]]]] = Store(
+            hass, STORAGE_VERSION, STORAGE_KEY_HISTORY
+        )
+        self._size = size
+        self._devices: dict[str, DeviceHistory] = {}
+        self._save_pending = False
+
+    async def async_load(self) -> None:
+        """Load the last snapshot from storage."""
+        if not (data := await self._store.async_load()):
+            return
+        for device_id, transitions in data.items():
+            history = self._devices[device_id] = DeviceHistory(self._size)
+            for timestamp, code in transitions[-self._size :]:
+                history.append(timestamp, int(code))
+
+    @callback
+    def async_record(self, device_id: str, state: str) -> None:
+        """Record a transition of a device to state."""
+        if (history := self._devices.get(device_id)) is None:
+            history = self._devices[device_id] = DeviceHistory(self._size)
+        history.append(time.time(), STATE_CODES[state])
+        self._async_schedule_save()
+
+    @callback
+    def async_remove_device(self, device_id: str) -> None:
+        """Forget the history of a device."""
+        if self._devices.pop(device_id, None) is not None:
+            self._async_schedule_save()
+
+    @callback
+    def async_get_transitions(
+        self, device_id: str, since: datetime | None = None
+    ) -> list[dict[str, Any]]:
+        """Return the transitions of a device, oldest first."""
+        if (history := self._devices.get(device_id)) is None:
+            return []
+        after = since.timestamp() if since is not None else 0.0
+        return [
+            {
+                "time": dt_util.utc_from_timestamp(timestamp).isoformat(),
+                "state": CODE_STATES[code],
+            }
+            for timestamp, code in history
+            if timestamp >= after
+        ]
+
+    @property
+    def device_ids(self) -> list[str]:
+        """Return the devices with history."""
+        return list(self._devices)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return history statistics."""
+        return {
+            "devices": len(self._devices),
+            "transitions": sum(history.count for history in self._devices.values()),
+        }
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        if self._save_pending:
+            return
+        self._save_pending = True
+        self._store.async_delay_save(self._data_to_save, CONF_HISTORY_SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, list[list[float]]]:
+        # Transitions after this snapshot schedule the next save
+        self._save_pending = False
+        return {
+            device_id: [[timestamp, code] for timestamp, code in history]
+            for device_id, history in self._devices.items()
+        }
+
+
+async def async_setup_history(hass: HomeAssistant) -> ConnectionHistory:
+    """Load the connection history and drop it for removed devices."""
+    history = ConnectionHistory(hass, hass.data[DOMAIN]["config"][CONF_HISTORY_SIZE])
+    await history.async_load()
+    hass.data[DOMAIN]["history"] = history
+
+    @callback
+    def _on_device_registry_updated(
+        event: Event[dr.EventDeviceRegistryUpdatedData],
+    ) -> None:
+        if event.data["action"] == "remove":
+            history.async_remove_device(event.data["device_id"])
+
+    hass.bus.async_listen(dr.EVENT_DEVICE_REGISTRY_UPDATED, _on_device_registry_updated)
+
+    return history
@@ -7,6 +7,9 @@ from homeassistant.components.repairs import ConfirmRepairFlow, RepairsFlow
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 
+from .const import CONF_DEVICES
+from .discovery import async_get_hub_orphans
+
 
 class OrphanedDeviceRepairFlow(RepairsFlow):
     """Repair flow for orphaned device connection sensor."""
@@ -33,12 +36,41 @@ class OrphanedDeviceRepairFlow(RepairsFlow):
         return self.async_show_form(step_id="confirm")
 
 
+class HubOrphansRepairFlow(RepairsFlow):
+    """Repair flow for hub devices without primary device."""
+
+    async def async_step_init(self, user_input=None) -> data_entry_flow.FlowResult:
+        """Repair flow for hub devices without primary device."""
+        return await self.async_step_confirm()
+
+    async def async_step_confirm(self, user_input=None) -> data_entry_flow.FlowResult:
+        """Repair flow for hub devices without primary device."""
+        if user_input is not None:
+            # On confirm, remove the orphaned devices from the hub
+            entry_id = self.issue_id.removeprefix("hub_orphans_")
+            entry = self.hass.config_entries.async_get_entry(entry_id)
+            if entry and (orphans := async_get_hub_orphans(self.hass, entry)):
+                devices = {
+                    device_id: device_data
+                    for device_id, device_data in entry.data[CONF_DEVICES].items()
+                    if device_id not in orphans
+                }
+                self.hass.config_entries.async_update_entry(
+                    entry, data={**entry.data, CONF_DEVICES: devices}
+                )
+            return self.async_create_entry(title="", data={})
+
+        return self.async_show_form(step_id="confirm")
+
+
 async def async_create_fix_flow(
     hass: HomeAssistant,
     issue_id: str,
     data: dict[str, str],
 ) -> RepairsFlow:
     """Create flow."""
+    if issue_id.startswith("hub_orphans_"):
+        return HubOrphansRepairFlow()
     if issue_id.startswith("orphaned_"):
         return OrphanedDeviceRepairFlow(data)
     return ConfirmRepairFlow()
@@ -0,0 +1,166 @@
+"""Fleet summary sensors for MQTT connection state custom integration."""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.const import EntityCategory
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
+
+from .const import (
+    CONF_FLEET_OFFLINE_LIST_MAX,
+    CONF_FLEET_UPDATE_INTERVAL,
+    DOMAIN,
+    SIGNAL_NEW_BRIDGE,
+)
+from .coordinator import FLEET_STATES, BridgeCoordinator
+from .timers import async_get_timer_heap
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_platform(
+    hass: HomeAssistant,
+    config: ConfigType,
+    async_add_entities: AddEntitiesCallback,
+    discovery_info: DiscoveryInfoType | None = None,
+) -> None:
+    """Set up the fleet sensors, one per bridge and one for all bridges."""
+    coordinators: dict[str, BridgeCoordinator] = hass.data[DOMAIN].setdefault(
+        "coordinators", {}
+    )
+    fleet_sensor = FleetSensorEntity(hass, None)
+    async_add_entities(
+        [
+            fleet_sensor,
+            *(
+                FleetSensorEntity(hass, coordinator)
+                for coordinator in coordinators.values()
+            ),
+        ]
+    )
+
+    @callback
+    def _async_new_bridge(coordinator: BridgeCoordinator) -> None:
+        _LOGGER.debug("Add fleet sensor for bridge %s", coordinator.base)
+        fleet_sensor.async_add_coordinator(coordinator)
+        async_add_entities([FleetSensorEntity(hass, coordinator)])
+
+    # New bridges are added for as long as the fleet sensor exists
+    fleet_sensor.async_on_remove(
+        async_dispatcher_connect(hass, SIGNAL_NEW_BRIDGE, _async_new_bridge)
+    )
+
+
+class FleetSensorEntity(SensorEntity):
+    """Number of offline devices of one bridge, or of all bridges.
+
+    Counts are kept by the bridge coordinators, state writes are limited to
+    one per update interval.
+    """
+
+    _attr_should_poll = False
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_has_entity_name = True
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = "devices"
+    _unrecorded_attributes = frozenset({"offline_devices"})
+
+    def __init__(
+        self, hass: HomeAssistant, coordinator: BridgeCoordinator | None
+    ) -> None:
+        """Initialize sensor, without coordinator it sums all bridges."""
+        self.hass = hass
+        self._coordinators: list[BridgeCoordinator]
+        config: dict[str, Any] = hass.data[DOMAIN]["config"]
+        if coordinator is None:
+            self._coordinators = list(
+                hass.data[DOMAIN].setdefault("coordinators", {}).values()
+            )
+            self._attr_unique_id = "fleet_offline"
+            self._attr_translation_key = "fleet_offline"
+        else:
+            self._coordinators = [coordinator]
+            self._attr_unique_id = f"bridge_{coordinator.base}_offline"
+            self._attr_translation_key = "bridge_offline"
+            self._attr_translation_placeholders = {"bridge": coordinator.base}
+            config = coordinator.config
+
+        self._interval: float = config[CONF_FLEET_UPDATE_INTERVAL].total_seconds()
+        self._timers = async_get_timer_heap(hass)
+        self._last_write = float("-inf")
+        self._unsub_write: CALLBACK_TYPE | None = None
+        self._unsub_listeners: list[CALLBACK_TYPE] = []
+        self._listening = False
+
+    @callback
+    def async_add_coordinator(self, coordinator: BridgeCoordinator) -> None:
+        """Include a new bridge in the sums."""
+        self._coordinators.append(coordinator)
+        if self._listening:
+            self._unsub_listeners.append(
+                coordinator.async_add_count_listener(self._async_schedule_write)
+            )
+            self._async_schedule_write()
+
+    async def async_added_to_hass(self) -> None:
+        """Listen to count changes."""
+        self._listening = True
+        self._unsub_listeners = [
+            coordinator.async_add_count_listener(self._async_schedule_write)
+            for coordinator in self._coordinators
+        ]
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop listening."""
+        self._listening = False
+        for unsub in self._unsub_listeners:
+            unsub()
+        self._unsub_listeners = []
+        if self._unsub_write is not None:
+            self._unsub_write()
+            self._unsub_write = None
+
+    @callback
+    def _async_schedule_write(self) -> None:
+        """Write the state, at most once per update interval."""
+        if self._unsub_write is not None:
+            return
+        when = max(self.hass.loop.time(), self._last_write + self._interval)
+        self._unsub_write = self._timers.async_call_at(when, self._async_write)
+
+    @callback
+    def _async_write(self) -> None:
+        self._unsub_write = None
+        self._last_write = self.hass.loop.time()
+        self.async_write_ha_state()
+
+    @property
+    def native_value(self) -> int:
+        """Return the number of offline devices."""
+        return sum(coordinator.counts["offline"] for coordinator in self._coordinators)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the counts and the offline devices."""
+        attributes: dict[str, Any] = {
+            state: sum(coordinator.counts[state] for coordinator in self._coordinators)
+            for state in FLEET_STATES
+        }
+        attributes["total"] = sum(
+            len(coordinator.entities) for coordinator in self._coordinators
+        )
+
+        offline_devices: list[str] = []
+        for coordinator in self._coordinators:
+            for device_id, name in coordinator.offline_devices.items():
+                if len(offline_devices) == CONF_FLEET_OFFLINE_LIST_MAX:
+                    break
+                offline_devices.append(name or device_id)
+        attributes["offline_devices"] = offline_devices
+        return attributes
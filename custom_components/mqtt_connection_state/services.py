@@ -2,9 +2,14 @@
 
 from __future__ import annotations
 
-import json
+import asyncio
+from fnmatch import fnmatchcase
 import logging
+from typing import Any
 
+import voluptuous as vol
+
+from homeassistant.config_entries import SOURCE_IMPORT
 from homeassistant.core import (
     HomeAssistant,
     ServiceCall,
@@ -12,11 +17,66 @@ from homeassistant.core import (
     SupportsResponse,
     callback,
 )
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import (
+    config_validation as cv,
+    entity_registry as er,
+    issue_registry as ir,
+)
+from homeassistant.helpers.service import async_register_admin_service
+from homeassistant.util import dt as dt_util
 
-from .const import DOMAIN, SERV_LIST_NEW_DEVICES
+from .const import (
+    CONF_DEVICE_ID,
+    CONF_DEVICES,
+    CONF_PAYLOAD_AVAILABLE,
+    CONF_PAYLOAD_NOT_AVAILABLE,
+    CONF_TOPIC,
+    DOMAIN,
+    SERV_GET_HISTORY,
+    SERV_LIST_NEW_DEVICES,
+    SERV_MIGRATE_TO_HUB,
+    SERV_RELOAD_BRIDGE,
+)
+from .binary_sensor import async_reload_hub_entities
+from .discovery import async_get_discovery_index, async_get_hub_entry
 
 _LOGGER = logging.getLogger(__name__)
 
+ATTR_BRIDGE = "bridge"
+ATTR_IDS_ONLY = "ids_only"
+ATTR_LIMIT = "limit"
+ATTR_MANUFACTURER = "manufacturer"
+ATTR_MODEL = "model"
+ATTR_NAME = "name"
+ATTR_OFFSET = "offset"
+ATTR_SINCE = "since"
+
+LIST_NEW_DEVICES_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_OFFSET, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+        vol.Optional(ATTR_LIMIT, default=100): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=10000)
+        ),
+        vol.Optional(ATTR_BRIDGE): cv.string,
+        vol.Optional(ATTR_MANUFACTURER): cv.string,
+        vol.Optional(ATTR_MODEL): cv.string,
+        vol.Optional(ATTR_NAME): cv.string,
+        vol.Optional(ATTR_IDS_ONLY, default=False): cv.boolean,
+    }
+)
+
+RELOAD_BRIDGE_SCHEMA = vol.Schema({vol.Required(ATTR_BRIDGE): cv.string})
+
+GET_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Optional(CONF_DEVICE_ID): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_SINCE): cv.datetime,
+    }
+)
+
 
 @callback
 def async_setup_services(hass: HomeAssistant) -> None:
@@ -28,12 +88,190 @@ def async_setup_services(hass: HomeAssistant) -> None:
         DOMAIN,
         SERV_LIST_NEW_DEVICES,
         _async_list_new_devices,
+        schema=LIST_NEW_DEVICES_SCHEMA,
         supports_response=SupportsResponse.ONLY,
     )
 
+    hass.services.async_register(
+        DOMAIN,
+        SERV_GET_HISTORY,
+        _async_get_history,
+        schema=GET_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async_register_admin_service(
+        hass,
+        DOMAIN,
+        SERV_MIGRATE_TO_HUB,
+        _async_migrate_to_hub,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async_register_admin_service(
+        hass,
+        DOMAIN,
+        SERV_RELOAD_BRIDGE,
+        _async_reload_bridge,
+        schema=RELOAD_BRIDGE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
 
 async def _async_list_new_devices(call: ServiceCall) -> ServiceResponse:
-    """List new devices."""
+    """List new devices, filtered and one page at a time."""
 
     _LOGGER.debug("Run list devices action")
-    return {"new_devices": json.dumps(call.hass.data[DOMAIN]["new_devices"], indent=2)}
+    index = async_get_discovery_index(call.hass)
+    await index.async_load()
+    configured = index.configured
+    # Exact filters compare case insensitive, the name filter is a pattern
+    filters = {
+        key: call.data[key].casefold()
+        for key in (ATTR_BRIDGE, ATTR_MANUFACTURER, ATTR_MODEL)
+        if key in call.data
+    }
+    name_pattern = call.data[ATTR_NAME].casefold() if ATTR_NAME in call.data else None
+
+    def _matches(device: dict[str, Any]) -> bool:
+        if device["id"] in configured:
+            return False
+        for key, value in filters.items():
+            if (device.get(key) or "").casefold() != value:
+                return False
+        return name_pattern is None or fnmatchcase(
+            (device.get(ATTR_NAME) or "").casefold(), name_pattern
+        )
+
+    devices = [device for device in index.new_devices.values() if _matches(device)]
+    offset = call.data[ATTR_OFFSET]
+    limit = call.data[ATTR_LIMIT]
+    page = devices[offset : offset + limit]
+
+    response: dict[str, Any] = {
+        "total": len(devices),
+        "offset": offset,
+        "next_offset": offset + limit if offset + limit < len(devices) else None,
+    }
+    if call.data[ATTR_IDS_ONLY]:
+        response["device_ids"] = [device["id"] for device in page]
+    else:
+        response["new_devices"] = page
+    return response
+
+
+async def _async_get_history(call: ServiceCall) -> ServiceResponse:
+    """Return the recent connection transitions of devices."""
+
+    _LOGGER.debug("Run get history action")
+    history = call.hass.data[DOMAIN]["history"]
+    device_ids = call.data.get(CONF_DEVICE_ID, history.device_ids)
+    since = call.data.get(ATTR_SINCE)
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=dt_util.get_default_time_zone())
+
+    return {
+        "devices": {
+            device_id: history.async_get_transitions(device_id, since)
+            for device_id in device_ids
+        }
+    }
+
+
+async def _async_migrate_to_hub(call: ServiceCall) -> ServiceResponse:
+    """Move all single device entries into the hub, keeping their entities."""
+
+    _LOGGER.debug("Run migrate to hub action")
+    hass = call.hass
+    entries = hass.config_entries.async_entries(DOMAIN)
+
+    hub = async_get_hub_entry(hass)
+    if hub is None:
+        await hass.config_entries.flow.async_init(
+            DOMAIN, context={"source": SOURCE_IMPORT}, data={CONF_DEVICES: {}}
+        )
+        hub = async_get_hub_entry(hass)
+        if hub is None:
+            raise HomeAssistantError(
+                translation_domain=DOMAIN,
+                translation_key="hub_not_created",
+                translation_placeholders={},
+            )
+
+    device_entries = [
+        entry
+        for entry in entries
+        if CONF_DEVICES not in entry.data and entry.data.get(CONF_DEVICE_ID)
+    ]
+    entity_registry = er.async_get(hass)
+    devices = dict(hub.data[CONF_DEVICES])
+
+    for entry in device_entries:
+        device_id = entry.data[CONF_DEVICE_ID]
+        await hass.config_entries.async_unload(entry.entry_id)
+
+        # Move the entity to the hub, so entity ID and history are kept
+        for entity_entry in er.async_entries_for_config_entry(
+            entity_registry, entry.entry_id
+        ):
+            entity_registry.async_update_entity(
+                entity_entry.entity_id,
+                config_entry_id=hub.entry_id,
+                new_unique_id=f"{hub.entry_id}_{device_id}_connection_state",
+            )
+
+        devices[device_id] = {
+            key: entry.data[key]
+            for key in (CONF_TOPIC, CONF_PAYLOAD_AVAILABLE, CONF_PAYLOAD_NOT_AVAILABLE)
+            if key in entry.data
+        }
+        ir.async_delete_issue(hass, DOMAIN, f"orphaned_{entry.entry_id}")
+        await hass.config_entries.async_remove(entry.entry_id)
+
+    # Added devices are set up by the hub without a reload
+    hass.config_entries.async_update_entry(
+        hub, data={**hub.data, CONF_DEVICES: devices}
+    )
+
+    return {
+        "hub": hub.entry_id,
+        "devices_migrated": len(device_entries),
+        "devices_monitored": len(devices),
+    }
+
+
+async def _async_reload_bridge(call: ServiceCall) -> ServiceResponse:
+    """Set up the devices of one bridge again, other bridges are not touched."""
+
+    _LOGGER.debug("Run reload bridge action")
+    hass = call.hass
+    bridge = call.data[ATTR_BRIDGE]
+    coordinator = hass.data[DOMAIN].get("coordinators", {}).get(bridge)
+    if coordinator is None or not coordinator.entities:
+        raise HomeAssistantError(
+            translation_domain=DOMAIN,
+            translation_key="unknown_bridge",
+            translation_placeholders={"bridge": bridge},
+        )
+
+    # Device entries are reloaded, hub entries only reload the bridge devices
+    entry_ids: set[str] = set()
+    hub_devices: dict[str, set[str]] = {}
+    for entity in coordinator.entities:
+        if CONF_DEVICES in entity.entry.data:
+            hub_devices.setdefault(entity.entry.entry_id, set()).add(entity.device_id)
+        else:
+            entry_ids.add(entity.entry.entry_id)
+    devices = len(coordinator.entities)
+
+    # Entries are set up independently, reload them all at once
+    await asyncio.gather(
+        *(hass.config_entries.async_reload(entry_id) for entry_id in entry_ids),
+        *(
+            async_reload_hub_entities(hass, entry, device_ids)
+            for entry_id, device_ids in hub_devices.items()
+            if (entry := hass.config_entries.async_get_entry(entry_id))
+        ),
+    )
+
+    return {"bridge": bridge, "devices_reloaded": devices}
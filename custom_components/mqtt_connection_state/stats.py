@@ -0,0 +1,96 @@
+"""Hot path instrumentation for MQTT connection state custom integration."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DOMAIN
+
+# Upper bounds of the latency buckets in seconds, the last bucket is open
+BUCKETS: tuple[float, ...] = (
+    10e-6,
+    50e-6,
+    100e-6,
+    500e-6,
+    1e-3,
+    5e-3,
+    10e-3,
+    50e-3,
+    100e-3,
+    500e-3,
+)
+
+
+class Timing:
+    """Counter and latency histogram with fixed buckets."""
+
+    __slots__ = ("count", "counts", "max", "total")
+
+    def __init__(self) -> None:
+        """Initialize timing."""
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.counts = [0] * (len(BUCKETS) + 1)
+
+    def record(self, seconds: float) -> None:
+        """Record one sample."""
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the timing as a serializable dict."""
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1e3, 3),
+            "mean_us": round(self.total / self.count * 1e6, 1) if self.count else None,
+            "max_ms": round(self.max * 1e3, 3),
+            "buckets_us": {
+                (f"<={bound * 1e6:g}" if index < len(BUCKETS) else "inf"): count
+                for index, (bound, count) in enumerate(
+                    zip((*BUCKETS, float("inf")), self.counts, strict=True)
+                )
+            },
+        }
+
+
+class Stats:
+    """Counters and timings of the integration."""
+
+    def __init__(self) -> None:
+        """Initialize stats."""
+        self.counters: dict[str, int] = {}
+        self.timings: dict[str, Timing] = {}
+
+    def timing(self, name: str) -> Timing:
+        """Return the timing for name, create it on first use."""
+        if (timing := self.timings.get(name)) is None:
+            timing = self.timings[name] = Timing()
+        return timing
+
+    def increment(self, name: str, count: int = 1) -> None:
+        """Increment a counter."""
+        self.counters[name] = self.counters.get(name, 0) + count
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all stats as a serializable dict."""
+        return {
+            "counters": dict(self.counters),
+            "timings": {
+                name: timing.as_dict() for name, timing in self.timings.items()
+            },
+        }
+
+
+@callback
+def async_get_stats(hass: HomeAssistant) -> Stats:
+    """Return the integration stats, create them on first use."""
+    if (stats := hass.data[DOMAIN].get("stats")) is None:
+        stats = hass.data[DOMAIN]["stats"] = Stats()
+    return stats
@@ -0,0 +1,88 @@
+"""Shared timer heap for MQTT connection state custom integration."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import heapq
+from itertools import count
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import DOMAIN
+
+
+class TimerHeap:
+    """Run callbacks at a loop time, using one loop timer for all of them.
+
+    Cancelled timers stay in the heap and are skipped when they come due.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize timer heap."""
+        self.hass = hass
+        self._heap: list[tuple[float, int, list[Callable[[], None] | None]]] = []
+        self._sequence = count()
+        self._handle: asyncio.TimerHandle | None = None
+        self._handle_when: float | None = None
+
+    def __len__(self) -> int:
+        """Return the number of timers, including cancelled ones."""
+        return len(self._heap)
+
+    @callback
+    def async_call_at(self, when: float, action: Callable[[], None]) -> CALLBACK_TYPE:
+        """Run action at loop time when, return cancel."""
+        holder: list[Callable[[], None] | None] = [action]
+        heapq.heappush(self._heap, (when, next(self._sequence), holder))
+        if self._handle_when is None or when < self._handle_when:
+            self._async_schedule(when)
+
+        @callback
+        def _async_cancel() -> None:
+            holder[0] = None
+
+        return _async_cancel
+
+    @callback
+    def _async_schedule(self, when: float) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+        self._handle_when = when
+        self._handle = self.hass.loop.call_at(when, self._async_run_due)
+
+    @callback
+    def _async_run_due(self) -> None:
+        """Run all due timers and schedule the loop timer for the next one."""
+        self._handle = None
+        self._handle_when = None
+        heap = self._heap
+        now = self.hass.loop.time()
+        while heap and heap[0][0] <= now:
+            _, _, holder = heapq.heappop(heap)
+            if (action := holder[0]) is not None:
+                holder[0] = None
+                action()
+
+        # Drop cancelled timers at the top, they don't need a loop timer
+        while heap and heap[0][2][0] is None:
+            heapq.heappop(heap)
+        if heap:
+            self._async_schedule(heap[0][0])
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Cancel the loop timer."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+            self._handle_when = None
+        self._heap.clear()
+
+
+@callback
+def async_get_timer_heap(hass: HomeAssistant) -> TimerHeap:
+    """Return the integration wide timer heap, create it on first use."""
+    if (timers := hass.data[DOMAIN].get("timers")) is None:
+        timers = hass.data[DOMAIN]["timers"] = TimerHeap(hass)
+    return timers
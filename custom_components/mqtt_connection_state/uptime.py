@@ -0,0 +1,139 @@
+"""Rolling availability statistics for MQTT connection state custom integration."""
+
+from __future__ import annotations
+
+from array import array
+from typing import Any
+
+BUCKET_SECONDS = 3600
+DAY_BUCKETS = 24
+WEEK_BUCKETS = 7 * DAY_BUCKETS
+# Less observed time than this has no meaningful uptime
+MIN_OBSERVED_SECONDS = 1.0
+
+
+class AvailabilityStats:
+    """Uptime, outages and MTBF over sliding windows of one day and one week.
+
+    Time is accumulated in hourly buckets with running sums per window, so an
+    update costs O(1) apart from skipping over buckets without updates.
+    """
+
+    __slots__ = (
+        "_bucket",
+        "_day",
+        "_online",
+        "_observed",
+        "_outages",
+        "_since",
+        "_was_online",
+        "_week",
+        "is_online",
+    )
+
+    def __init__(self) -> None:
+        """Initialize statistics."""
+        # Doubles, so the running sums drop exactly what was added to a
+        # bucket, about 3 kB per device
+        self._online = array("d", bytes(8 * WEEK_BUCKETS))
+        self._observed = array("d", bytes(8 * WEEK_BUCKETS))
+        self._outages = array("H", bytes(2 * WEEK_BUCKETS))
+        # Running sums of online seconds, observed seconds and outages
+        self._day = [0.0, 0.0, 0]
+        self._week = [0.0, 0.0, 0]
+        self._bucket: int | None = None
+        self._since = 0.0
+        self.is_online: bool | None = None
+        self._was_online = False
+
+    def update(self, now: float, is_online: bool | None) -> None:
+        """Account the time since the last update and switch state.
+
+        None means the state is unknown, that time is not observed. An outage
+        is counted when a device goes offline after it was last seen online.
+        """
+        self.advance(now)
+        if is_online is False and self._was_online:
+            self._add(self._outages, 1, 2)
+        if is_online is not None:
+            self._was_online = is_online
+        self.is_online = is_online
+
+    def advance(self, now: float) -> None:
+        """Account the time since the last update in the current state."""
+        bucket = int(now // BUCKET_SECONDS)
+        if self._bucket is None:
+            self._bucket = bucket
+            self._since = now
+            return
+
+        start = self._since
+        if bucket - self._bucket > WEEK_BUCKETS:
+            # All buckets before the last week leave the windows
+            self._clear()
+            self._bucket = bucket - WEEK_BUCKETS
+            start = self._bucket * BUCKET_SECONDS
+        while self._bucket < bucket:
+            end = (self._bucket + 1) * BUCKET_SECONDS
+            self._account(end - start)
+            self._roll()
+            start = end
+        self._account(now - start)
+        self._since = now
+
+    def as_dict(self, now: float) -> dict[str, Any]:
+        """Return the statistics as state attributes."""
+        self.advance(now)
+        day_online, day_observed, _ = self._day
+        week_online, week_observed, week_outages = self._week
+        return {
+            "uptime_24h": _uptime(day_online, day_observed),
+            "uptime_7d": _uptime(week_online, week_observed),
+            "outages_7d": int(week_outages),
+            "mtbf_7d": round(week_online / week_outages) if week_outages else None,
+        }
+
+    def _account(self, seconds: float) -> None:
+        if self.is_online is None or seconds <= 0:
+            return
+        self._add(self._observed, seconds, 1)
+        if self.is_online:
+            self._add(self._online, seconds, 0)
+
+    def _add(self, buckets: array, value: float, sum_index: int) -> None:
+        """Add to the current bucket and the running sums."""
+        assert self._bucket is not None
+        buckets[self._bucket % WEEK_BUCKETS] += value
+        self._day[sum_index] += value
+        self._week[sum_index] += value
+
+    def _roll(self) -> None:
+        """Move to the next bucket, dropping what leaves the windows."""
+        assert self._bucket is not None
+        self._bucket += 1
+        # The bucket that leaves the day window is still part of the week
+        day_index = (self._bucket - DAY_BUCKETS) % WEEK_BUCKETS
+        week_index = self._bucket % WEEK_BUCKETS
+        for sum_index, buckets in enumerate(
+            (self._online, self._observed, self._outages)
+        ):
+            # Clamped, rounding must not leave a negative sum behind
+            self._day[sum_index] = max(self._day[sum_index] - buckets[day_index], 0)
+            self._week[sum_index] = max(
+                self._week[sum_index] - buckets[week_index], 0
+            )
+            buckets[week_index] = 0
+
+    def _clear(self) -> None:
+        for buckets in (self._online, self._observed, self._outages):
+            for index in range(WEEK_BUCKETS):
+                buckets[index] = 0
+        self._day = [0.0, 0.0, 0]
+        self._week = [0.0, 0.0, 0]
+
+
+def _uptime(online: float, observed: float) -> float | None:
+    """Return the online percentage, None without observed time."""
+    if observed < MIN_OBSERVED_SECONDS:
+        return None
+    return round(min(online, observed) / observed * 100, 2)
@@ -0,0 +1 @@
+"""Tests for MQTT connection state custom integration."""
@@ -0,0 +1,69 @@
+"""Helpers for MQTT connection state tests."""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.device_registry import DeviceEntry
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_mqtt_message,
+)
+
+from custom_components.mqtt_connection_state.const import (
+    CONF_DEVICE_ID,
+    CONF_TOPIC,
+    DOMAIN,
+)
+
+
+async def async_setup_integration(
+    hass: HomeAssistant, options: dict[str, Any] | None = None
+) -> None:
+    """Set up the integration with YAML options, MQTT must be mocked."""
+    assert await async_setup_component(hass, DOMAIN, {DOMAIN: options or {}})
+    await hass.async_block_till_done()
+
+
+async def async_discover_device(
+    hass: HomeAssistant, name: str, *, base: str = "zigbee2mqtt", **options: Any
+) -> DeviceEntry:
+    """Announce a device with one MQTT entity through MQTT discovery.
+
+    The entity subscribes "<base>/<name>" and "<base>/<name>/availability",
+    options are added to its discovery payload.
+    """
+    payload = {
+        "name": "Contact",
+        "unique_id": f"{base}_{name}_contact",
+        "state_topic": f"{base}/{name}",
+        "availability_topic": f"{base}/{name}/availability",
+        "device": {"identifiers": [f"{base}_{name}"], "name": name.title()},
+        **options,
+    }
+    async_fire_mqtt_message(
+        hass, f"homeassistant/binary_sensor/{base}_{name}/contact/config", json.dumps(payload)
+    )
+    await hass.async_block_till_done()
+    device = dr.async_get(hass).async_get_device(identifiers={("mqtt", f"{base}_{name}")})
+    assert device is not None
+    return device
+
+
+async def async_add_device_entry(
+    hass: HomeAssistant, device: DeviceEntry, topic: str, **data: Any
+) -> MockConfigEntry:
+    """Add and set up a single device entry."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title=device.name,
+        data={CONF_DEVICE_ID: device.id, CONF_TOPIC: topic, **data},
+    )
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    return entry
@@ -0,0 +1,23 @@
+"""Fixtures for MQTT connection state tests."""
+
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+
+@pytest.fixture
+def domain_data(hass: Any) -> dict[str, Any]:
+    """Set up the integration data with the default YAML options."""
+    from custom_components.mqtt_connection_state import CONFIG_SCHEMA  # noqa: PLC0415
+    from custom_components.mqtt_connection_state.const import DOMAIN  # noqa: PLC0415
+
+    hass.data[DOMAIN] = {"config": CONFIG_SCHEMA({DOMAIN: {}})[DOMAIN]}
+    return hass.data[DOMAIN]
+
+
+@pytest.fixture
+def mqtt_ready(hass: Any, enable_custom_integrations: None, mqtt_mock: Any) -> Any:
+    """Set up MQTT with a mocked client, with custom integrations enabled."""
+    return mqtt_mock
@@ -0,0 +1,206 @@
+"""Tests for the connection state binary sensor."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Mapping
+from typing import Any
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from homeassistant.const import (  # noqa: E402
+    EVENT_STATE_CHANGED,
+    EVENT_STATE_REPORTED,
+    STATE_OFF,
+    STATE_ON,
+    STATE_UNAVAILABLE,
+)
+from homeassistant.core import Event, HomeAssistant, State, callback  # noqa: E402
+from pytest_homeassistant_custom_component.common import (  # noqa: E402
+    async_capture_events,
+    async_fire_mqtt_message,
+    mock_restore_cache,
+)
+
+from custom_components.mqtt_connection_state.const import DOMAIN  # noqa: E402
+
+from .common import (  # noqa: E402
+    async_add_device_entry,
+    async_discover_device,
+    async_setup_integration,
+)
+
+ENTITY_ID = "binary_sensor.lamp_connection_state"
+TOPIC = "zigbee2mqtt/lamp/availability"
+
+
+def _track_writes(hass: HomeAssistant, entity_id: str) -> list[Event]:
+    """Record the state writes of an entity, also those without changes."""
+    writes: list[Event] = []
+
+    @callback
+    def _filter(event_data: Mapping[str, Any]) -> bool:
+        return event_data["entity_id"] == entity_id
+
+    @callback
+    def _record(event: Event) -> None:
+        writes.append(event)
+
+    for event_type in (EVENT_STATE_CHANGED, EVENT_STATE_REPORTED):
+        hass.bus.async_listen(event_type, _record, event_filter=_filter)
+    return writes
+
+
+async def test_restored_state_confirmed_without_write(
+    hass: HomeAssistant, mqtt_ready: Any
+) -> None:
+    """A message confirming the restored state is not written again."""
+    mock_restore_cache(hass, [State(ENTITY_ID, STATE_ON)])
+    await async_setup_integration(hass)
+    device = await async_discover_device(hass, "lamp")
+    await async_add_device_entry(hass, device, TOPIC)
+
+    state = hass.states.get(ENTITY_ID)
+    assert state.state == STATE_ON
+    assert state.attributes["restored"] is True
+
+    writes = _track_writes(hass, ENTITY_ID)
+    async_fire_mqtt_message(hass, TOPIC, "online")
+    await hass.async_block_till_done()
+    assert writes == []
+
+    # The restored attribute goes with the next write
+    async_fire_mqtt_message(hass, TOPIC, "offline")
+    await hass.async_block_till_done()
+    state = hass.states.get(ENTITY_ID)
+    assert state.state == STATE_OFF
+    assert "restored" not in state.attributes
+    assert len(writes) == 1
+
+
+async def test_restored_state_changed(hass: HomeAssistant, mqtt_ready: Any) -> None:
+    """A message with another state than the restored state is written."""
+    mock_restore_cache(hass, [State(ENTITY_ID, STATE_OFF)])
+    await async_setup_integration(hass)
+    device = await async_discover_device(hass, "lamp")
+    await async_add_device_entry(hass, device, TOPIC)
+    assert hass.states.get(ENTITY_ID).state == STATE_OFF
+
+    async_fire_mqtt_message(hass, TOPIC, "online")
+    await hass.async_block_till_done()
+
+    state = hass.states.get(ENTITY_ID)
+    assert state.state == STATE_ON
+    assert "restored" not in state.attributes
+
+
+@pytest.mark.parametrize(
+    ("payloads", "state", "decoded"),
+    [
+        (["online"], STATE_ON, 0),
+        (["online", "offline"], STATE_OFF, 0),
+        (['{"state":"online"}'], STATE_ON, 0),
+        (['{"state": "offline"}'], STATE_OFF, 0),
+        (["Online"], STATE_ON, 0),
+        (["online", "Offline"], STATE_OFF, 0),
+        (["up"], STATE_ON, 0),
+        (["online", "down"], STATE_OFF, 0),
+        (['{"state": "up"}'], STATE_ON, 0),
+        (['{"state": "up", "since": 5}'], STATE_ON, 1),
+        (['{"state": "unknown"}'], STATE_OFF, 1),
+        (["online", "not json"], STATE_ON, 1),
+        (["online", ""], STATE_UNAVAILABLE, 0),
+        (["online", "{}"], STATE_UNAVAILABLE, 1),
+    ],
+)
+async def test_payloads(
+    hass: HomeAssistant,
+    mqtt_ready: Any,
+    payloads: list[str],
+    state: str,
+    decoded: int,
+) -> None:
+    """Known and custom payloads are mapped without decoding JSON."""
+    await async_setup_integration(hass)
+    device = await async_discover_device(hass, "lamp")
+    await async_add_device_entry(
+        hass, device, TOPIC, payload_available="up", payload_not_available="down"
+    )
+
+    for payload in payloads:
+        async_fire_mqtt_message(hass, TOPIC, payload)
+    await hass.async_block_till_done()
+
+    assert hass.states.get(ENTITY_ID).state == state
+    stats = hass.data[DOMAIN]["stats"]
+    assert stats.timing("json_decode").count == decoded
+
+
+async def _async_setup_lamp(hass: HomeAssistant, options: dict[str, Any]) -> None:
+    """Set up the integration with options and a lamp device entry."""
+    await async_setup_integration(hass, options)
+    device = await async_discover_device(hass, "lamp")
+    await async_add_device_entry(hass, device, TOPIC)
+
+
+async def _async_send(hass: HomeAssistant, payload: str) -> str:
+    """Send an availability message, return the resulting state."""
+    async_fire_mqtt_message(hass, TOPIC, payload)
+    await hass.async_block_till_done()
+    return hass.states.get(ENTITY_ID).state
+
+
+async def test_offline_grace(hass: HomeAssistant, mqtt_ready: Any) -> None:
+    """Offline is reported after the grace period, unless back online before."""
+    await _async_setup_lamp(hass, {"offline_grace": 0.2})
+    assert await _async_send(hass, "online") == STATE_ON
+    writes = _track_writes(hass, ENTITY_ID)
+
+    assert await _async_send(hass, "offline") == STATE_ON
+    await asyncio.sleep(0.1)
+    assert await _async_send(hass, "online") == STATE_ON
+    await asyncio.sleep(0.2)
+    assert hass.states.get(ENTITY_ID).state == STATE_ON
+    assert writes == []
+
+    assert await _async_send(hass, "offline") == STATE_ON
+    await asyncio.sleep(0.25)
+    assert hass.states.get(ENTITY_ID).state == STATE_OFF
+    assert len(writes) == 1
+
+
+async def test_min_state_duration(hass: HomeAssistant, mqtt_ready: Any) -> None:
+    """A state is kept for the minimum duration, the last received state wins."""
+    await _async_setup_lamp(hass, {"min_state_duration": 0.2})
+    assert await _async_send(hass, "online") == STATE_ON
+
+    assert await _async_send(hass, "offline") == STATE_ON
+    assert await _async_send(hass, "online") == STATE_ON
+    assert await _async_send(hass, "offline") == STATE_ON
+    await asyncio.sleep(0.25)
+    assert hass.states.get(ENTITY_ID).state == STATE_OFF
+
+    # Becoming available again is not delayed
+    assert await _async_send(hass, "") == STATE_UNAVAILABLE
+    assert await _async_send(hass, "online") == STATE_ON
+
+
+async def test_flapping(hass: HomeAssistant, mqtt_ready: Any) -> None:
+    """Many changes within the flap window flag the device as flapping."""
+    await _async_setup_lamp(hass, {"flap_threshold": 3, "flap_window": 0.2})
+    events = async_capture_events(hass, f"{DOMAIN}_flapping")
+
+    for payload in ("online", "offline"):
+        await _async_send(hass, payload)
+    assert hass.states.get(ENTITY_ID).attributes["flapping"] is False
+
+    await _async_send(hass, "online")
+    assert hass.states.get(ENTITY_ID).attributes["flapping"] is True
+
+    # Until the oldest change leaves the window
+    await asyncio.sleep(0.25)
+    assert hass.states.get(ENTITY_ID).attributes["flapping"] is False
+    assert [event.data["flapping"] for event in events] == [True, False]
+    assert events[0].data["entity_id"] == ENTITY_ID
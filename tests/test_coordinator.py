@@ -0,0 +1,355 @@
+"""Tests for the bridge coordinator."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from homeassistant.const import STATE_OFF, STATE_ON  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.util import dt as dt_util  # noqa: E402
+from pytest_homeassistant_custom_component.common import (  # noqa: E402
+    async_capture_events,
+    async_fire_mqtt_message,
+    async_fire_time_changed,
+)
+
+from custom_components.mqtt_connection_state import CONFIG_SCHEMA  # noqa: E402
+from custom_components.mqtt_connection_state.const import DOMAIN  # noqa: E402
+from custom_components.mqtt_connection_state.coordinator import (  # noqa: E402
+    BridgeCoordinator,
+    topic_filter,
+)
+
+from .common import (  # noqa: E402
+    async_add_device_entry,
+    async_discover_device,
+    async_setup_integration,
+)
+
+AVAILABILITY_A = "zigbee2mqtt/a/availability"
+AVAILABILITY_B = "zigbee2mqtt/b/availability"
+AVAILABILITY_LAMP = "zigbee2mqtt/lamp/availability"
+AVAILABILITY_PLUG = "zigbee2mqtt/plug/availability"
+LAMP = "binary_sensor.lamp_connection_state"
+PLUG = "binary_sensor.plug_connection_state"
+
+
+@dataclass
+class Message:
+    """MQTT message as passed to subscription callbacks."""
+
+    topic: str
+    payload: str
+    retain: bool
+    subscribed_topic: str
+    qos: int = 0
+
+
+class FakeClient:
+    """MQTT client that delivers messages to subscriptions by topic filter."""
+
+    def __init__(self) -> None:
+        """Initialize client."""
+        self.subscriptions: dict[str, Callable[[Any], None]] = {}
+        self.subscribe_calls = 0
+
+    async def async_subscribe(
+        self, hass: HomeAssistant, sub_filter: str, msg_callback: Callable, **kwargs: Any
+    ) -> Callable[[], None]:
+        """Subscribe to a topic filter."""
+        self.subscribe_calls += 1
+        self.subscriptions[sub_filter] = msg_callback
+        return lambda: self.subscriptions.pop(sub_filter, None)
+
+    def publish(self, topic: str, payload: str, retain: bool = False) -> None:
+        """Deliver a message to the subscriptions of matching filters."""
+        for sub_filter, msg_callback in list(self.subscriptions.items()):
+            if _filter_matches(sub_filter, topic):
+                msg_callback(Message(topic, payload, retain, sub_filter))
+
+
+def _filter_matches(sub_filter: str, topic: str) -> bool:
+    """Return if a MQTT topic filter matches a topic."""
+    levels = topic.split("/")
+    for index, level in enumerate(sub_filter.split("/")):
+        if level == "#":
+            return True
+        if index >= len(levels) or level not in ("+", levels[index]):
+            return False
+    return len(levels) == len(sub_filter.split("/"))
+
+
+class HeartbeatEntity:
+    """Entity that records when its heartbeat expired."""
+
+    def __init__(self, expired: list[str], name: str) -> None:
+        """Initialize entity."""
+        self._expired = expired
+        self._name = name
+
+    def async_heartbeat_expired(self) -> None:
+        """Record the expiry."""
+        self._expired.append(self._name)
+
+
+@pytest.fixture
+def client() -> Iterator[FakeClient]:
+    """Patch the MQTT subscribe of the coordinator."""
+    fake = FakeClient()
+    with patch(
+        "custom_components.mqtt_connection_state.coordinator.async_subscribe",
+        fake.async_subscribe,
+    ):
+        yield fake
+
+
+async def test_retained_replayed_to_later_devices(
+    hass: HomeAssistant, domain_data: dict[str, Any], client: FakeClient
+) -> None:
+    """Devices registering on a subscribed filter get their retained message."""
+    coordinator = BridgeCoordinator(hass, "zigbee2mqtt")
+    first: list[Message] = []
+    second: list[Message] = []
+
+    await coordinator.async_register(AVAILABILITY_A, first.append)
+    # The broker sends the retained messages of all devices of the filter
+    client.publish(AVAILABILITY_A, "online", retain=True)
+    client.publish(AVAILABILITY_B, "offline", retain=True)
+    assert [message.payload for message in first] == ["online"]
+
+    await coordinator.async_register(AVAILABILITY_B, second.append)
+    assert client.subscribe_calls == 1
+    assert [message.payload for message in second] == ["offline"]
+
+
+async def test_replay_follows_later_messages(
+    hass: HomeAssistant, domain_data: dict[str, Any], client: FakeClient
+) -> None:
+    """The last message is replayed, a cleared retained message is not."""
+    coordinator = BridgeCoordinator(hass, "zigbee2mqtt")
+    await coordinator.async_register(AVAILABILITY_A, lambda message: None)
+    client.publish(AVAILABILITY_B, "offline", retain=True)
+    client.publish(AVAILABILITY_B, "online")
+
+    received: list[Message] = []
+    unregister = await coordinator.async_register(AVAILABILITY_B, received.append)
+    assert [message.payload for message in received] == ["online"]
+
+    unregister()
+    client.publish(AVAILABILITY_B, "", retain=True)
+    received.clear()
+    await coordinator.async_register(AVAILABILITY_B, received.append)
+    assert received == []
+
+
+async def test_retained_dropped_with_subscription(
+    hass: HomeAssistant, domain_data: dict[str, Any], client: FakeClient
+) -> None:
+    """After unsubscribing, the broker delivers the retained messages again."""
+    coordinator = BridgeCoordinator(hass, "zigbee2mqtt")
+    unregister = await coordinator.async_register(AVAILABILITY_A, lambda message: None)
+    client.publish(AVAILABILITY_A, "online", retain=True)
+    unregister()
+
+    received: list[Message] = []
+    await coordinator.async_register(AVAILABILITY_A, received.append)
+    assert received == []
+    assert client.subscribe_calls == 2
+
+
+async def test_heartbeat_skips_commands(
+    hass: HomeAssistant, domain_data: dict[str, Any], client: FakeClient
+) -> None:
+    """Commands echoed by the broker are no sign of life."""
+    coordinator = BridgeCoordinator(hass, "zigbee2mqtt")
+    seen: list[Message] = []
+    await coordinator.async_register_heartbeat("zigbee2mqtt/a", seen.append)
+
+    for topic in (
+        "zigbee2mqtt/a/set",
+        "zigbee2mqtt/a/set/state",
+        "zigbee2mqtt/a/get/state",
+        "zigbee2mqtt/a/light/command",
+    ):
+        client.publish(topic, "{}")
+    assert seen == []
+
+    client.publish("zigbee2mqtt/a", "{}")
+    client.publish("zigbee2mqtt/b", "{}")
+    assert [message.topic for message in seen] == ["zigbee2mqtt/a"]
+
+
+async def test_heartbeat_timeout_per_bridge(hass: HomeAssistant) -> None:
+    """The heartbeat timeout is enabled per bridge."""
+    hass.data[DOMAIN] = {
+        "config": CONFIG_SCHEMA(
+            {DOMAIN: {"bridges": {"tele": {"heartbeat_timeout": 600}}}}
+        )[DOMAIN]
+    }
+
+    assert BridgeCoordinator(hass, "tele").heartbeat_timeout == 600
+    assert BridgeCoordinator(hass, "zigbee2mqtt").heartbeat_timeout == 0
+
+
+async def test_heartbeat_expires_silent_devices(hass: HomeAssistant) -> None:
+    """Only devices silent for the timeout expire, seen devices move back."""
+    hass.data[DOMAIN] = {
+        "config": CONFIG_SCHEMA({DOMAIN: {"heartbeat_timeout": 0.2}})[DOMAIN]
+    }
+    coordinator = BridgeCoordinator(hass, "zigbee2mqtt")
+    expired: list[str] = []
+    quiet = HeartbeatEntity(expired, "quiet")
+    busy = HeartbeatEntity(expired, "busy")
+    coordinator.async_track_heartbeat(quiet)
+    untrack_busy = coordinator.async_track_heartbeat(busy)
+
+    await asyncio.sleep(0.1)
+    coordinator.async_heartbeat_seen(busy)
+    await asyncio.sleep(0.15)
+    assert expired == ["quiet"]
+
+    await asyncio.sleep(0.15)
+    assert expired == ["quiet", "busy"]
+
+    # Seen again after it expired, then no longer tracked
+    coordinator.async_heartbeat_seen(busy)
+    untrack_busy()
+    await asyncio.sleep(0.25)
+    assert expired == ["quiet", "busy"]
+
+
+@pytest.mark.parametrize(
+    ("topic", "sub_filter"),
+    [
+        ("zigbee2mqtt/lamp/availability", "zigbee2mqtt/+/availability"),
+        ("tele/plug/LWT", "tele/+/LWT"),
+        ("zigbee2mqtt/room/lamp/availability", "zigbee2mqtt/room/lamp/availability"),
+        ("node/status", "node/status"),
+        ("zigbee2mqtt/+/availability", "zigbee2mqtt/+/availability"),
+    ],
+)
+def test_topic_filter(topic: str, sub_filter: str) -> None:
+    """Three level topics share a wildcard filter, others are used as is."""
+    assert topic_filter(topic) == sub_filter
+
+
+async def test_retained_burst_written_in_one_pass(
+    hass: HomeAssistant, mqtt_ready: Any
+) -> None:
+    """States changed by a retained replay are written together."""
+    await async_setup_integration(hass, {"write_batch_window": 0.1})
+    for name in ("lamp", "plug"):
+        device = await async_discover_device(hass, name)
+        await async_add_device_entry(hass, device, f"zigbee2mqtt/{name}/availability")
+    stats = hass.data[DOMAIN]["stats"]
+
+    async_fire_mqtt_message(hass, AVAILABILITY_LAMP, "online", retain=True)
+    async_fire_mqtt_message(hass, AVAILABILITY_PLUG, "offline", retain=True)
+    await hass.async_block_till_done()
+    assert hass.states.get(LAMP).state == STATE_OFF
+
+    await asyncio.sleep(0.15)
+    assert hass.states.get(LAMP).state == STATE_ON
+    assert hass.states.get(PLUG).state == STATE_OFF
+    assert stats.timing("state_write_batch").count == 1
+    # The plug was already off, there was nothing to write
+    assert stats.counters["batched_writes"] == 1
+
+
+async def test_writes_batched_after_bridge_online(
+    hass: HomeAssistant, mqtt_ready: Any
+) -> None:
+    """Devices reporting after their bridge came online are written together."""
+    await async_setup_integration(hass, {"write_batch_window": 0.1})
+    for name in ("lamp", "plug"):
+        device = await async_discover_device(hass, name)
+        await async_add_device_entry(hass, device, f"zigbee2mqtt/{name}/availability")
+    stats = hass.data[DOMAIN]["stats"]
+
+    async_fire_mqtt_message(hass, "zigbee2mqtt/bridge/state", '{"state": "online"}')
+    async_fire_mqtt_message(hass, AVAILABILITY_LAMP, "online")
+    # Back to the written state within the window
+    async_fire_mqtt_message(hass, AVAILABILITY_PLUG, "online")
+    async_fire_mqtt_message(hass, AVAILABILITY_PLUG, "offline")
+    await hass.async_block_till_done()
+    assert hass.states.get(LAMP).state == STATE_OFF
+
+    await asyncio.sleep(0.15)
+    assert hass.states.get(LAMP).state == STATE_ON
+    assert hass.states.get(PLUG).state == STATE_OFF
+    assert stats.counters["batched_writes"] == 2
+    assert stats.counters["state_write_skipped"] == 1
+
+
+async def test_changes_coalesced_per_bridge(
+    hass: HomeAssistant, mqtt_ready: Any
+) -> None:
+    """One event per bridge and state, per device events are opt-in."""
+    await async_setup_integration(
+        hass, {"coalesce_window": 5, "device_events": False}
+    )
+    devices = {}
+    for name in ("lamp", "plug"):
+        devices[name] = await async_discover_device(hass, name)
+        await async_add_device_entry(
+            hass, devices[name], f"zigbee2mqtt/{name}/availability"
+        )
+    bridge_events = async_capture_events(hass, f"{DOMAIN}_bridge_changed")
+    device_events = async_capture_events(hass, f"{DOMAIN}_changed")
+
+    for topic, payload in (
+        (AVAILABILITY_LAMP, "online"),
+        (AVAILABILITY_PLUG, "online"),
+        (AVAILABILITY_LAMP, "offline"),
+    ):
+        async_fire_mqtt_message(hass, topic, payload)
+    await hass.async_block_till_done()
+    assert bridge_events == []
+
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=6))
+    await hass.async_block_till_done()
+
+    assert device_events == []
+    assert {event.data["state"]: event.data for event in bridge_events} == {
+        "online": {
+            "bridge": "zigbee2mqtt",
+            "state": "online",
+            "count": 1,
+            "device_ids": [devices["plug"].id],
+        },
+        "offline": {
+            "bridge": "zigbee2mqtt",
+            "state": "offline",
+            "count": 1,
+            "device_ids": [devices["lamp"].id],
+        },
+    }
+
+
+async def test_device_events(hass: HomeAssistant, mqtt_ready: Any) -> None:
+    """Per device events are fired by default."""
+    await async_setup_integration(hass)
+    device = await async_discover_device(hass, "lamp")
+    await async_add_device_entry(hass, device, AVAILABILITY_LAMP)
+    events = async_capture_events(hass, f"{DOMAIN}_changed")
+
+    async_fire_mqtt_message(hass, AVAILABILITY_LAMP, "online")
+    await hass.async_block_till_done()
+
+    assert [event.data for event in events] == [
+        {
+            "state": "online",
+            "device_id": device.id,
+            "device_name": "Lamp",
+            "entity_id": LAMP,
+        }
+    ]
@@ -0,0 +1,65 @@
+"""Tests for the diagnostics."""
+
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+from pytest_homeassistant_custom_component.common import (  # noqa: E402
+    async_fire_mqtt_message,
+)
+
+from custom_components.mqtt_connection_state.diagnostics import (  # noqa: E402
+    async_get_config_entry_diagnostics,
+    async_get_device_diagnostics,
+)
+
+from .common import (  # noqa: E402
+    async_add_device_entry,
+    async_discover_device,
+    async_setup_integration,
+)
+
+TOPIC = "zigbee2mqtt/lamp/availability"
+
+
+async def test_hot_path_timings(hass: HomeAssistant, mqtt_ready: Any) -> None:
+    """Messages, JSON decodes and state writes are timed and counted."""
+    await async_setup_integration(hass)
+    device = await async_discover_device(hass, "lamp")
+    entry = await async_add_device_entry(hass, device, TOPIC)
+
+    # Plain payload, JSON payload, then the same state again
+    for payload in ("online", '{"state": "offline", "reason": "left"}', "offline"):
+        async_fire_mqtt_message(hass, TOPIC, payload)
+    await hass.async_block_till_done()
+
+    diagnostics = await async_get_config_entry_diagnostics(hass, entry)
+    stats = diagnostics["stats"]
+    assert stats["timings"]["message"]["count"] == 3
+    assert stats["timings"]["json_decode"]["count"] == 1
+    assert stats["timings"]["state_write"]["count"] == 2
+    assert sum(stats["timings"]["message"]["buckets_us"].values()) == 3
+    assert diagnostics["bridges"]["zigbee2mqtt"]["counts"]["offline"] == 1
+
+
+async def test_device_diagnostics(hass: HomeAssistant, mqtt_ready: Any) -> None:
+    """Device diagnostics show the state of its connection sensor."""
+    await async_setup_integration(hass)
+    device = await async_discover_device(hass, "lamp")
+    entry = await async_add_device_entry(hass, device, TOPIC)
+    async_fire_mqtt_message(hass, TOPIC, "online")
+    await hass.async_block_till_done()
+
+    diagnostics = await async_get_device_diagnostics(hass, entry, device)
+
+    assert diagnostics["device"] == {"id": device.id, "name": "Lamp"}
+    [entity] = diagnostics["entities"]
+    assert entity["entity_id"] == "binary_sensor.lamp_connection_state"
+    assert entity["is_on"] is True
+    assert entity["topic"] == TOPIC
+    assert entity["last_mqtt_message_age"] == 0.0
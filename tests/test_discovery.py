@@ -0,0 +1,158 @@
+"""Tests for the discovery of MQTT devices."""
+
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from freezegun.api import FrozenDateTimeFactory  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers import device_registry as dr  # noqa: E402
+from homeassistant.util import dt as dt_util  # noqa: E402
+from pytest_homeassistant_custom_component.common import (  # noqa: E402
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from custom_components.mqtt_connection_state.const import (  # noqa: E402
+    CONF_DISCOVERY_COOLDOWN,
+    CONF_STORAGE_SAVE_DELAY,
+    DOMAIN,
+    STORAGE_KEY_DISCOVERY,
+    STORAGE_VERSION,
+)
+from custom_components.mqtt_connection_state.discovery import (  # noqa: E402
+    DiscoveryIndex,
+)
+
+from .common import (  # noqa: E402
+    async_add_device_entry,
+    async_discover_device,
+    async_setup_integration,
+)
+
+
+async def test_index_saved_during_churn(
+    hass: HomeAssistant,
+    domain_data: dict[str, Any],
+    hass_storage: dict[str, Any],
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """A device discovered every second doesn't postpone the save."""
+    mqtt_entry = MockConfigEntry(domain="mqtt")
+    mqtt_entry.add_to_hass(hass)
+    device_registry = dr.async_get(hass)
+    index = DiscoveryIndex(hass)
+    await index.async_load()
+
+    for second in range(CONF_STORAGE_SAVE_DELAY + 1):
+        if second:
+            freezer.tick(timedelta(seconds=1))
+            async_fire_time_changed(hass)
+            await hass.async_block_till_done()
+        device_entry = device_registry.async_get_or_create(
+            config_entry_id=mqtt_entry.entry_id,
+            identifiers={("mqtt", f"device_{second}")},
+            name=f"Device {second}",
+        )
+        index.async_add_new_device(device_entry, f"z2m/device_{second}/availability")
+
+    assert STORAGE_KEY_DISCOVERY in hass_storage
+    saved = hass_storage[STORAGE_KEY_DISCOVERY]["data"]
+    assert len(saved["seen"]) == CONF_STORAGE_SAVE_DELAY
+    assert {item["bridge"] for item in saved["new_devices"]} == {"z2m"}
+
+
+def _discovery_flows(hass: HomeAssistant) -> dict[str, str]:
+    """Return the discovery flows in progress by device ID."""
+    return {
+        flow["context"]["unique_id"]: flow["step_id"]
+        for flow in hass.config_entries.flow.async_progress_by_handler(DOMAIN)
+    }
+
+
+async def test_new_devices_discovered_from_events(
+    hass: HomeAssistant, mqtt_ready: Any
+) -> None:
+    """Devices are evaluated when they or their MQTT entities change."""
+    await async_setup_integration(hass)
+    index = hass.data[DOMAIN]["discovery_index"]
+    lamp = await async_discover_device(hass, "lamp")
+    plug = await async_discover_device(hass, "plug")
+    await async_add_device_entry(hass, plug, "zigbee2mqtt/plug/availability")
+    # A MQTT device without connection topic, yet
+    node = dr.async_get(hass).async_get_or_create(
+        config_entry_id=hass.config_entries.async_entries("mqtt")[0].entry_id,
+        identifiers={("mqtt", "node")},
+        name="Node",
+    )
+    assert _discovery_flows(hass) == {}
+
+    # Changes in a burst are evaluated together after the cooldown
+    async_fire_time_changed(
+        hass, dt_util.utcnow() + CONF_DISCOVERY_COOLDOWN + timedelta(seconds=1)
+    )
+    await hass.async_block_till_done()
+
+    assert _discovery_flows(hass) == {lamp.id: "from_discovery"}
+    assert index.seen == {lamp.id}
+    assert index.candidates == {node.id}
+
+    dr.async_get(hass).async_remove_device(lamp.id)
+    await hass.async_block_till_done()
+    assert index.seen == set()
+
+
+async def test_sweep_in_slices(hass: HomeAssistant, mqtt_ready: Any) -> None:
+    """The sweep yields between slices and only checks MQTT devices."""
+    devices = [await async_discover_device(hass, name) for name in ("a", "b", "c")]
+    other_entry = MockConfigEntry(domain="test")
+    other_entry.add_to_hass(hass)
+    dr.async_get(hass).async_get_or_create(
+        config_entry_id=other_entry.entry_id, identifiers={("test", "other")}
+    )
+
+    # One device per slice
+    with patch(
+        "custom_components.mqtt_connection_state.discovery.CONF_DISCOVERY_SLICE_BUDGET",
+        0,
+    ):
+        await async_setup_integration(hass)
+        await hass.async_block_till_done()
+
+    assert _discovery_flows(hass) == dict.fromkeys(
+        (device.id for device in devices), "from_discovery"
+    )
+    stats = hass.data[DOMAIN]["stats"]
+    assert stats.timing("discovery_slice").count == len(devices) + 1
+    assert stats.timing("discovery_sweep").count == 1
+
+
+async def test_seen_devices_restored(
+    hass: HomeAssistant, mqtt_ready: Any, hass_storage: dict[str, Any]
+) -> None:
+    """Devices seen before a restart don't start a flow again."""
+    lamp = await async_discover_device(hass, "lamp")
+    plug = await async_discover_device(hass, "plug")
+    hass_storage[STORAGE_KEY_DISCOVERY] = {
+        "version": STORAGE_VERSION,
+        "key": STORAGE_KEY_DISCOVERY,
+        "data": {
+            "seen": [lamp.id, "removed"],
+            "new_devices": [{"id": lamp.id, "name": "Lamp"}, {"id": "removed"}],
+        },
+    }
+
+    await async_setup_integration(hass)
+    await hass.async_block_till_done()
+
+    index = hass.data[DOMAIN]["discovery_index"]
+    assert _discovery_flows(hass) == {plug.id: "from_discovery"}
+    # Devices removed while stopped are pruned
+    assert index.seen == {lamp.id, plug.id}
+    assert set(index.new_devices) == {lamp.id, plug.id}
@@ -0,0 +1,142 @@
+"""Tests for connection topic ranking."""
+
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from freezegun.api import FrozenDateTimeFactory  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+from pytest_homeassistant_custom_component.common import (  # noqa: E402
+    async_fire_time_changed,
+)
+
+from custom_components.mqtt_connection_state.const import (  # noqa: E402
+    CONF_PAYLOAD_AVAILABLE,
+    CONF_PAYLOAD_NOT_AVAILABLE,
+    CONF_STORAGE_SAVE_DELAY,
+    DEFAULT_TOPIC_PATTERNS,
+    STORAGE_KEY_TOPIC_CACHE,
+)
+from custom_components.mqtt_connection_state.helpers import (  # noqa: E402
+    TopicCache,
+    TopicMatcher,
+    TopicSelector,
+    async_get_topic_index,
+    find_availability_payloads,
+    validate_topic_pattern,
+)
+
+from .common import async_discover_device  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    ("topic", "rank"),
+    [
+        ("zigbee2mqtt/lamp/availability", 0),
+        ("zigbee2mqtt/room/lamp/availability", 0),
+        ("esphome/node/status", 1),
+        ("tele/plug/LWT", 2),
+        ("tele/room/plug/LWT", None),
+        ("availability", None),
+        ("zigbee2mqtt/lamp", None),
+        ("zigbee2mqtt/lamp/availability/set", None),
+    ],
+)
+def test_matcher_rank(topic: str, rank: int | None) -> None:
+    """The best matching pattern gives the rank, "+" matches one level."""
+    assert TopicMatcher(DEFAULT_TOPIC_PATTERNS).rank(topic) == rank
+
+
+def test_matcher_rank_by_pattern_order() -> None:
+    """The first configured pattern ranks highest."""
+    matcher = TopicMatcher(["#/status", "#/availability"])
+    assert matcher.rank("node/status") == 0
+    assert matcher.rank("node/availability") == 1
+
+
+def test_selector_prefers_best_rank() -> None:
+    """Topics of a lower rank are dropped once a better one is found."""
+    selector = TopicSelector(TopicMatcher(DEFAULT_TOPIC_PATTERNS))
+    for topic in ("tele/plug/LWT", "tele/plug/LWT", "plug/status", "plug/state"):
+        selector.add(topic)
+
+    assert selector.topic == "plug/status"
+    assert selector.counts == {"plug/status": 1}
+
+
+def test_selector_ambiguous_topics() -> None:
+    """Of topics with the same rank the most used wins, then alphabetical."""
+    selector = TopicSelector(TopicMatcher(DEFAULT_TOPIC_PATTERNS))
+    assert selector.topic is None
+
+    for topic in ("z2m/b/availability", "z2m/a/availability"):
+        selector.add(topic)
+    assert selector.topic == "z2m/a/availability"
+
+    selector.add("z2m/b/availability")
+    assert selector.topic == "z2m/b/availability"
+    assert selector.counts == {"z2m/a/availability": 1, "z2m/b/availability": 2}
+
+
+@pytest.mark.parametrize("pattern", ["", "tele/a+/LWT", "#status"])
+def test_invalid_topic_pattern(pattern: str) -> None:
+    """Wildcards must fill a whole level."""
+    with pytest.raises(ValueError):
+        validate_topic_pattern(pattern)
+
+
+async def test_topic_cache_saved_during_churn(
+    hass: HomeAssistant,
+    domain_data: dict[str, Any],
+    hass_storage: dict[str, Any],
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """A topic change every second doesn't postpone the save."""
+    cache = TopicCache(hass)
+
+    for second in range(CONF_STORAGE_SAVE_DELAY + 1):
+        if second:
+            freezer.tick(timedelta(seconds=1))
+            async_fire_time_changed(hass)
+            await hass.async_block_till_done()
+        cache.async_set(f"device_{second}", f"z2m/device_{second}/availability")
+
+    assert STORAGE_KEY_TOPIC_CACHE in hass_storage
+    saved = hass_storage[STORAGE_KEY_TOPIC_CACHE]["data"]
+    assert saved["patterns"] == DEFAULT_TOPIC_PATTERNS
+    assert len(saved["topics"]) == CONF_STORAGE_SAVE_DELAY
+
+
+async def test_payloads_from_topic_index(
+    hass: HomeAssistant, mqtt_ready: Any
+) -> None:
+    """Custom payloads come from the index, not from the debug info per device."""
+    lamp = await async_discover_device(
+        hass, "lamp", payload_available="up", payload_not_available="down"
+    )
+    plug = await async_discover_device(hass, "plug", payload_available="online")
+
+    with patch(
+        "custom_components.mqtt_connection_state.helpers.debug_info.info_for_device",
+        side_effect=AssertionError,
+    ):
+        assert find_availability_payloads(
+            hass, lamp.id, "zigbee2mqtt/lamp/availability"
+        ) == {CONF_PAYLOAD_AVAILABLE: "up", CONF_PAYLOAD_NOT_AVAILABLE: "down"}
+        # Again from the complete index, built in the background
+        await hass.async_block_till_done()
+        assert async_get_topic_index(hass).stats["complete"]
+        assert find_availability_payloads(
+            hass, lamp.id, "zigbee2mqtt/lamp/availability"
+        ) == {CONF_PAYLOAD_AVAILABLE: "up", CONF_PAYLOAD_NOT_AVAILABLE: "down"}
+        assert find_availability_payloads(hass, lamp.id, "zigbee2mqtt/lamp") == {}
+        assert (
+            find_availability_payloads(hass, plug.id, "zigbee2mqtt/plug/availability")
+            == {}
+        )
@@ -0,0 +1,58 @@
+"""Tests for the connection history."""
+
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from freezegun.api import FrozenDateTimeFactory  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+from pytest_homeassistant_custom_component.common import (  # noqa: E402
+    async_fire_time_changed,
+)
+
+from custom_components.mqtt_connection_state.const import (  # noqa: E402
+    CONF_HISTORY_SAVE_DELAY,
+    STORAGE_KEY_HISTORY,
+)
+from custom_components.mqtt_connection_state.history import (  # noqa: E402
+    ConnectionHistory,
+    DeviceHistory,
+)
+
+
+def test_ring_buffer_wraps() -> None:
+    """The oldest transitions are overwritten, iteration is oldest first."""
+    history = DeviceHistory(3)
+    assert list(history) == []
+
+    for timestamp in range(5):
+        history.append(float(timestamp), timestamp % 2)
+
+    assert history.count == 3
+    assert list(history) == [(2.0, 0), (3.0, 1), (4.0, 0)]
+
+
+async def test_saved_during_churn(
+    hass: HomeAssistant,
+    domain_data: dict[str, Any],
+    hass_storage: dict[str, Any],
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """A transition every few seconds doesn't postpone the save."""
+    history = ConnectionHistory(hass, 100)
+
+    for second in range(0, CONF_HISTORY_SAVE_DELAY + 1, 5):
+        if second:
+            freezer.tick(timedelta(seconds=5))
+            async_fire_time_changed(hass)
+            await hass.async_block_till_done()
+        history.async_record("device", "online" if second % 10 else "offline")
+
+    assert STORAGE_KEY_HISTORY in hass_storage
+    saved = hass_storage[STORAGE_KEY_HISTORY]["data"]["device"]
+    assert len(saved) == CONF_HISTORY_SAVE_DELAY // 5
@@ -0,0 +1,121 @@
+"""Tests for the hub entry."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from homeassistant.config_entries import ConfigEntryState  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+from pytest_homeassistant_custom_component.common import MockConfigEntry  # noqa: E402
+
+from custom_components.mqtt_connection_state.binary_sensor import (  # noqa: E402
+    async_queue_hub_device_data,
+)
+from custom_components.mqtt_connection_state.const import (  # noqa: E402
+    CONF_DEVICES,
+    CONF_TOPIC,
+    DOMAIN,
+    HUB_TITLE,
+)
+from custom_components.mqtt_connection_state.discovery import (  # noqa: E402
+    async_add_hub_devices,
+)
+
+from .common import async_discover_device, async_setup_integration  # noqa: E402
+
+LAMP = "binary_sensor.lamp_connection_state"
+PLUG = "binary_sensor.plug_connection_state"
+
+
+async def _async_setup_hub(
+    hass: HomeAssistant, devices: dict[str, dict[str, Any]]
+) -> MockConfigEntry:
+    """Add and set up a hub entry."""
+    hub = MockConfigEntry(
+        domain=DOMAIN, title=HUB_TITLE, unique_id="hub", data={CONF_DEVICES: devices}
+    )
+    hub.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(hub.entry_id)
+    await hass.async_block_till_done()
+    return hub
+
+
+async def test_hub_add_and_remove_devices(
+    hass: HomeAssistant, mqtt_ready: Any
+) -> None:
+    """Devices added to or removed from the hub follow without a reload."""
+    await async_setup_integration(hass)
+    lamp = await async_discover_device(hass, "lamp")
+    plug = await async_discover_device(hass, "plug", payload_available="up")
+    hub = await _async_setup_hub(
+        hass, {lamp.id: {CONF_TOPIC: "zigbee2mqtt/lamp/availability"}}
+    )
+    assert hass.states.get(LAMP) is not None
+    assert hass.states.get(PLUG) is None
+
+    # Configured devices are not added twice
+    assert await async_add_hub_devices(hass, hub, [lamp.id, plug.id]) == {plug.id}
+    await hass.async_block_till_done()
+    assert hub.data[CONF_DEVICES][plug.id] == {
+        CONF_TOPIC: "zigbee2mqtt/plug/availability",
+        "payload_available": "up",
+    }
+    assert hass.states.get(PLUG) is not None
+
+    hass.config_entries.async_update_entry(
+        hub, data={CONF_DEVICES: {plug.id: hub.data[CONF_DEVICES][plug.id]}}
+    )
+    await hass.async_block_till_done()
+    assert hass.states.get(LAMP) is None
+    assert hass.states.get(PLUG) is not None
+    assert hub.state is ConfigEntryState.LOADED
+
+
+async def test_resolved_device_data_batched(
+    hass: HomeAssistant, mqtt_ready: Any
+) -> None:
+    """Resolved topics of many devices are written in one entry update."""
+    await async_setup_integration(hass)
+    lamp = await async_discover_device(hass, "lamp")
+    plug = await async_discover_device(hass, "plug")
+    hub = await _async_setup_hub(
+        hass,
+        {
+            lamp.id: {CONF_TOPIC: "zigbee2mqtt/lamp/availability"},
+            plug.id: {CONF_TOPIC: "zigbee2mqtt/plug/availability"},
+        },
+    )
+    updates: list[dict[str, Any]] = []
+
+    async def _async_record(hass: HomeAssistant, entry: Any) -> None:
+        updates.append(dict(entry.data[CONF_DEVICES]))
+
+    hub.add_update_listener(_async_record)
+
+    with patch(
+        "custom_components.mqtt_connection_state.binary_sensor.CONF_HUB_UPDATE_DELAY",
+        0.05,
+    ):
+        async_queue_hub_device_data(hass, hub, lamp.id, {CONF_TOPIC: "z2m/lamp/status"})
+        async_queue_hub_device_data(hass, hub, plug.id, {CONF_TOPIC: "z2m/plug/status"})
+        # Not a hub device anymore
+        async_queue_hub_device_data(hass, hub, "gone", {CONF_TOPIC: "z2m/gone/status"})
+        assert updates == []
+        await asyncio.sleep(0.1)
+        await hass.async_block_till_done()
+
+    assert updates == [
+        {
+            lamp.id: {CONF_TOPIC: "z2m/lamp/status"},
+            plug.id: {CONF_TOPIC: "z2m/plug/status"},
+        }
+    ]
+    # The device list did not change, all entities are kept
+    assert hass.states.get(LAMP) is not None
+    assert hass.states.get(PLUG) is not None
@@ -0,0 +1,63 @@
+"""Tests for the setup and the actions of the integration."""
+
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers import device_registry as dr  # noqa: E402
+from pytest_homeassistant_custom_component.common import MockConfigEntry  # noqa: E402
+
+from custom_components.mqtt_connection_state.const import (  # noqa: E402
+    CONF_DEVICE_ID,
+    CONF_TOPIC,
+    DOMAIN,
+    SERV_ADD_NEW_DEVICES,
+)
+
+from .common import async_discover_device, async_setup_integration  # noqa: E402
+
+
+async def test_add_new_devices(hass: HomeAssistant, mqtt_ready: Any) -> None:
+    """Devices with a topic get an entry, flows of failed devices are aborted."""
+    await async_setup_integration(hass)
+    lamp = await async_discover_device(hass, "lamp")
+    other_entry = MockConfigEntry(domain="test")
+    other_entry.add_to_hass(hass)
+    other = dr.async_get(hass).async_get_or_create(
+        config_entry_id=other_entry.entry_id, identifiers={("test", "other")}
+    )
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERV_ADD_NEW_DEVICES,
+        {"list": [{"id": lamp.id}, other.id, "unknown"]},
+        blocking=True,
+        return_response=True,
+    )
+    await hass.async_block_till_done()
+
+    assert response["response"]["devices_configure_success"] == 1
+    assert response["response"]["device_ids"] == {
+        "success": {lamp.id},
+        "failed": {other.id, "unknown"},
+    }
+    entries = hass.config_entries.async_entries(DOMAIN)
+    assert [entry.data[CONF_DEVICE_ID] for entry in entries] == [lamp.id]
+    assert entries[0].data[CONF_TOPIC] == "zigbee2mqtt/lamp/availability"
+    assert hass.config_entries.flow.async_progress_by_handler(DOMAIN) == []
+
+    # Configured devices are skipped
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERV_ADD_NEW_DEVICES,
+        {"list": [lamp.id]},
+        blocking=True,
+        return_response=True,
+    )
+    assert response["response"]["devices_already_configured"] == 1
+    assert response["response"]["devices_to_configure"] == 0
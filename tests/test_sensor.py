@@ -0,0 +1,44 @@
+"""Tests for the fleet sensors."""
+
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers import entity_registry as er  # noqa: E402
+
+from custom_components.mqtt_connection_state.coordinator import (  # noqa: E402
+    async_get_coordinator,
+)
+
+from .common import async_setup_integration  # noqa: E402
+
+
+async def test_sensor_per_new_bridge(hass: HomeAssistant, mqtt_ready: Any) -> None:
+    """A bridge seen for the first time gets its own sensor."""
+    await async_setup_integration(hass)
+    assert hass.states.get("sensor.offline_devices") is not None
+    assert hass.states.get("sensor.tele_offline_devices") is None
+
+    async_get_coordinator(hass, "tele/plug/LWT")
+    await hass.async_block_till_done()
+
+    assert hass.states.get("sensor.tele_offline_devices") is not None
+
+
+async def test_no_bridge_sensors_after_removal(
+    hass: HomeAssistant, mqtt_ready: Any
+) -> None:
+    """The new bridge listener goes with the fleet sensor."""
+    await async_setup_integration(hass)
+    er.async_get(hass).async_remove("sensor.offline_devices")
+    await hass.async_block_till_done()
+
+    async_get_coordinator(hass, "tele/plug/LWT")
+    await hass.async_block_till_done()
+
+    assert hass.states.get("sensor.tele_offline_devices") is None
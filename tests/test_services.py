@@ -0,0 +1,143 @@
+"""Tests for the actions of the integration."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers import device_registry as dr  # noqa: E402
+
+from custom_components.mqtt_connection_state.const import (  # noqa: E402
+    DOMAIN,
+    SERV_LIST_NEW_DEVICES,
+    SERV_RELOAD_BRIDGE,
+    STORAGE_KEY_DISCOVERY,
+    STORAGE_VERSION,
+)
+
+from .common import (  # noqa: E402
+    async_add_device_entry,
+    async_discover_device,
+    async_setup_integration,
+)
+
+
+async def test_reload_bridge(hass: HomeAssistant, mqtt_ready: Any) -> None:
+    """The entries of one bridge are reloaded together, others are not."""
+    await async_setup_integration(hass)
+    entries = {}
+    for base, name in (
+        ("zigbee2mqtt", "lamp"),
+        ("zigbee2mqtt", "plug"),
+        ("tele", "fan"),
+    ):
+        device = await async_discover_device(hass, name, base=base)
+        entries[name] = await async_add_device_entry(
+            hass, device, f"{base}/{name}/availability"
+        )
+
+    async_reload = hass.config_entries.async_reload
+    reloading: set[str] = set()
+    reloaded: list[set[str]] = []
+
+    async def _async_reload(entry_id: str) -> bool:
+        reloading.add(entry_id)
+        await asyncio.sleep(0)
+        reloaded.append(set(reloading))
+        return await async_reload(entry_id)
+
+    with patch.object(hass.config_entries, "async_reload", _async_reload):
+        response = await hass.services.async_call(
+            DOMAIN,
+            SERV_RELOAD_BRIDGE,
+            {"bridge": "zigbee2mqtt"},
+            blocking=True,
+            return_response=True,
+        )
+
+    assert response == {"bridge": "zigbee2mqtt", "devices_reloaded": 2}
+    # Both reloads were running at the same time
+    assert reloaded[0] == {entries["lamp"].entry_id, entries["plug"].entry_id}
+    assert entries["fan"].entry_id not in set().union(*reloaded)
+    assert hass.states.get("binary_sensor.lamp_connection_state") is not None
+    assert hass.states.get("binary_sensor.plug_connection_state") is not None
+
+
+async def test_list_new_devices(
+    hass: HomeAssistant, mqtt_ready: Any, hass_storage: dict[str, Any]
+) -> None:
+    """New devices are listed a page at a time, filtered on the server."""
+    mqtt_entry_id = hass.config_entries.async_entries("mqtt")[0].entry_id
+    device_registry = dr.async_get(hass)
+    new_devices = []
+    for name, manufacturer, model, bridge in (
+        ("Lamp hall", "IKEA", "LED1623G12", "zigbee2mqtt"),
+        ("Lamp desk", "IKEA", "LED2003G10", "zigbee2mqtt"),
+        ("Plug", "Sonoff", "S26", "tele"),
+        ("Lamp porch", "Philips", "LWB010", "zigbee2mqtt"),
+    ):
+        device = device_registry.async_get_or_create(
+            config_entry_id=mqtt_entry_id,
+            identifiers={("mqtt", name)},
+            name=name,
+            manufacturer=manufacturer,
+            model=model,
+        )
+        new_devices.append(
+            {
+                "id": device.id,
+                "name": name,
+                "manufacturer": manufacturer,
+                "model": model,
+                "bridge": bridge,
+            }
+        )
+    ids = [device["id"] for device in new_devices]
+    hass_storage[STORAGE_KEY_DISCOVERY] = {
+        "version": STORAGE_VERSION,
+        "key": STORAGE_KEY_DISCOVERY,
+        "data": {"seen": ids, "new_devices": new_devices},
+    }
+    await async_setup_integration(hass)
+
+    async def _async_list(**data: Any) -> dict[str, Any]:
+        return await hass.services.async_call(
+            DOMAIN,
+            SERV_LIST_NEW_DEVICES,
+            data,
+            blocking=True,
+            return_response=True,
+        )
+
+    assert await _async_list() == {
+        "total": 4,
+        "offset": 0,
+        "next_offset": None,
+        "new_devices": new_devices,
+    }
+    assert await _async_list(offset=1, limit=2, ids_only=True) == {
+        "total": 4,
+        "offset": 1,
+        "next_offset": 3,
+        "device_ids": ids[1:3],
+    }
+    assert (await _async_list(bridge="TELE", ids_only=True))["device_ids"] == [ids[2]]
+    assert (await _async_list(manufacturer="ikea", ids_only=True))["device_ids"] == (
+        ids[:2]
+    )
+    assert (await _async_list(model="LWB010", ids_only=True))["device_ids"] == [
+        ids[3]
+    ]
+    response = await _async_list(name="lamp *", limit=1, ids_only=True)
+    assert response == {
+        "total": 3,
+        "offset": 0,
+        "next_offset": 1,
+        "device_ids": [ids[0]],
+    }
@@ -0,0 +1,61 @@
+"""Tests for the hot path instrumentation."""
+
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from custom_components.mqtt_connection_state.stats import (  # noqa: E402
+    BUCKETS,
+    Stats,
+    Timing,
+)
+
+
+def test_timing_buckets() -> None:
+    """Samples go to the first bucket with an upper bound not below them."""
+    timing = Timing()
+    for seconds in (5e-6, 10e-6, 11e-6, 2e-3, 1.0):
+        timing.record(seconds)
+
+    assert timing.count == 5
+    assert timing.max == 1.0
+    assert timing.counts[0] == 2
+    assert timing.counts[1] == 1
+    assert timing.counts[BUCKETS.index(5e-3)] == 1
+    # Above the last bound
+    assert timing.counts[-1] == 1
+
+
+def test_timing_as_dict() -> None:
+    """The histogram is keyed by bucket bound in microseconds."""
+    timing = Timing()
+    assert timing.as_dict()["mean_us"] is None
+
+    timing.record(100e-6)
+    timing.record(300e-6)
+    data = timing.as_dict()
+
+    assert data["count"] == 2
+    assert data["total_ms"] == 0.4
+    assert data["mean_us"] == 200.0
+    assert data["max_ms"] == 0.3
+    assert list(data["buckets_us"])[:2] == ["<=10", "<=50"]
+    assert data["buckets_us"]["<=100"] == 1
+    assert data["buckets_us"]["<=500"] == 1
+    assert data["buckets_us"]["inf"] == 0
+
+
+def test_stats() -> None:
+    """Counters add up, timings are created on first use and shared."""
+    stats = Stats()
+    stats.increment("state_write_skipped")
+    stats.increment("batched_writes", 3)
+    stats.increment("batched_writes")
+    assert stats.timing("message") is stats.timing("message")
+    stats.timing("message").record(1e-6)
+
+    data = stats.as_dict()
+    assert data["counters"] == {"state_write_skipped": 1, "batched_writes": 4}
+    assert data["timings"]["message"]["count"] == 1
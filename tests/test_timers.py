@@ -0,0 +1,61 @@
+"""Tests for the shared timer heap."""
+
+from __future__ import annotations
+
+import asyncio
+from functools import partial
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.mqtt_connection_state.timers import TimerHeap  # noqa: E402
+
+
+async def test_runs_in_deadline_order(hass: HomeAssistant) -> None:
+    """Timers run by deadline, an earlier timer moves the loop timer forward."""
+    timers = TimerHeap(hass)
+    calls: list[float] = []
+    now = hass.loop.time()
+    for delay in (0.03, 0.01, 0.02):
+        timers.async_call_at(now + delay, partial(calls.append, delay))
+
+    await asyncio.sleep(0.05)
+
+    assert calls == [0.01, 0.02, 0.03]
+    assert len(timers) == 0
+
+
+async def test_cancel_is_lazy(hass: HomeAssistant) -> None:
+    """Cancelled timers stay in the heap until they come due, then are skipped."""
+    timers = TimerHeap(hass)
+    calls: list[str] = []
+    now = hass.loop.time()
+    cancel_first = timers.async_call_at(now + 0.01, partial(calls.append, "first"))
+    timers.async_call_at(now + 0.02, partial(calls.append, "middle"))
+    cancel_last = timers.async_call_at(now + 0.03, partial(calls.append, "last"))
+
+    cancel_first()
+    cancel_last()
+    assert len(timers) == 3
+
+    await asyncio.sleep(0.05)
+
+    assert calls == ["middle"]
+    # The cancelled timer at the top is dropped without a loop timer
+    assert len(timers) == 0
+
+
+async def test_shutdown(hass: HomeAssistant) -> None:
+    """Shutdown drops all timers."""
+    timers = TimerHeap(hass)
+    calls: list[str] = []
+    timers.async_call_at(hass.loop.time() + 0.01, partial(calls.append, "timer"))
+
+    timers.async_shutdown()
+    await asyncio.sleep(0.02)
+
+    assert calls == []
+    assert len(timers) == 0
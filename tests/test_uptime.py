@@ -0,0 +1,90 @@
+"""Tests for the rolling availability statistics."""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from custom_components.mqtt_connection_state.uptime import (  # noqa: E402
+    BUCKET_SECONDS,
+    DAY_BUCKETS,
+    WEEK_BUCKETS,
+    AvailabilityStats,
+)
+
+
+def test_buckets_leave_the_windows() -> None:
+    """Hours roll out of the day window first, then out of the week window."""
+    stats = AvailabilityStats()
+    stats.update(0.0, True)
+    stats.update(BUCKET_SECONDS / 2, False)
+
+    assert stats.as_dict(BUCKET_SECONDS) == {
+        "uptime_24h": 50.0,
+        "uptime_7d": 50.0,
+        "outages_7d": 1,
+        "mtbf_7d": 1800,
+    }
+    assert stats.as_dict(DAY_BUCKETS * BUCKET_SECONDS) == {
+        "uptime_24h": 0.0,
+        "uptime_7d": 2.08,
+        "outages_7d": 1,
+        "mtbf_7d": 1800,
+    }
+    assert stats.as_dict(WEEK_BUCKETS * BUCKET_SECONDS) == {
+        "uptime_24h": 0.0,
+        "uptime_7d": 0.0,
+        "outages_7d": 0,
+        "mtbf_7d": None,
+    }
+
+
+def test_gap_longer_than_a_week() -> None:
+    """Only the last week of a long gap is accounted."""
+    stats = AvailabilityStats()
+    stats.update(0.0, False)
+    stats.update(BUCKET_SECONDS / 2, True)
+
+    assert stats.as_dict(10 * WEEK_BUCKETS * BUCKET_SECONDS) == {
+        "uptime_24h": 100.0,
+        "uptime_7d": 100.0,
+        "outages_7d": 0,
+        "mtbf_7d": None,
+    }
+
+
+def test_unknown_state_not_observed() -> None:
+    """Time in an unknown state counts for neither uptime nor downtime."""
+    stats = AvailabilityStats()
+    stats.update(0.0, None)
+
+    assert stats.as_dict(BUCKET_SECONDS)["uptime_24h"] is None
+
+    stats.update(BUCKET_SECONDS, True)
+    stats.update(BUCKET_SECONDS * 1.5, False)
+    assert stats.as_dict(BUCKET_SECONDS * 2)["uptime_24h"] == 50.0
+
+
+def test_unavailable_for_the_whole_window() -> None:
+    """Nothing observed gives no uptime, however the earlier buckets summed up."""
+    rng = random.Random(1)
+    stats = AvailabilityStats()
+    now = 0.0
+    while now < 3 * DAY_BUCKETS * BUCKET_SECONDS:
+        stats.update(now, rng.random() < 0.7)
+        now += rng.uniform(1, 500)
+    stats.update(now, None)
+
+    attributes = stats.as_dict(now + DAY_BUCKETS * BUCKET_SECONDS)
+    assert attributes["uptime_24h"] is None
+    assert attributes["outages_7d"] > 0
+
+    assert stats.as_dict(now + (WEEK_BUCKETS + 1) * BUCKET_SECONDS) == {
+        "uptime_24h": None,
+        "uptime_7d": None,
+        "outages_7d": 0,
+        "mtbf_7d": None,
+    }